@@ -0,0 +1,237 @@
+"""
+准入控制模块
+在转换接口之前限制上传大小与同时处理的请求数（全局与按客户端），系统饱和时直接拒绝新请求，
+避免突发的大文件把容器推入内存压力、拖慢所有请求。
+
+- 上传大小：先检查 Content-Length，再在接收请求体的过程中计数，超过上限立即返回 413，不必等整个请求体缓冲完毕。
+- 并发与排队：超过同时处理上限的请求按先后顺序排队等待；队列已满或等待超时返回 503 与 Retry-After。
+"""
+
+import asyncio
+import json
+import logging
+from collections import Counter as _Counter
+from collections import deque
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = metrics.REGISTRY.register(metrics.Gauge(
+    "scriptgrid_admission_active", "Requests admitted past admission control and being processed.",
+))
+QUEUED = metrics.REGISTRY.register(metrics.Gauge(
+    "scriptgrid_admission_queued", "Requests waiting in the admission queue.",
+))
+REJECTIONS = metrics.REGISTRY.register(metrics.Counter(
+    "scriptgrid_admission_rejections_total", "Requests rejected by admission control, by reason.", ("reason",),
+))
+
+
+class AdmissionRejected(Exception):
+    """请求未被接纳。"""
+
+    def __init__(self, reason, detail):
+        super().__init__(detail)
+        self.reason = reason
+        self.detail = detail
+
+
+class AdmissionController:
+    """
+    全局与按客户端的并发、排队限制。只在事件循环中使用，无需加锁。
+    上限为 0 表示不限制。
+    """
+
+    def __init__(self, max_active, max_queued, client_max_active, client_max_queued, queue_timeout):
+        """
+        :param max_active: 全局同时处理的请求数上限。
+        :param max_queued: 全局排队等待的请求数上限。
+        :param client_max_active: 单个客户端同时处理的请求数上限。
+        :param client_max_queued: 单个客户端排队等待的请求数上限。
+        :param queue_timeout: 排队等待的最长时间（秒），超时后拒绝。
+        """
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.client_max_active = client_max_active
+        self.client_max_queued = client_max_queued
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._client_active = _Counter()
+        self._client_queued = _Counter()
+        self._waiters = deque()
+
+    def _can_run(self, client):
+        return ((self.max_active <= 0 or self.active < self.max_active)
+                and (self.client_max_active <= 0 or self._client_active[client] < self.client_max_active))
+
+    def _start(self, client):
+        self.active += 1
+        self._client_active[client] += 1
+        ACTIVE.inc()
+
+    async def acquire(self, client):
+        """
+        等待处理名额。
+        :param client: 客户端标识。
+        :raises AdmissionRejected: 队列已满或等待超时时。
+        """
+        # 能够运行的等待者在名额释放时已被立即唤醒，因此这里不会越过仍可运行的排队请求
+        if self._can_run(client):
+            self._start(client)
+            return
+
+        if self.max_queued > 0 and len(self._waiters) >= self.max_queued:
+            raise AdmissionRejected("queue_full", "服务器繁忙，请稍后再试。")
+        if self.client_max_queued > 0 and self._client_queued[client] >= self.client_max_queued:
+            raise AdmissionRejected("client_queue_full", "同时提交的请求过多，请等待之前的请求完成后再试。")
+
+        waiter = (client, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._client_queued[client] += 1
+        QUEUED.inc()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), self.queue_timeout if self.queue_timeout > 0 else None)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter[1].done():
+                # 已被唤醒（名额已记入），但请求随即被取消或超时，归还名额
+                self.release(client)
+            else:
+                waiter[1].cancel()
+                self._dequeue(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionRejected("queue_timeout", "服务器繁忙，排队超时，请稍后再试。") from None
+            raise
+
+    def release(self, client):
+        """
+        归还处理名额，并按先后顺序唤醒可以运行的排队请求。
+        :param client: 客户端标识。
+        """
+        self.active -= 1
+        self._client_active[client] -= 1
+        if not self._client_active[client]:
+            del self._client_active[client]
+        ACTIVE.dec()
+        for waiter in list(self._waiters):
+            if not self._can_run(waiter[0]):
+                continue
+            self._dequeue(waiter)
+            self._start(waiter[0])
+            waiter[1].set_result(True)
+
+    def _dequeue(self, waiter):
+        self._waiters.remove(waiter)
+        client = waiter[0]
+        self._client_queued[client] -= 1
+        if not self._client_queued[client]:
+            del self._client_queued[client]
+        QUEUED.dec()
+
+
+async def send_error(send, status, detail, headers=()):
+    """
+    在中间件中直接发送 JSON 错误响应，格式与 HTTPException 的响应相同。
+    """
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode('utf-8')
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """
+    ASGI 中间件：对指定路径的 POST 请求执行上传大小与并发准入检查。
+    """
+
+    def __init__(self, app, controller, paths, max_upload_bytes=0, retry_after=5, trust_forwarded_for=False):
+        """
+        :param app: 下游 ASGI 应用。
+        :param controller: AdmissionController。
+        :param paths: 需要准入控制的路径集合。
+        :param max_upload_bytes: 请求体大小上限（字节），0 表示不限制。
+        :param retry_after: 503 响应中 Retry-After 头的秒数。
+        :param trust_forwarded_for: 是否以 X-Forwarded-For 中的第一个地址作为客户端标识（部署在反向代理之后时开启）。
+        """
+        self.app = app
+        self.controller = controller
+        self.paths = frozenset(paths)
+        self.max_upload_bytes = max_upload_bytes
+        self.retry_after = retry_after
+        self.trust_forwarded_for = trust_forwarded_for
+
+    def _client_id(self, scope):
+        if self.trust_forwarded_for:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-forwarded-for":
+                    return value.decode('latin-1').split(',')[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.max_upload_bytes
+        if limit > 0:
+            for name, value in scope.get("headers", ()):
+                if name == b"content-length" and value.isdigit() and int(value) > limit:
+                    REJECTIONS.inc(reason="too_large")
+                    await send_error(send, 413, f"上传文件过大，上限为 {limit} 字节。")
+                    return
+
+        client = self._client_id(scope)
+        try:
+            await self.controller.acquire(client)
+        except AdmissionRejected as e:
+            logger.warning(f"Request from {client} rejected: {e.reason}")
+            REJECTIONS.inc(reason=e.reason)
+            await send_error(send, 503, e.detail, [(b"retry-after", str(self.retry_after).encode())])
+            return
+
+        try:
+            if limit > 0:
+                await self._call_with_upload_limit(scope, receive, send, limit)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            self.controller.release(client)
+
+    async def _call_with_upload_limit(self, scope, receive, send, limit):
+        """
+        边接收边统计请求体大小（应对没有 Content-Length 的分块上传），超过上限时立即返回 413，
+        并向应用报告客户端已断开，使其停止读取；应用随后发出的响应会被丢弃。
+        """
+        state = {"received": 0, "rejected": False, "started": False}
+
+        async def receive_wrapper():
+            if state["rejected"]:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                if state["received"] > limit:
+                    state["rejected"] = True
+                    REJECTIONS.inc(reason="too_large")
+                    if not state["started"]:
+                        state["started"] = True
+                        await send_error(send, 413, f"上传文件过大，上限为 {limit} 字节。")
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def send_wrapper(message):
+            if state["rejected"]:
+                return
+            if message["type"] == "http.response.start":
+                state["started"] = True
+            await send(message)
+
+        await self.app(scope, receive_wrapper, send_wrapper)
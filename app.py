@@ -5,15 +5,24 @@ Web 应用后端主文件
 使用 FastAPI 构建 Web 服务，提供文件上传和转换 API。
 """
 
+import asyncio
+import io
+import json
 import os
+import secrets
 import tempfile
+import time
 import shutil
 import logging
 import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import List
+from urllib.parse import quote
 
-from fastapi import FastAPI, File, Form, UploadFile, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, File, Form, Header, Request, UploadFile, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -22,16 +31,76 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Import the core conversion logic
+import admission
+import batch
+import compression
+import config
+import formats
 import subtitle_converter
 import exceptions
+import jobs
+import metrics
+import preview
+import profiling
+import progress
+import result_cache
+import worker_pool
+from retime import Retime
+from timeline import Normalize
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    应用生命周期管理：启动时预热转换工作池，关闭时释放工作池。
+    """
+    worker_pool.get_executor()
+    result_cache.get_cache()
+    yield
+    jobs.shutdown()
+    worker_pool.shutdown()
+
 
 # --- FastAPI App Instance ---
 app = FastAPI(
     title="述格 (ScriptGrid) Web API",
     description="提供字幕文件格式转换的 Web API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# 接收上传文件的接口：经过准入控制，并接受压缩的请求体
+UPLOAD_PATHS = ("/api/convert", "/api/convert/batch", "/api/convert/multi", "/api/retime", "/api/preview", "/api/jobs")
+
+# --- 压缩请求体：请求头 Content-Encoding 为 gzip / zstd 时边接收边解压 ---
+# 位于准入控制之内：上传大小按实际传输的压缩数据计算，解压后的大小另有上限
+app.add_middleware(
+    compression.DecompressionMiddleware,
+    paths=UPLOAD_PATHS,
+    max_bytes=config.MAX_DECOMPRESSED_BYTES,
+)
+
+# --- 准入控制：在转换接口的参数校验之前限制上传大小与并发请求数 ---
+# 后添加的中间件在外层：准入控制位于 CORS 之内（拒绝响应同样带 CORS 头），运行指标位于最外层（拒绝的请求同样计入）
+app.add_middleware(
+    admission.AdmissionMiddleware,
+    controller=admission.AdmissionController(
+        max_active=config.ADMISSION_MAX_ACTIVE,
+        max_queued=config.ADMISSION_MAX_QUEUED,
+        client_max_active=config.ADMISSION_CLIENT_MAX_ACTIVE,
+        client_max_queued=config.ADMISSION_CLIENT_MAX_QUEUED,
+        queue_timeout=config.ADMISSION_QUEUE_TIMEOUT,
+    ),
+    paths=UPLOAD_PATHS,
+    max_upload_bytes=config.MAX_UPLOAD_BYTES,
+    retry_after=config.ADMISSION_RETRY_AFTER,
+    trust_forwarded_for=config.TRUST_FORWARDED_FOR,
+)
+
+# --- 转换进度：带 X-Progress-Id 请求头的上传请求记录进度，供 /api/progress/{id} 订阅 ---
+# 位于准入控制之外，排队等待名额的请求同样可以报告进度；拒绝的请求进度为 failed
+app.add_middleware(progress.ProgressMiddleware, paths=UPLOAD_PATHS)
+
 # --- 配置 CORS (如果前端和后端部署在不同域) ---
 # 允许所有来源，仅用于开发环境。生产环境应严格限制。
 app.add_middleware(
@@ -42,6 +111,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- 运行指标：在途请求数、请求耗时与响应发送阶段耗时 ---
+app.add_middleware(metrics.MetricsMiddleware)
+
 # --- 静态文件和模板配置 ---
 # 注意：确保 'templates' 和 'static' 目录与本文件在同一目录下
 BASE_DIR = Path(__file__).resolve().parent
@@ -98,20 +170,46 @@ async def favicon():
 
 @app.post("/api/convert")
 async def convert_subtitle_file(
+    request: Request,
     file: UploadFile = File(...),
     conversion_type: str = Form(...),
+    offset_ms: int = Form(None),
+    scale: str = Form(None),
+    source_fps: str = Form(None),
+    target_fps: str = Form(None),
+    normalize: bool = Form(None),
+    overlap_fix_ms: int = Form(None),
+    gap_fix_ms: int = Form(None),
+    min_duration_ms: int = Form(None),
+    x_profile: str = Header(None),
+    x_admin_token: str = Header(None),
     background_tasks: BackgroundTasks = None  # FastAPI 特殊注入类型
 ):
     """
     接收上传的字幕文件和转换类型，执行转换，并返回转换后的文件。
+    上传的文件可以用 gzip / zstd 压缩（文件名如 movie.srt.gz）；
+    客户端的 Accept-Encoding 允许时，文本格式的转换结果以压缩形式返回。
+    请求头带有 X-Progress-Id 时，转换进度可通过 /api/progress/{id} 订阅。
     
     Args:
+        request (Request): 当前请求，用于读取 If-None-Match 与 Accept-Encoding 请求头。
         file (UploadFile): 用户上传的文件。
-        conversion_type (str): 转换类型 ('subtitle_to_excel', 'ass_to_srt', 'xlsx_to_srt')。
+        conversion_type (str): 转换类型，取值见 formats 中登记的转换类型。
+        offset_ms, scale, source_fps, target_fps: 可选的重新定时参数，见 /api/retime。
+        normalize (bool): 是否规范化时间轴，默认取 TIMELINE_NORMALIZE。
+        overlap_fix_ms, gap_fix_ms (int): 消除不超过该时长（毫秒）的相邻重叠与间隔，默认取配置。
+        min_duration_ms (int): 结束时间早于开始时间的字幕改为持续该时长（毫秒），默认取配置。
+            规范化总会按开始时间排序并重新编号；三个时长都为 0 时只检查重叠、间隔与无效时间，不修改时间。
+            需要规范化的超大文件落盘转换，不流式返回：先单次遍历，只有未排序的文件才读入全部字幕排序后重新转换。
+        x_profile (str): 请求头 X-Profile，为 1 时剖析本次转换，需同时提供管理令牌。
+        x_admin_token (str): 请求头 X-Admin-Token。
         background_tasks (BackgroundTasks): FastAPI 的后台任务对象，用于延迟清理。
         
     Returns:
-        FileResponse: 转换后的文件。
+        Response: 转换后的文件内容（超大文件以 FileResponse 返回）；
+            启用结果缓存时附带 ETag，If-None-Match 匹配时返回 304；
+            剖析的转换附带 X-Profile-Id，剖析结果见 /api/profiles；
+            规范化了时间轴时附带 X-Timeline-Report（报告的统计部分，JSON），缓存命中时返回与首次转换相同的报告。
         
     Raises:
         HTTPException: 如果文件类型不支持、转换失败或发生其他错误。
@@ -127,59 +225,639 @@ async def convert_subtitle_file(
         logger.error("No conversion type provided in the request.")
         raise HTTPException(status_code=400, detail="未提供转换类型。")
         
-    if conversion_type not in ['subtitle_to_excel', 'ass_to_srt', 'xlsx_to_srt']:
+    # 检查转换类型，以及（去掉压缩后缀的）文件扩展名是否与转换类型精确匹配
+    original_filename, upload_encoding = compression.split_filename(file.filename)
+    file_extension = _check_upload(original_filename, conversion_type)
+    retime = _retime_from_form(offset_ms, scale, source_fps, target_fps)
+    normalize = _normalize_from_form(normalize, overlap_fix_ms, gap_fix_ms, min_duration_ms)
+    if upload_encoding is not None:
+        file = _decompressed_upload(file, original_filename, file_extension, upload_encoding)
+
+    output_file_name = subtitle_converter.output_filename(original_filename, conversion_type)
+    content_encoding = _response_encoding(request, output_file_name)
+
+    # 记录上传接收阶段的耗时（请求开始到表单解析完成），响应发送阶段按该转换类型记录
+    request.state.conversion_type = conversion_type
+    _observe_receive(request, conversion_type, file.size)
+    request_progress = progress.from_request(request)
+    if request_progress is not None:
+        request_progress.set_converting()
+
+    # 性能剖析：由配置对所有转换开启，或由管理员通过请求头对单个请求开启
+    if x_profile == "1" or config.PROFILE_CONVERSIONS:
+        if not config.PROFILE_CONVERSIONS:
+            _require_admin(x_admin_token)
+        return await _convert_profiled(file, output_file_name, conversion_type, retime, normalize, content_encoding,
+                                       request_progress)
+
+    # 压缩上传的大小是压缩后的大小，解压后可能远超内存转换的上限，先按解压后的大小确定处理方式
+    if upload_encoding is not None:
+        file = await _measure_decompressed(file)
+
+    # 2. 中小文件直接在内存中转换，不经过磁盘；超大文件边转换边流式返回（进程池模式下落盘处理），避免占用过多内存。
+    # 规范化可能需要排序，而流式返回的内容发出后无法重排，因此需要规范化的超大文件同样落盘处理
+    if file.size is not None and file.size > config.IN_MEMORY_MAX_BYTES:
+        if config.WORKER_MODE == 'process' or normalize is not None:
+            return await _convert_on_disk(file, file_extension, output_file_name, conversion_type, background_tasks,
+                                          retime, normalize, content_encoding, request_progress)
+        return await _convert_streaming(file, output_file_name, conversion_type, retime, normalize, content_encoding,
+                                        request_progress)
+
+    cache = result_cache.get_cache()
+    if cache is not None:
+        return await _convert_cached(cache, request, file, file_extension, output_file_name, conversion_type, retime,
+                                     normalize, content_encoding, request_progress)
+
+    try:
+        # 线程池模式下直接把上传流（压缩上传为解压流）交给流式解析器逐块读取；进程池模式下需要可 pickle 的 bytes
+        if config.WORKER_MODE == 'process':
+            source = await file.read()
+        else:
+            source = file.file
+        logger.info(f"File received: {file.size} bytes")
+
+        # 3. 调用核心转换逻辑
+        # 转换是同步的 CPU 密集操作，交给工作池执行，避免阻塞事件循环
+        output_bytes, stats = await _convert_bytes(source, original_filename, conversion_type, retime, normalize,
+                                                   request_progress)
+        logger.info("Conversion completed successfully by core logic.")
+    except Exception as e:
+        logger.error(f"An error occurred during in-memory conversion. Error: {e}")
+        raise _to_http_exception(e)
+
+    # 4. 直接返回内存中的转换结果
+    logger.info("Returning converted file for download.")
+    return await _bytes_response(output_bytes, output_file_name, content_encoding, _timeline_headers(stats))
+
+
+def _decompressed_upload(file, filename, file_extension, encoding):
+    """
+    把压缩上传包装为解压后的 UploadFile：文件名去掉压缩后缀，读取时边读边解压。
+    大小 (size) 仍为压缩后的大小，解压后的大小由 _measure_decompressed 确定。
+    :raises HTTPException: 压缩编码不受支持 (415) 或输入格式需要随机访问 (400) 时。
+    """
+    if file_extension == '.xlsx':
+        raise HTTPException(status_code=400, detail=".xlsx 文件本身已是压缩格式，请直接上传。")
+    try:
+        reader = compression.DecompressingReader(file.file, encoding, config.MAX_DECOMPRESSED_BYTES)
+    except compression.UnsupportedEncodingError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    logger.info(f"Decompressing {encoding} upload: {file.filename}")
+    return UploadFile(reader, size=file.size, filename=filename, headers=file.headers)
+
+
+async def _measure_decompressed(file):
+    """
+    解压至多 IN_MEMORY_MAX_BYTES + 1 字节以判断压缩上传解压后的大小，内存占用不超过内存转换本身的上限。
+    :param file: _decompressed_upload 返回的解压上传。
+    :return: 解压后不超过 IN_MEMORY_MAX_BYTES 时为内容已在内存中、大小为解压后大小的 UploadFile；
+             否则为原来的解压上传（回到开头），大小记为已解压的字节数，按超大文件处理。
+    :raises HTTPException: 数据无法解压 (400) 时。
+    """
+    try:
+        content = await run_in_threadpool(file.file.read, config.IN_MEMORY_MAX_BYTES + 1)
+        if len(content) <= config.IN_MEMORY_MAX_BYTES:
+            logger.info(f"Decompressed upload fits in memory: {len(content)} bytes")
+            return UploadFile(io.BytesIO(content), size=len(content), filename=file.filename, headers=file.headers)
+        # 解压流支持定位，回到开头即从头重新解压
+        await run_in_threadpool(file.file.seek, 0)
+    except Exception as e:
+        logger.error(f"An error occurred while decompressing the upload. Error: {e}")
+        raise _to_http_exception(e)
+    return UploadFile(file.file, size=len(content), filename=file.filename, headers=file.headers)
+
+
+def _response_encoding(request, output_file_name):
+    """
+    :return: 转换结果使用的压缩编码；未开启响应压缩、输出本身已是压缩格式或客户端不接受压缩时为 None。
+    """
+    if not config.RESPONSE_COMPRESSION or not compression.is_compressible(output_file_name):
+        return None
+    return compression.negotiate(request.headers.get('accept-encoding'))
+
+
+def _encoding_headers(content_encoding):
+    """
+    :return: 压缩相关的响应头：结果随 Accept-Encoding 变化时带 Vary，压缩时带 Content-Encoding。
+    """
+    headers = {}
+    if config.RESPONSE_COMPRESSION:
+        headers["Vary"] = "Accept-Encoding"
+    if content_encoding is not None:
+        headers["Content-Encoding"] = content_encoding
+    return headers
+
+
+async def _bytes_response(output_bytes, output_file_name, content_encoding=None, headers=None):
+    """
+    以附件形式返回内存中的转换结果。指定了压缩编码时先在线程池中压缩（结果太小时不压缩）。
+    :param headers: 附加的响应头。
+    """
+    if content_encoding is not None and len(output_bytes) < compression.MIN_COMPRESS_BYTES:
+        content_encoding = None
+    if content_encoding is not None:
+        output_bytes = await run_in_threadpool(compression.compress, output_bytes, content_encoding)
+    response_headers = _attachment_headers(output_file_name)
+    response_headers.update(_encoding_headers(content_encoding))
+    response_headers.update(headers or {})
+    return Response(
+        content=output_bytes,
+        media_type='application/octet-stream', # 通用二进制流，浏览器通常会触发下载
+        headers=response_headers
+    )
+
+
+async def _convert_profiled(file, output_file_name, conversion_type, retime=None, normalize=None,
+                            content_encoding=None, request_progress=None):
+    """
+    剖析转换的路径：整个文件读入内存，在工作池中剖析解析与写入阶段，结果保存到剖析结果存储。
+    剖析会明显拖慢转换，因此不计入转换耗时指标，结果也不写入结果缓存。
+    """
+    with metrics.CONVERSIONS_IN_FLIGHT.track(conversion_type=conversion_type):
+        try:
+            content = await file.read()
+            logger.info(f"File received for profiling: {len(content)} bytes")
+            output_bytes, stats, result = await worker_pool.run(
+                profiling.profile_conversion, content, file.filename, conversion_type, retime, normalize=normalize
+            )
+        except Exception as e:
+            metrics.record_error(conversion_type, e)
+            logger.error(f"An error occurred during profiled conversion. Error: {e}")
+            raise _to_http_exception(e)
+    _report_stats(request_progress, stats)
+    profiling.get_store().add(result)
+    logger.info(f"Profiled conversion completed: {result.id}")
+
+    return await _bytes_response(output_bytes, output_file_name, content_encoding,
+                                 {"X-Profile-Id": result.id, **_timeline_headers(stats)})
+
+
+def _observe_receive(request, conversion_type, size):
+    """
+    记录上传接收阶段的耗时与输入字节数。
+    :param request: 当前请求；由 MetricsMiddleware 记录了请求开始时间。
+    :param conversion_type: 转换类型。
+    :param size: 上传文件大小（字节），未知时为 None。
+    """
+    started = getattr(request.state, 'request_started', None)
+    if started is not None:
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage="receive", conversion_type=conversion_type)
+    if size is not None:
+        metrics.INPUT_BYTES.inc(size, conversion_type=conversion_type)
+
+
+async def _convert_bytes(source, filename, conversion_type, retime=None, normalize=None, request_progress=None):
+    """
+    在工作池中执行内存转换，并记录解析、写入阶段的耗时等指标。
+    :param source: 输入内容，bytes 或（线程池模式下的）二进制文件对象。
+    :param filename: 原始文件名。
+    :param conversion_type: 转换类型。
+    :param retime: 可选的重新定时操作。
+    :param normalize: 可选的时间轴规范化。
+    :param request_progress: 可选的请求进度，转换过程中更新已转换的行数。
+    :return: (转换结果 bytes, 转换统计信息)。
+    :raises Exception: 转换过程中的任何异常，已计入错误指标。
+    """
+    with metrics.CONVERSIONS_IN_FLIGHT.track(conversion_type=conversion_type):
+        try:
+            output_bytes, stats = await worker_pool.run(
+                subtitle_converter.convert_bytes_with_stats, source, filename, conversion_type, retime,
+                _cue_callback(request_progress), normalize
+            )
+        except Exception as e:
+            metrics.record_error(conversion_type, e)
+            raise
+    metrics.record_conversion(conversion_type, stats)
+    _report_stats(request_progress, stats)
+    return output_bytes, stats
+
+
+def _cue_callback(request_progress):
+    """
+    :return: 转换的进度回调；没有请求进度，或在进程池模式下（回调无法跨进程传递）时为 None。
+    """
+    if request_progress is None or config.WORKER_MODE == 'process':
+        return None
+    return request_progress.report_cues
+
+
+def _timeline_headers(stats):
+    """
+    :return: 时间轴规范化报告的响应头 X-Timeline-Report，内容为报告中不含详细记录的统计部分（JSON）；
+             未规范化时为空字典。
+    """
+    if stats.timeline is None:
+        return {}
+    summary = {key: value for key, value in stats.timeline.items() if key != 'records'}
+    return {"X-Timeline-Report": json.dumps(summary, separators=(',', ':'))}
+
+
+def _report_stats(request_progress, stats):
+    """
+    转换完成后以统计信息更新请求进度（进程池模式下转换过程中没有进度回调，只在这里更新一次）。
+    """
+    if request_progress is not None:
+        request_progress.report_cues(stats.cues)
+        request_progress.report_output(stats.output_bytes)
+
+
+async def _convert_cached(cache, request, file, file_extension, output_file_name, conversion_type, retime=None,
+                          normalize=None, content_encoding=None, request_progress=None):
+    """
+    启用结果缓存时的内存转换路径：以上传内容的哈希计算缓存键，命中时直接返回缓存结果。
+    缓存键同时作为 ETag，因此客户端带着相同文件和 If-None-Match 重新请求时无需转换即可返回 304。
+    压缩上传以解压后的内容计算缓存键，与未压缩的上传共用缓存；压缩响应使用弱 ETag。
+    """
+    try:
+        content = await file.read()
+    except Exception as e:
+        logger.error(f"An error occurred while reading the upload. Error: {e}")
+        raise _to_http_exception(e)
+    logger.info(f"File received: {len(content)} bytes")
+    key = result_cache.make_key(
+        content, subtitle_converter.CONVERTER_VERSION, conversion_type, file_extension, config.XLSX_WRITER, retime,
+        normalize
+    )
+    etag = f'"{key}"' if content_encoding is None else f'W/"{key}"'
+
+    if _etag_matches(request.headers.get('if-none-match'), etag):
+        logger.info("If-None-Match matched, returning 304.")
+        return Response(status_code=304, headers={"ETag": etag})
+
+    cached = await run_in_threadpool(cache.get, key)
+    headers = {"ETag": etag}
+    if cached is not None:
+        logger.info(f"Result cache hit: {key}")
+        output_bytes, timeline_headers = _unpack_cached(cached)
+        headers["X-Cache"] = "HIT"
+        headers.update(timeline_headers)
+    else:
+        try:
+            output_bytes, stats = await _convert_bytes(content, file.filename, conversion_type, retime, normalize,
+                                                       request_progress)
+            logger.info("Conversion completed successfully by core logic.")
+        except Exception as e:
+            logger.error(f"An error occurred during in-memory conversion. Error: {e}")
+            raise _to_http_exception(e)
+        timeline_headers = _timeline_headers(stats)
+        await run_in_threadpool(cache.put, key, _pack_cached(output_bytes, timeline_headers))
+        headers["X-Cache"] = "MISS"
+        headers.update(timeline_headers)
+
+    return await _bytes_response(output_bytes, output_file_name, content_encoding, headers)
+
+
+def _pack_cached(output_bytes, timeline_headers):
+    """
+    把时间轴报告与转换结果打包为一个缓存条目，使两者一起淘汰、一起命中。
+    条目以报告的 JSON（未规范化时为空）和一个换行开头，其后是转换结果。
+    :param output_bytes: 转换结果的字节内容。
+    :param timeline_headers: _timeline_headers 返回的响应头字典。
+    :return: 缓存条目的字节内容。
+    """
+    report = timeline_headers.get("X-Timeline-Report", "")
+    return report.encode('utf-8') + b'\n' + output_bytes
+
+
+def _unpack_cached(data):
+    """
+    拆分 _pack_cached 打包的缓存条目。
+    :param data: 缓存条目的字节内容。
+    :return: (转换结果的字节内容, 时间轴报告的响应头字典)。
+    """
+    report, _, output_bytes = data.partition(b'\n')
+    if not report:
+        return output_bytes, {}
+    return output_bytes, {"X-Timeline-Report": report.decode('utf-8')}
+
+
+def _etag_matches(if_none_match, etag):
+    """
+    判断 If-None-Match 请求头是否与给定的 ETag 匹配（按弱比较，忽略 W/ 前缀）。
+    :param if_none_match: If-None-Match 请求头的值，可能为 None。
+    :param etag: 带引号的 ETag，可带 W/ 前缀。
+    :return: 是否匹配。
+    """
+    if not if_none_match:
+        return False
+    etag = etag.removeprefix('W/')
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _require_admin(token):
+    """
+    校验管理接口的访问令牌。
+    :param token: 请求头 X-Admin-Token 的值。
+    :raises HTTPException: 管理接口未启用 (未配置令牌) 或令牌不正确时。
+    """
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="管理接口未启用。")
+    if not token or not secrets.compare_digest(token.encode('utf-8'), config.ADMIN_TOKEN.encode('utf-8')):
+        raise HTTPException(status_code=403, detail="管理令牌无效。")
+
+
+def _require_cache():
+    """
+    :return: 全局结果缓存。
+    :raises HTTPException: 结果缓存未启用时。
+    """
+    cache = result_cache.get_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="结果缓存未启用。")
+    return cache
+
+
+@app.get("/api/cache/stats")
+async def cache_stats(x_admin_token: str = Header(None)):
+    """
+    查看结果缓存的命中率与占用情况（管理接口）。
+    """
+    _require_admin(x_admin_token)
+    return _require_cache().stats()
+
+
+@app.delete("/api/cache")
+async def purge_cache(x_admin_token: str = Header(None)):
+    """
+    清空全部结果缓存（管理接口）。
+    """
+    _require_admin(x_admin_token)
+    purged = await run_in_threadpool(_require_cache().purge)
+    return {"purged": purged}
+
+
+@app.delete("/api/cache/{key}")
+async def purge_cache_entry(key: str):
+    """
+    清除一条缓存的转换结果。key 即转换响应中 ETag 的值（不含引号），
+    只有持有原文件的人才能得到它，因此无需管理令牌，用户可以随时删除自己的转换结果。
+    """
+    key = key.strip('"')
+    if not result_cache.is_valid_key(key):
+        raise HTTPException(status_code=400, detail="无效的缓存键。")
+    purged = await run_in_threadpool(_require_cache().purge, key)
+    return {"purged": purged}
+
+
+def _require_profile(profile_id):
+    """
+    :return: 剖析结果。
+    :raises HTTPException: 剖析结果不存在或已被丢弃时 (404)。
+    """
+    result = profiling.get_store().get(profile_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="剖析结果不存在或已被丢弃。")
+    return result
+
+
+@app.get("/api/profiles")
+async def list_profiles(x_admin_token: str = Header(None)):
+    """
+    列出保存的剖析结果摘要，最新的在前（管理接口）。
+    """
+    _require_admin(x_admin_token)
+    return {"profiles": profiling.get_store().summaries()}
+
+
+@app.get("/api/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_admin_token: str = Header(None)):
+    """
+    查看剖析报告：各阶段的耗时、峰值内存、耗时最多的函数与占用内存最多的代码位置（管理接口）。
+    """
+    _require_admin(x_admin_token)
+    return _require_profile(profile_id).report
+
+
+@app.get("/api/profiles/{profile_id}/{phase}")
+async def download_profile(profile_id: str, phase: str, x_admin_token: str = Header(None)):
+    """
+    下载某个阶段 ('parse' 或 'write') 的 .prof 文件，可用 pstats、snakeviz 等工具打开（管理接口）。
+    """
+    _require_admin(x_admin_token)
+    result = _require_profile(profile_id)
+    if phase not in result.profiles:
+        raise HTTPException(status_code=404, detail=f"剖析阶段只能是 {'、'.join(profiling.PHASES)}。")
+    return Response(
+        content=result.profiles[phase],
+        media_type='application/octet-stream',
+        headers=_attachment_headers(f"{profile_id}-{phase}.prof")
+    )
+
+
+def _check_upload(filename, conversion_type):
+    """
+    检查转换类型是否受支持，以及文件扩展名是否与转换类型精确匹配。
+    :param filename: 上传的文件名。
+    :param conversion_type: 转换类型。
+    :return: 小写的文件扩展名。
+    :raises HTTPException: 转换类型不受支持或扩展名不匹配时。
+    """
+    conversion = formats.get_conversion(conversion_type)
+    if conversion is None:
         logger.error(f"Unsupported conversion type provided: {conversion_type}")
         raise HTTPException(status_code=400, detail=f"不支持的转换类型: {conversion_type}")
 
-    # 检查文件扩展名是否与转换类型精确匹配
-    original_filename = file.filename
-    original_stem = Path(original_filename).stem
-    file_extension = Path(original_filename).suffix.lower()
-    
-    if conversion_type == 'subtitle_to_excel' and file_extension not in ['.ass', '.srt']:
-        logger.error(f"File extension '{file_extension}' not supported for 'subtitle_to_excel'.")
-        raise HTTPException(status_code=400, detail="字幕转表格功能仅支持 .ass 和 .srt 文件。")
+    file_extension = Path(filename).suffix.lower()
+
+    if conversion.input_format(filename) is None:
+        logger.error(f"File extension '{file_extension}' is invalid for '{conversion_type}'.")
+        raise HTTPException(status_code=400, detail=f"该转换类型仅支持 {'、'.join(conversion.input_extensions)} 文件。")
 
-    if conversion_type == 'ass_to_srt' and file_extension != '.ass':
-        logger.error(f"File extension '{file_extension}' is invalid for 'ass_to_srt'.")
-        raise HTTPException(status_code=400, detail="ASS 转 SRT 功能仅支持 .ass 文件。")
+    return file_extension
 
-    if conversion_type == 'xlsx_to_srt' and file_extension != '.xlsx':
-        logger.error(f"File extension '{file_extension}' is invalid for 'xlsx_to_srt'.")
-        raise HTTPException(status_code=400, detail="表格转字幕功能仅支持 .xlsx 文件。")
 
-    # 2. 创建临时目录用于存放上传和输出文件
-    temp_dir = Path(tempfile.mkdtemp())
+def _retime_from_form(offset_ms, scale, source_fps, target_fps):
+    """
+    由表单字段构造重新定时操作。未填写的字段（含空字符串）视为未提供。
+    :return: Retime；所有字段都未提供或不改变任何时间时返回 None。
+    :raises HTTPException: 参数无效时 (400)。
+    """
+    scale, source_fps, target_fps = (value or None for value in (scale, source_fps, target_fps))
+    if not offset_ms and scale is None and source_fps is None and target_fps is None:
+        return None
+    try:
+        retime = Retime(offset_ms or 0, scale or 1, source_fps, target_fps)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return None if retime.is_identity else retime
+
+
+def _normalize_from_form(normalize, overlap_fix_ms, gap_fix_ms, min_duration_ms):
+    """
+    由表单字段构造时间轴规范化操作，未提供的字段使用配置中的默认值。
+    :return: Normalize；关闭规范化时返回 None。
+    :raises HTTPException: 阈值或最短时长为负数时 (400)。
+    """
+    if not (config.TIMELINE_NORMALIZE if normalize is None else normalize):
+        return None
+    try:
+        return Normalize(
+            config.TIMELINE_OVERLAP_FIX_MS if overlap_fix_ms is None else overlap_fix_ms,
+            config.TIMELINE_GAP_FIX_MS if gap_fix_ms is None else gap_fix_ms,
+            config.TIMELINE_MIN_DURATION_MS if min_duration_ms is None else min_duration_ms,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _attachment_headers(filename):
+    """
+    生成触发浏览器下载的 Content-Disposition 响应头，兼容非 ASCII 文件名。
+    :param filename: 下载文件名。
+    :return: 响应头字典。
+    """
+    quoted_filename = quote(filename)
+    if quoted_filename != filename:
+        return {"Content-Disposition": f"attachment; filename*=utf-8''{quoted_filename}"}
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+def _to_http_exception(e):
+    """
+    将转换过程中的异常映射为合适的 HTTP 异常。
+    :param e: 捕获到的异常。
+    :return: HTTPException 实例。
+    """
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, exceptions.InputTooLargeError):
+        return HTTPException(status_code=413, detail=str(e))
+    if isinstance(e, exceptions.SubtitleConverterError):
+        return HTTPException(status_code=400, detail=f"转换失败: {str(e)}")
+    return HTTPException(status_code=500, detail=f"处理请求时发生未预期的错误: {str(e)}")
+
+
+async def _convert_streaming(file, output_file_name, conversion_type, retime=None, normalize=None,
+                             content_encoding=None, request_progress=None):
+    """
+    超大文件的流式转换路径：流式解析上传流，并把写入器产出的字节块直接作为响应内容发送，
+    输入与输出都不需要完整地保存在内存或磁盘中。需要压缩时在工作线程中逐块压缩。
+    第一个字节块产出之前发生的错误（如表头错误、空文件）仍以 HTTP 错误返回；
+    之后发生的错误只能中断响应。
+    需要规范化时间轴的请求不走这条路径（见 convert_subtitle_file）。
+    """
+    source = _detach_upload(file)
+    # 流式转换只在线程池模式下使用，统计对象与工作线程共享，响应发送完毕后即可读取
+    stats = subtitle_converter.ConversionStats()
+    cue_callback = _cue_callback(request_progress)
+    if content_encoding is not None:
+        chunks = worker_pool.stream(compression.compress_chunks, content_encoding, subtitle_converter.iter_convert,
+                                    source, file.filename, conversion_type, stats=stats, retime=retime,
+                                    progress=cue_callback, normalize=normalize)
+    else:
+        chunks = worker_pool.stream(subtitle_converter.iter_convert, source, file.filename, conversion_type,
+                                    stats=stats, retime=retime, progress=cue_callback, normalize=normalize)
+    metrics.CONVERSIONS_IN_FLIGHT.inc(conversion_type=conversion_type)
+    try:
+        first_chunk = await anext(chunks, b'')
+    except Exception as e:
+        logger.error(f"An error occurred before streaming the converted file. Error: {e}")
+        metrics.record_error(conversion_type, e)
+        metrics.CONVERSIONS_IN_FLIGHT.dec(conversion_type=conversion_type)
+        await chunks.aclose()
+        source.close()
+        raise _to_http_exception(e)
+
+    async def body():
+        try:
+            yield first_chunk
+            async for chunk in chunks:
+                if request_progress is not None:
+                    request_progress.report_output(stats.output_bytes)
+                yield chunk
+        except Exception as e:
+            logger.error(f"Streaming conversion aborted. Error: {e}")
+            metrics.record_error(conversion_type, e)
+            raise
+        else:
+            metrics.record_conversion(conversion_type, stats)
+            _report_stats(request_progress, stats)
+        finally:
+            metrics.CONVERSIONS_IN_FLIGHT.dec(conversion_type=conversion_type)
+            await chunks.aclose()
+            source.close()
+
+    logger.info("Streaming converted file for download.")
+    headers = _attachment_headers(output_file_name)
+    headers.update(_encoding_headers(content_encoding))
+    return StreamingResponse(
+        body(),
+        media_type='application/octet-stream', # 通用二进制流，浏览器通常会触发下载
+        headers=headers
+    )
+
+
+def _detach_upload(file):
+    """
+    端点返回后 FastAPI 会关闭上传文件，而流式响应的内容仍在生成，
+    因此复制一个独立的文件描述符供响应生成期间读取，由调用方负责关闭。
+    仍在内存中的上传（SpooledTemporaryFile 尚未转存到磁盘）复制其内容，
+    取文件描述符会迫使它写入磁盘，小文件不应因此落盘。
+    :param file: 上传文件。
+    :return: 指向上传内容开头的二进制文件对象（压缩上传为解压流）。
+    """
+    if isinstance(file.file, compression.DecompressingReader):
+        return file.file.reopen()
+    # 与 Starlette 判断上传是否仍在内存中的方式相同
+    if not getattr(file.file, '_rolled', True):
+        file.file.seek(0)
+        return io.BytesIO(file.file.read())
+    source = os.fdopen(os.dup(file.file.fileno()), 'rb')
+    source.seek(0)
+    return source
+
+
+async def _convert_on_disk(file, file_extension, output_file_name, conversion_type, background_tasks, retime=None,
+                           normalize=None, content_encoding=None, request_progress=None):
+    """
+    超大文件的转换路径：将上传文件（压缩上传边解压边保存）保存到临时目录，转换后以 FileResponse 返回，
+    并在响应发送完毕后清理临时目录。需要压缩时先在工作池中压缩输出文件。
+    """
+    # 创建临时目录用于存放上传和输出文件；统一的前缀便于发现未清理的目录
+    temp_dir = Path(tempfile.mkdtemp(prefix="scriptgrid-"))
     
     try:
-        # 3. 保存上传的文件（使用安全的文件名）
+        # 保存上传的文件（使用安全的文件名）
         # 使用随机生成的安全文件名在服务器上保存文件
         secure_filename = f"{uuid.uuid4()}{file_extension}"
         input_file_path = temp_dir / secure_filename
-        with input_file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        with metrics.STAGE_SECONDS.time(stage="save", conversion_type=conversion_type):
+            with input_file_path.open("wb") as buffer:
+                await run_in_threadpool(shutil.copyfileobj, file.file, buffer)
         logger.info(f"File saved to temporary location: {input_file_path}")
 
-        # 4. 确定输出文件路径（使用原始文件名的词干）
-        if conversion_type == 'subtitle_to_excel':
-            output_file_name = f"{original_stem}.xlsx"
-        else: # 'ass_to_srt' or 'xlsx_to_srt'
-            output_file_name = f"{original_stem}.srt"
-        
         output_file_path = temp_dir / output_file_name
         logger.info(f"Output file will be saved to: {output_file_path}")
 
-        # 5. 调用核心转换逻辑
-        subtitle_converter.convert(str(input_file_path), str(output_file_path), conversion_type)
+        # 调用核心转换逻辑
+        with metrics.CONVERSIONS_IN_FLIGHT.track(conversion_type=conversion_type):
+            try:
+                stats = await worker_pool.run(
+                    subtitle_converter.convert, str(input_file_path), str(output_file_path), conversion_type,
+                    retime=retime, normalize=normalize
+                )
+            except Exception as e:
+                metrics.record_error(conversion_type, e)
+                raise
+        metrics.record_conversion(conversion_type, stats)
+        _report_stats(request_progress, stats)
         logger.info("Conversion completed successfully by core logic.")
 
-        # 6. 检查输出文件是否存在
+        # 检查输出文件是否存在
         if not output_file_path.exists():
             raise HTTPException(status_code=500, detail="转换过程未能生成输出文件。")
+        if content_encoding is not None:
+            output_file_path = Path(await worker_pool.run(compression.compress_file, str(output_file_path), content_encoding))
 
-        # 7. 返回文件响应
-        # 使用 FileResponse 直接返回文件，让浏览器处理下载
-        # media_type 根据文件扩展名自动推断
+        # 返回文件响应
         logger.info("Returning converted file for download.")
         
         # 将清理临时目录的任务添加到后台任务中
@@ -190,7 +868,8 @@ async def convert_subtitle_file(
         return FileResponse(
             path=str(output_file_path),
             filename=output_file_name,
-            media_type='application/octet-stream' # 通用二进制流，浏览器通常会触发下载
+            media_type='application/octet-stream', # 通用二进制流，浏览器通常会触发下载
+            headers={**_encoding_headers(content_encoding), **_timeline_headers(stats)}
         )
 
     except Exception as e:
@@ -202,14 +881,418 @@ async def convert_subtitle_file(
         except Exception as cleanup_error:
             logger.error(f"Failed to clean up temporary directory {temp_dir}: {cleanup_error}")
         
-        # 根据异常类型，重新抛出合适的 HTTP 异常
-        if isinstance(e, HTTPException):
-            raise e
-        if isinstance(e, exceptions.SubtitleConverterError):
-            raise HTTPException(status_code=400, detail=f"转换失败: {str(e)}")
-        
-        raise HTTPException(status_code=500, detail=f"处理请求时发生未预期的错误: {str(e)}")
+        raise _to_http_exception(e)
+
+
+@app.post("/api/convert/batch")
+async def convert_batch(
+    files: List[UploadFile] = File(...),
+    conversion_types: List[str] = Form(...)
+):
+    """
+    批量转换：接收多个文件（或一个 ZIP 压缩包），并行转换，并以 ZIP 压缩包流式返回结果。
+    每个文件完成后立即写入压缩包；单个文件失败不影响其他文件，失败原因记录在压缩包内的 manifest.json 中。
+
+    Args:
+        files (List[UploadFile]): 上传的文件；只上传一个 .zip 文件时，转换其中的所有文件。
+        conversion_types (List[str]): 转换类型。与 files 一一对应；只提供一个时应用于所有文件。
+            ZIP 上传只能提供一个转换类型。
+
+    Returns:
+        StreamingResponse: 转换结果的 ZIP 压缩包。
+
+    Raises:
+        HTTPException: 请求参数无效或 ZIP 文件无法读取时。
+    """
+    logger.info(f"Received batch conversion request: {len(files)} file(s), types={conversion_types}")
+    if len(conversion_types) not in (1, len(files)):
+        raise HTTPException(status_code=400, detail="转换类型的数量必须为 1 或与文件数量相同。")
+    if len(files) > config.BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"文件数超过上限 ({config.BATCH_MAX_FILES})。")
+    if len(conversion_types) == 1:
+        conversion_types = conversion_types * len(files)
+
+    sources = [_detach_upload(file) for file in files]
+    try:
+        if len(files) == 1 and Path(files[0].filename).suffix.lower() == '.zip':
+            items = await run_in_threadpool(batch.zip_items, sources[0], conversion_types[0], config.BATCH_MAX_FILES)
+        else:
+            items = [
+                batch.file_item(file.filename, conversion_type, source, file.size)
+                for file, conversion_type, source in zip(files, conversion_types, sources)
+            ]
+    except Exception as e:
+        for source in sources:
+            source.close()
+        if isinstance(e, ValueError):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise _to_http_exception(e)
+
+    async def body():
+        try:
+            async for chunk in batch.iter_zip(_iter_batch_results(items)):
+                yield chunk
+        finally:
+            for source in sources:
+                source.close()
+
+    return StreamingResponse(
+        body(),
+        media_type='application/zip',
+        headers=_attachment_headers("scriptgrid_batch.zip")
+    )
+
+
+@app.post("/api/convert/multi")
+async def convert_multi(
+    request: Request,
+    file: UploadFile = File(...),
+    conversion_types: List[str] = Form(...),
+    offset_ms: int = Form(None),
+    scale: str = Form(None),
+    source_fps: str = Form(None),
+    target_fps: str = Form(None),
+    normalize: bool = Form(None),
+    overlap_fix_ms: int = Form(None),
+    gap_fix_ms: int = Form(None),
+    min_duration_ms: int = Form(None)
+):
+    """
+    多目标转换：只上传、解析一次输入文件，同时输出多种格式（如 .ass 同时转为 .xlsx 与 .srt），以 ZIP 压缩包返回。
+
+    Args:
+        request (Request): 当前请求。
+        file (UploadFile): 用户上传的文件。
+        conversion_types (List[str]): 转换类型，可重复提交该字段指定多个；各类型必须都接受该文件的格式。
+        offset_ms, scale, source_fps, target_fps: 可选的重新定时参数，作用于所有输出，见 /api/retime。
+        normalize, overlap_fix_ms, gap_fix_ms, min_duration_ms: 可选的时间轴规范化参数，作用于所有输出，见 /api/convert。
+
+    Returns:
+        StreamingResponse: 包含各输出文件与 manifest.json 的 ZIP 压缩包；规范化了时间轴时附带 X-Timeline-Report。
+
+    Raises:
+        HTTPException: 转换类型或文件类型不受支持、文件过大或转换失败时。
+    """
+    logger.info(f"Received multi-target conversion request: types={conversion_types}, filename={file.filename}")
+    conversion_types = list(dict.fromkeys(conversion_types))
+    for conversion_type in conversion_types:
+        _check_upload(file.filename, conversion_type)
+    retime = _retime_from_form(offset_ms, scale, source_fps, target_fps)
+    normalize = _normalize_from_form(normalize, overlap_fix_ms, gap_fix_ms, min_duration_ms)
+    if file.size is not None and file.size > config.IN_MEMORY_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"文件过大，多目标转换的文件不能超过 {config.IN_MEMORY_MAX_BYTES} 字节。")
+
+    # 指标按组合后的转换类型记录，解析耗时只计一次
+    metrics_type = '+'.join(conversion_types)
+    request.state.conversion_type = metrics_type
+    _observe_receive(request, metrics_type, file.size)
+
+    source = await file.read() if config.WORKER_MODE == 'process' else file.file
+    with metrics.CONVERSIONS_IN_FLIGHT.track(conversion_type=metrics_type):
+        try:
+            outputs, stats = await worker_pool.run(
+                subtitle_converter.convert_multi, source, file.filename, conversion_types, retime, normalize
+            )
+        except Exception as e:
+            logger.error(f"An error occurred during multi-target conversion. Error: {e}")
+            metrics.record_error(metrics_type, e)
+            raise _to_http_exception(e)
+    metrics.record_conversion(metrics_type, stats)
+
+    async def results():
+        for conversion_type, output in zip(conversion_types, outputs):
+            yield batch.BatchItem(file.filename, conversion_type, file.size, None), output, None
+
+    return StreamingResponse(
+        batch.iter_zip(results()),
+        media_type='application/zip',
+        headers={**_attachment_headers(f"{Path(file.filename).stem}.zip"), **_timeline_headers(stats)}
+    )
+
+
+@app.post("/api/retime")
+async def retime_file(
+    request: Request,
+    file: UploadFile = File(...),
+    offset_ms: int = Form(None),
+    scale: str = Form(None),
+    source_fps: str = Form(None),
+    target_fps: str = Form(None)
+):
+    """
+    重新定时：对整份字幕统一平移、缩放或换算帧率，输出格式与输入相同（.ass 输出为 .srt）。
+    新时间 = 原时间 × scale × source_fps ÷ target_fps + offset_ms，小于 0 的时间按 0 处理。
+
+    Args:
+        request (Request): 当前请求。
+        file (UploadFile): 用户上传的文件。
+        offset_ms (int): 平移量（毫秒，可为负数）。
+        scale (str): 线性缩放系数，如 "1.001"。
+        source_fps (str): 原帧率，如 "23.976" 或 "24000/1001"；须与 target_fps 同时提供。
+        target_fps (str): 目标帧率，如 "25"。
+
+    Returns:
+        Response: 重新定时后的文件内容。
+
+    Raises:
+        HTTPException: 文件类型不支持、参数无效、文件过大或转换失败时。
+    """
+    logger.info(f"Received retime request: filename={file.filename}")
+    try:
+        output_format = subtitle_converter.retime_format(file.filename)
+    except exceptions.SubtitleConverterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    retime = _retime_from_form(offset_ms, scale, source_fps, target_fps) or Retime()
+    if file.size is not None and file.size > config.IN_MEMORY_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"文件过大，重新定时的文件不能超过 {config.IN_MEMORY_MAX_BYTES} 字节。")
+
+    metrics_type = "retime"
+    request.state.conversion_type = metrics_type
+    _observe_receive(request, metrics_type, file.size)
+
+    source = await file.read() if config.WORKER_MODE == 'process' else file.file
+    with metrics.CONVERSIONS_IN_FLIGHT.track(conversion_type=metrics_type):
+        try:
+            output_bytes, stats = await worker_pool.run(subtitle_converter.retime_bytes, source, file.filename, retime)
+        except Exception as e:
+            logger.error(f"An error occurred during retiming. Error: {e}")
+            metrics.record_error(metrics_type, e)
+            raise _to_http_exception(e)
+    metrics.record_conversion(metrics_type, stats)
 
+    return Response(
+        content=output_bytes,
+        media_type='application/octet-stream', # 通用二进制流，浏览器通常会触发下载
+        headers=_attachment_headers(f"{Path(file.filename).stem}{output_format.extension}")
+    )
+
+
+@app.post("/api/preview")
+async def preview_file(
+    file: UploadFile = File(...),
+    limit: int = Form(20),
+    start_ms: int = Form(None),
+    end_ms: int = Form(None)
+):
+    """
+    预览：流式解析上传的文件，返回前 limit 条字幕（或 [start_ms, end_ms) 时间窗口内的字幕）与整份文件的统计信息，
+    不生成输出文件，比完整转换后下载快得多。
+
+    Args:
+        file (UploadFile): 用户上传的文件，任何可读取的格式。
+        limit (int): 最多返回的字幕条数，不超过 PREVIEW_MAX_CUES。
+        start_ms (int): 可选的时间窗口开始时间（毫秒）。
+        end_ms (int): 可选的时间窗口结束时间（毫秒），不提供表示到文件结尾。
+
+    Returns:
+        dict: format、stats（条数、总时长、重叠与间隔）、window、cues 与 truncated。
+
+    Raises:
+        HTTPException: 参数无效、文件类型不支持、文件过大或解析失败时。
+    """
+    logger.info(f"Received preview request: filename={file.filename}, limit={limit}, window=[{start_ms}, {end_ms})")
+    if not 1 <= limit <= config.PREVIEW_MAX_CUES:
+        raise HTTPException(status_code=400, detail=f"limit 必须在 1 到 {config.PREVIEW_MAX_CUES} 之间。")
+    # 线程池模式下直接流式读取上传流；进程池模式下需要整体读入内存，因此限制文件大小
+    if config.WORKER_MODE == 'process':
+        if file.size is not None and file.size > config.IN_MEMORY_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"文件过大，预览的文件不能超过 {config.IN_MEMORY_MAX_BYTES} 字节。")
+        source = await file.read()
+    else:
+        source = file.file
+    try:
+        return await worker_pool.run(preview.preview, source, file.filename, limit, start_ms, end_ms)
+    except exceptions.SubtitleConverterError as e:
+        logger.error(f"An error occurred during preview. Error: {e}")
+        raise HTTPException(status_code=400, detail=f"预览失败: {e}")
+    except Exception as e:
+        logger.error(f"An error occurred during preview. Error: {e}")
+        raise _to_http_exception(e)
+
+
+async def _iter_batch_results(items):
+    """
+    并行转换批次中的所有条目，按完成顺序产出结果。
+    同时读入内存的条目数不超过 MAX_CONCURRENT_CONVERSIONS，避免一次性加载整个批次。
+    :param items: BatchItem 列表。
+    :return: 异步生成器，产出 (BatchItem, 转换结果 bytes 或 None, 错误信息 或 None)。
+    """
+    limit = asyncio.Semaphore(max(1, config.MAX_CONCURRENT_CONVERSIONS))
+    # 批量转换不接受额外参数，时间轴规范化按配置的默认值执行
+    normalize = _normalize_from_form(None, None, None, None)
+
+    async def convert_item(item):
+        try:
+            _check_upload(item.name, item.conversion_type)
+            if item.size is not None and item.size > config.IN_MEMORY_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"文件过大，批量转换中单个文件不能超过 {config.IN_MEMORY_MAX_BYTES} 字节。")
+            async with limit:
+                content = await run_in_threadpool(item.load)
+                metrics.INPUT_BYTES.inc(len(content), conversion_type=item.conversion_type)
+                output, _ = await _convert_bytes(content, item.name, item.conversion_type, normalize=normalize)
+            return item, output, None
+        except Exception as e:
+            logger.error(f"Batch item {item.name} failed. Error: {e}")
+            return item, None, _to_http_exception(e).detail
+
+    tasks = [asyncio.ensure_future(convert_item(item)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 客户端中途断开时，取消尚未开始的转换
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(
+    request: Request,
+    file: UploadFile = File(...),
+    conversion_type: str = Form(...),
+    offset_ms: int = Form(None),
+    scale: str = Form(None),
+    source_fps: str = Form(None),
+    target_fps: str = Form(None),
+    normalize: bool = Form(None),
+    overlap_fix_ms: int = Form(None),
+    gap_fix_ms: int = Form(None),
+    min_duration_ms: int = Form(None)
+):
+    """
+    提交异步转换任务：保存上传文件后立即返回任务 ID，转换在后台执行。
+    请求只需等待上传完成，不受转换耗时影响。
+    可选的重新定时与时间轴规范化参数同 /api/convert；任务成功后状态中的 timeline 为规范化报告。
+
+    Returns:
+        dict: 任务状态，包含 job_id 以及查询状态、下载结果的地址。
+
+    Raises:
+        HTTPException: 文件类型不支持 (400)，或同时保存的任务数已达上限 (503)。
+    """
+    logger.info(f"Received job submission: type={conversion_type}, filename={file.filename}")
+    _check_upload(file.filename, conversion_type)
+    retime = _retime_from_form(offset_ms, scale, source_fps, target_fps)
+    normalize = _normalize_from_form(normalize, overlap_fix_ms, gap_fix_ms, min_duration_ms)
+    request.state.conversion_type = conversion_type
+    _observe_receive(request, conversion_type, file.size)
+
+    store = jobs.get_store()
+    try:
+        job = store.create(file.filename, conversion_type, retime, normalize)
+    except jobs.JobLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    try:
+        with metrics.STAGE_SECONDS.time(stage="save", conversion_type=conversion_type):
+            await run_in_threadpool(_save_upload, file, job.input_path)
+    except Exception as e:
+        store.remove(job.id)
+        logger.error(f"Failed to save upload for job {job.id}. Error: {e}")
+        raise _to_http_exception(e)
+
+    job.task = asyncio.create_task(jobs.execute(job))
+    logger.info(f"Job {job.id} submitted.")
+    return _job_response(job, store)
+
+
+def _save_upload(file, path):
+    """
+    将上传文件保存到指定路径（同步，在线程池中执行）。
+    """
+    file.file.seek(0)
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+
+def _job_response(job, store):
+    """
+    :return: 任务状态字典，附带状态与结果的访问地址。
+    """
+    data = job.to_dict(store.ttl_seconds)
+    data["status_url"] = f"/api/jobs/{job.id}"
+    if job.status == jobs.SUCCEEDED:
+        data["result_url"] = f"/api/jobs/{job.id}/result"
+    return data
+
+
+def _get_job(job_id):
+    """
+    :return: 任务。
+    :raises HTTPException: 任务不存在或已过期时 (404)。
+    """
+    store = jobs.get_store()
+    job = store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期。")
+    return job, store
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    查询任务状态与进度（已转换的字幕行数）。
+    """
+    job, store = _get_job(job_id)
+    return _job_response(job, store)
+
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    下载已完成任务的转换结果。在结果过期前可以重复下载。
+
+    Raises:
+        HTTPException: 任务尚未完成 (409)，或任务失败 (400/500，与同步转换接口一致)。
+    """
+    job, _ = _get_job(job_id)
+    if job.status == jobs.FAILED:
+        raise _to_http_exception(job.exception)
+    if job.status != jobs.SUCCEEDED:
+        raise HTTPException(status_code=409, detail="任务尚未完成。", headers={"Retry-After": "2"})
+    return FileResponse(
+        path=str(job.output_path),
+        filename=job.output_name,
+        media_type='application/octet-stream' # 通用二进制流，浏览器通常会触发下载
+    )
+
+
+@app.delete("/api/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """
+    删除任务及其结果；任务仍在执行时中止转换。
+    """
+    if not jobs.get_store().remove(job_id):
+        raise HTTPException(status_code=404, detail="任务不存在或已过期。")
+    return {"deleted": True}
+
+
+@app.get("/api/progress/{progress_id}")
+async def progress_events(progress_id: str):
+    """
+    以 Server-Sent Events 推送带有相同 X-Progress-Id 请求头的转换请求的进度。
+    可以在发出转换请求之前订阅；请求结束（phase 为 done 或 failed）后事件流随之结束。
+
+    Raises:
+        HTTPException: 进度 ID 格式无效 (400)。
+    """
+    request_progress = progress.get_store().get_or_create(progress_id)
+    if request_progress is None:
+        raise HTTPException(status_code=400, detail="进度 ID 须为 8~64 个字母、数字、下划线或连字符。")
+    return StreamingResponse(
+        progress.iter_events(request_progress),
+        media_type='text/event-stream',
+        # 禁止缓存，并要求反向代理（如 nginx）不缓冲事件流
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """
+    以 Prometheus 文本格式输出运行指标。
+    """
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
 
 
 # --- 应用启动配置 ---
@@ -0,0 +1,158 @@
+"""
+批量转换模块
+把多个上传文件（或一个 ZIP 压缩包中的文件）整理为转换条目，并把各条目的转换结果边完成边打包为 ZIP 流式输出。
+单个文件转换失败不会中断整个批次，失败原因记录在压缩包内的 manifest.json 中。
+"""
+
+import json
+import posixpath
+import time
+import zipfile
+
+from fastapi.concurrency import run_in_threadpool
+
+import subtitle_converter
+from xlsx_stream import StreamBuffer
+
+MANIFEST_NAME = "manifest.json"
+
+# 输出已经是压缩格式的扩展名，打包时不再重复压缩
+_STORED_EXTENSIONS = ('.xlsx', '.zip')
+
+
+class BatchItem:
+    """
+    批次中的一个待转换文件。
+    """
+    __slots__ = ('name', 'conversion_type', 'size', 'load')
+
+    def __init__(self, name, conversion_type, size, load):
+        """
+        :param name: 文件名，可能带有压缩包内的相对目录。
+        :param conversion_type: 转换类型。
+        :param size: 文件大小（字节），未知时为 None。
+        :param load: 无参数的同步函数，返回文件的完整内容 (bytes)。
+        """
+        self.name = name
+        self.conversion_type = conversion_type
+        self.size = size
+        self.load = load
+
+
+def file_item(name, conversion_type, fileobj, size=None):
+    """
+    为一个上传文件生成转换条目。
+    :param name: 文件名。
+    :param conversion_type: 转换类型。
+    :param fileobj: 可 seek 的二进制文件对象，条目被处理时才读取其内容。
+    :param size: 文件大小（字节），未知时为 None。
+    :return: BatchItem。
+    """
+    def load():
+        fileobj.seek(0)
+        return fileobj.read()
+    return BatchItem(name, conversion_type, size, load)
+
+
+def _safe_member_name(name):
+    """
+    规范化压缩包内的文件名，去除绝对路径与 ".." 等可能逃逸出压缩包根目录的部分。
+    :param name: ZIP 条目名。
+    :return: 规范化后的相对路径；无法得到有效文件名时返回空字符串。
+    """
+    parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.', '..')]
+    return '/'.join(parts)
+
+
+def _is_metadata_member(name):
+    """
+    判断 ZIP 条目是否为操作系统生成的元数据文件（如 macOS 的 __MACOSX 目录与 ._ 前缀文件）。
+    """
+    return name.startswith('__MACOSX/') or posixpath.basename(name).startswith(('._', '.DS_Store'))
+
+
+def zip_items(fileobj, conversion_type, max_files):
+    """
+    读取上传的 ZIP 压缩包的目录，为其中每个文件生成一个转换条目。
+    只读取中央目录，文件内容在条目被处理时才解压。
+    :param fileobj: 可 seek 的 ZIP 文件对象。
+    :param conversion_type: 应用于压缩包内所有文件的转换类型。
+    :param max_files: 允许的最大文件数。
+    :return: BatchItem 列表。
+    :raises ValueError: 压缩包无效或文件数超过上限时。
+    """
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"无效的 ZIP 文件: {e}") from e
+
+    items = []
+    for info in archive.infolist():
+        if info.is_dir() or _is_metadata_member(info.filename):
+            continue
+        name = _safe_member_name(info.filename)
+        if not name:
+            continue
+        if len(items) >= max_files:
+            raise ValueError(f"压缩包中的文件数超过上限 ({max_files})。")
+        items.append(BatchItem(name, conversion_type, info.file_size, lambda info=info: archive.read(info)))
+    if not items:
+        raise ValueError("压缩包中没有可转换的文件。")
+    return items
+
+
+class _UniqueNames:
+    """为输出文件分配在压缩包内唯一的名称，重名时追加 " (2)"、" (3)" 等后缀。"""
+
+    def __init__(self):
+        self._used = {MANIFEST_NAME}
+
+    def allocate(self, name):
+        stem, ext = posixpath.splitext(name)
+        candidate, n = name, 1
+        while candidate.lower() in self._used:
+            n += 1
+            candidate = f"{stem} ({n}){ext}"
+        self._used.add(candidate.lower())
+        return candidate
+
+
+def _zip_info(name):
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_STORED if name.lower().endswith(_STORED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+    return info
+
+
+async def iter_zip(results):
+    """
+    把逐个完成的转换结果打包为 ZIP，并以异步生成器的方式逐块产出压缩包字节。
+    每写入一个文件就产出一次，客户端无需等待整个批次完成即可开始接收。
+    :param results: 异步可迭代对象，产出 (BatchItem, 转换结果 bytes 或 None, 错误信息 或 None)。
+    :return: 异步生成器，产出 ZIP 文件的字节块；最后一个条目为 manifest.json。
+    """
+    buffer = StreamBuffer()
+    names = _UniqueNames()
+    manifest = []
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        async for item, output, error in results:
+            record = {"input": item.name, "conversion_type": item.conversion_type}
+            if error is None:
+                directory, basename = posixpath.split(item.name)
+                arcname = names.allocate(posixpath.join(directory, subtitle_converter.output_filename(basename, item.conversion_type)))
+                # 压缩在线程池中进行，避免阻塞事件循环
+                await run_in_threadpool(archive.writestr, _zip_info(arcname), output)
+                record.update(status="ok", output=arcname)
+            else:
+                record.update(status="error", error=error)
+            manifest.append(record)
+            data = buffer.drain()
+            if data:
+                yield data
+
+        summary = {
+            "succeeded": sum(1 for record in manifest if record["status"] == "ok"),
+            "failed": sum(1 for record in manifest if record["status"] == "error"),
+            "files": manifest,
+        }
+        archive.writestr(_zip_info(MANIFEST_NAME), json.dumps(summary, ensure_ascii=False, indent=2))
+    yield buffer.drain()
@@ -0,0 +1,4 @@
+"""
+性能基准测试
+在仓库根目录下运行: python -m benchmarks.run
+"""
@@ -0,0 +1,157 @@
+"""
+基准测试语料生成模块
+生成确定性的 SRT、ASS、XLSX 语料：相同的条数与随机种子总是得到完全相同的文件，
+因此不同时间、不同机器上的测试结果可以直接比较。
+"""
+
+import os
+import random
+
+import xlsx_stream
+from cues import Cue, format_srt_time
+
+# 语料生成规则变化时递增，使缓存的旧语料失效
+CORPUS_VERSION = 1
+DEFAULT_SEED = 20240601
+
+_WORDS = (
+    "我们", "今天", "出发", "等一下", "为什么", "不可能", "快走", "小心", "真的吗", "谢谢",
+    "hello", "wait", "over there", "come on", "let's go", "really", "sorry", "right now",
+    "这里", "那边", "明天见", "没关系", "你好", "再见", "一起", "终于", "听我说", "别担心",
+)
+
+# ASS 覆盖标签，模拟特效字幕中常见的大量样式代码
+_ASS_TAGS = (
+    r"{\an8}", r"{\i1}", r"{\b1}", r"{\fad(200,200)}", r"{\pos(960,1000)}",
+    r"{\c&H00FFFF&\3c&H000000&\bord3\shad1}", r"{\fs48\fnMicrosoft YaHei}",
+    r"{\move(100,200,800,200,0,1500)\blur2}", r"{\t(0,500,\fscx120\fscy120)}",
+    r"{\k25}", r"{\k40}", r"{\1a&H80&}", r"{\clip(0,0,1920,540)}",
+)
+
+_ASS_HEADER = (
+    "[Script Info]",
+    "; Synthetic benchmark corpus",
+    "Title: ScriptGrid Benchmark",
+    "ScriptType: v4.00+",
+    "PlayResX: 1920",
+    "PlayResY: 1080",
+    "",
+    "[V4+ Styles]",
+    "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
+    "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+    "MarginL, MarginR, MarginV, Encoding",
+    "Style: Default,Arial,48,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,1,2,10,10,10,1",
+    "Style: Top,Arial,40,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,1,8,10,10,10,1",
+    "",
+    "[Events]",
+    "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+)
+
+
+def _sentence(rng):
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 9)))
+
+
+def generate_cues(count, seed=DEFAULT_SEED):
+    """
+    生成确定性的字幕序列：时间单调递增，约三分之一为两行文本。
+    :param count: 字幕条数。
+    :param seed: 随机种子。
+    :return: 生成器，依次产出 Cue。
+    """
+    rng = random.Random(seed)
+    start = 1000
+    for index in range(1, count + 1):
+        start += rng.randint(0, 4000)
+        end = start + rng.randint(500, 6000)
+        lines = [_sentence(rng)]
+        if rng.random() < 0.33:
+            lines.append(_sentence(rng))
+        yield Cue(index, start, end, "\n".join(lines))
+        start = end
+
+
+def _ass_time(ms):
+    """ASS 时间码：H:MM:SS.cc（百分之一秒）。"""
+    centiseconds = ms // 10
+    seconds, cs = divmod(centiseconds, 100)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}.{cs:02d}"
+
+
+def _ass_text(rng, text):
+    # 每行前后随机插入覆盖标签，行间使用 \N；文本中保留逗号，检验 Text 字段的切分
+    parts = []
+    for line in text.split("\n"):
+        tags = "".join(rng.choice(_ASS_TAGS) for _ in range(rng.randint(1, 4)))
+        if rng.random() < 0.3:
+            line = line.replace(" ", ", ", 1)
+        parts.append(tags + line + (rng.choice(_ASS_TAGS) if rng.random() < 0.5 else ""))
+    return r"\N".join(parts)
+
+
+def write_srt(path, count, seed=DEFAULT_SEED):
+    """
+    生成 SRT 语料（LF 换行）。
+    :param path: 输出路径。
+    :param count: 字幕条数。
+    :param seed: 随机种子。
+    """
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for cue in generate_cues(count, seed):
+            f.write(f"{cue.index}\n{format_srt_time(cue.start)} --> {format_srt_time(cue.end)}\n{cue.text}\n\n")
+
+
+def write_ass(path, count, seed=DEFAULT_SEED):
+    """
+    生成 ASS 语料：CRLF 换行，带 BOM，文本包含大量覆盖标签与 \\N 换行，夹杂注释行。
+    :param path: 输出路径。
+    :param count: Dialogue 行数。
+    :param seed: 随机种子。
+    """
+    rng = random.Random(seed + 1)
+    with open(path, 'w', encoding='utf-8-sig', newline='\r\n') as f:
+        for line in _ASS_HEADER:
+            f.write(line + "\n")
+        for cue in generate_cues(count, seed):
+            if rng.random() < 0.02:
+                f.write(f"Comment: 0,{_ass_time(cue.start)},{_ass_time(cue.end)},Default,,0,0,0,,note\n")
+            style = "Top" if rng.random() < 0.1 else "Default"
+            f.write(f"Dialogue: 0,{_ass_time(cue.start)},{_ass_time(cue.end)},{style},,0,0,0,,"
+                    f"{_ass_text(rng, cue.text)}\n")
+
+
+def write_xlsx(path, count, seed=DEFAULT_SEED):
+    """
+    生成 XLSX 语料（与应用导出的表格格式相同）。
+    :param path: 输出路径。
+    :param count: 字幕条数。
+    :param seed: 随机种子。
+    """
+    xlsx_stream.write_xlsx(generate_cues(count, seed), path)
+
+
+_GENERATORS = {
+    'srt': write_srt,
+    'ass': write_ass,
+    'xlsx': write_xlsx,
+}
+
+
+def ensure_corpus(directory, kind, count, seed=DEFAULT_SEED):
+    """
+    获取语料文件路径，不存在时生成。文件名包含语料版本、条数与种子，生成规则变化后不会误用旧文件。
+    :param directory: 语料缓存目录。
+    :param kind: 'srt'、'ass' 或 'xlsx'。
+    :param count: 字幕条数。
+    :param seed: 随机种子。
+    :return: 语料文件路径。
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"v{CORPUS_VERSION}-{count}-{seed}.{kind}")
+    if not os.path.exists(path):
+        temp_path = path + ".tmp"
+        _GENERATORS[kind](temp_path, count, seed)
+        os.replace(temp_path, path)
+    return path
@@ -0,0 +1,490 @@
+"""
+HTTP 压力测试入口
+按给定的转换类型与文件规模组合向 /api/convert 并发发送请求，报告吞吐量、p50/p95/p99 延迟、
+按状态码统计的错误率、事件循环延迟，以及请求结束后未清理的临时目录。
+默认在进程内通过 ASGI 传输直接调用应用（不经过网络，但经过完整的中间件、准入控制与工作池），
+也可以用 --url 压测本机已启动的 uvicorn。
+需要额外安装 httpx（pip install httpx），服务端本身不依赖它。
+
+在仓库根目录下运行:
+    python -m benchmarks.loadtest                                        # 进程内，8 并发，200 个请求
+    python -m benchmarks.loadtest --mix ass_to_srt:1000:3 subtitle_to_excel:10000:1 --duration 30
+    python -m benchmarks.loadtest --rate 50 --duration 20                # 开环：每秒 50 个请求
+    SCRIPTGRID_WORKER_MODE=process SCRIPTGRID_WORKER_COUNT=4 python -m benchmarks.loadtest -o load.json
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000            # 压测已启动的服务
+"""
+
+import argparse
+import asyncio
+import collections
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+try:
+    import httpx
+except ImportError:  # httpx 只是压力测试的依赖，服务端不需要
+    sys.exit("benchmarks.loadtest 需要 httpx，请先运行: pip install httpx")
+
+import formats
+import subtitle_converter
+from benchmarks.corpus import DEFAULT_SEED, ensure_corpus
+from benchmarks.run import DEFAULT_CORPUS_DIR
+
+DEFAULT_MIX = ("ass_to_srt:1000", "subtitle_to_excel:1000", "subtitle_to_vtt:10000")
+# 服务端临时目录的公共前缀（app.py 与 jobs.py 创建的临时目录都以它开头）
+TEMP_DIR_PREFIX = "scriptgrid-"
+# 语料生成器直接支持的输入格式；其余输入格式由 SRT 语料转换得到
+_CORPUS_KINDS = ("srt", "ass", "xlsx")
+_CONTENT_TYPES = {
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+class MixEntry:
+    """
+    请求组合中的一项：转换类型、输入文件规模与权重。
+    """
+    __slots__ = ('conversion_type', 'cues', 'weight', 'filename', 'data')
+
+    def __init__(self, conversion_type, cues, weight):
+        self.conversion_type = conversion_type
+        self.cues = cues
+        self.weight = weight
+        self.filename = None
+        self.data = None
+
+    @property
+    def label(self):
+        return f"{self.conversion_type}@{self.cues}"
+
+
+def parse_mix(specs):
+    """
+    解析请求组合。
+    :param specs: "转换类型[:字幕条数[:权重]]" 字符串的序列，条数默认 1000，权重默认 1。
+    :return: MixEntry 列表。
+    :raises ValueError: 转换类型不存在或数值无效时。
+    """
+    entries = []
+    for spec in specs:
+        parts = spec.split(':')
+        if len(parts) > 3 or formats.get_conversion(parts[0]) is None:
+            raise ValueError(f"无效的请求组合项: {spec!r}")
+        try:
+            cues = int(parts[1]) if len(parts) > 1 else 1000
+            weight = float(parts[2]) if len(parts) > 2 else 1.0
+        except ValueError:
+            raise ValueError(f"无效的请求组合项: {spec!r}") from None
+        if cues <= 0 or weight <= 0:
+            raise ValueError(f"字幕条数与权重必须大于 0: {spec!r}")
+        entries.append(MixEntry(parts[0], cues, weight))
+    return entries
+
+
+def _input_file(corpus_dir, conversion_type, cues):
+    """
+    获取转换类型可接受的输入文件，不存在时生成。
+    :return: 输入文件路径。
+    """
+    conversion = formats.get_conversion(conversion_type)
+    for fmt in conversion.inputs:
+        if fmt.name in _CORPUS_KINDS:
+            return ensure_corpus(corpus_dir, fmt.name, cues)
+    # 语料生成器不支持的输入格式（VTT、CSV 等）由 SRT 语料转换得到，同样缓存在语料目录中
+    fmt = conversion.inputs[0]
+    srt_path = ensure_corpus(corpus_dir, "srt", cues)
+    path = os.path.splitext(srt_path)[0] + fmt.extension
+    if not os.path.exists(path):
+        temp_path = path + ".tmp" + fmt.extension
+        subtitle_converter.convert(srt_path, temp_path, f"subtitle_to_{fmt.name}")
+        os.replace(temp_path, path)
+    return path
+
+
+def load_inputs(entries, corpus_dir):
+    """
+    读取每个组合项的输入文件内容，压测期间直接从内存上传。
+    """
+    for entry in entries:
+        path = _input_file(corpus_dir, entry.conversion_type, entry.cues)
+        entry.filename = f"load-{entry.cues}{os.path.splitext(path)[1]}"
+        with open(path, 'rb') as f:
+            entry.data = f.read()
+
+
+def percentile(sorted_values, fraction):
+    """
+    最近秩法求百分位数。
+    :param sorted_values: 已排序的数值列表。
+    :param fraction: 0 到 1 之间的比例，如 0.95。
+    :return: 百分位数；列表为空时返回 None。
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, int(len(sorted_values) * fraction + 0.999999))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _latency_summary(latencies):
+    values = sorted(latencies)
+    if not values:
+        return None
+    return {
+        "mean": statistics.fmean(values) * 1000,
+        "p50": percentile(values, 0.50) * 1000,
+        "p95": percentile(values, 0.95) * 1000,
+        "p99": percentile(values, 0.99) * 1000,
+        "max": values[-1] * 1000,
+    }
+
+
+def _temp_dirs():
+    """
+    :return: 系统临时目录中以 TEMP_DIR_PREFIX 开头的目录名集合。
+    """
+    directory = tempfile.gettempdir()
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return set()
+    return {name for name in names
+            if name.startswith(TEMP_DIR_PREFIX) and os.path.isdir(os.path.join(directory, name))}
+
+
+class _LoopMonitor:
+    """
+    测量事件循环延迟：周期性休眠，记录实际唤醒时间比预期晚多少。
+    转换或序列化阻塞了事件循环时，这里的最大值会明显升高。
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+class _Clients:
+    """
+    模拟多个客户端。准入控制按客户端地址限制并发，所有请求来自同一地址时会被单客户端上限拒绝。
+    进程内压测时每个模拟客户端使用不同的 ASGI 客户端地址；
+    压测外部服务时通过 X-Forwarded-For 区分（服务端须设置 SCRIPTGRID_TRUST_FORWARDED_FOR=1）。
+    """
+
+    def __init__(self, count, url, app, timeout):
+        self._clients = []
+        for i in range(count):
+            address = f"10.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}"
+            if app is not None:
+                transport = httpx.ASGITransport(app=app, client=(address, 40000 + i % 20000))
+                client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout)
+            else:
+                client = httpx.AsyncClient(base_url=url, timeout=timeout,
+                                           headers={"X-Forwarded-For": address})
+            self._clients.append(client)
+
+    def __getitem__(self, i):
+        return self._clients[i % len(self._clients)]
+
+    async def aclose(self):
+        for client in self._clients:
+            await client.aclose()
+
+
+async def _send(client, entry, started, records):
+    """
+    发送一个转换请求并记录结果。
+    :param started: 计时起点；开环模式下为计划发送时间，避免压测端自身的延迟掩盖服务端排队。
+    """
+    extension = os.path.splitext(entry.filename)[1]
+    files = {"file": (entry.filename, entry.data, _CONTENT_TYPES.get(extension, "application/octet-stream"))}
+    record = {"label": entry.label, "status": None, "error": None, "bytes": 0}
+    try:
+        response = await client.post("/api/convert", files=files, data={"conversion_type": entry.conversion_type})
+        record["status"] = response.status_code
+        record["bytes"] = len(response.content)
+        if response.status_code != 200:
+            record["error"] = f"http_{response.status_code}"
+    except httpx.HTTPError as e:
+        record["error"] = type(e).__name__
+    record["seconds"] = time.perf_counter() - started
+    records.append(record)
+
+
+async def _closed_loop(clients, entries, rng, concurrency, total, deadline, records):
+    """
+    闭环压测：concurrency 个工作协程，各自在上一个请求完成后立即发送下一个。
+    """
+    weights = [entry.weight for entry in entries]
+    sent = 0
+
+    async def worker(i):
+        nonlocal sent
+        while (total is None or sent < total) and (deadline is None or time.perf_counter() < deadline):
+            sent += 1
+            entry = rng.choices(entries, weights)[0]
+            await _send(clients[i], entry, time.perf_counter(), records)
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+
+async def _open_loop(clients, entries, rng, rate, total, deadline, records):
+    """
+    开环压测：按固定速率发送请求，不等待之前的请求完成。服务端处理不过来时，
+    在途请求数与延迟会持续增长，而不是像闭环压测那样自动降低发送速率。
+    """
+    weights = [entry.weight for entry in entries]
+    tasks = []
+    start = time.perf_counter()
+    i = 0
+    while total is None or i < total:
+        scheduled = start + i / rate
+        if deadline is not None and scheduled >= deadline:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        entry = rng.choices(entries, weights)[0]
+        tasks.append(asyncio.ensure_future(_send(clients[i], entry, scheduled, records)))
+        i += 1
+    await asyncio.gather(*tasks)
+
+
+async def _run(entries, url, concurrency, rate, requests, duration, clients, timeout, seed):
+    """
+    :return: (请求记录列表, 压测耗时（秒）, 事件循环延迟列表或 None)。
+    """
+    app = None
+    if url is None:
+        from app import app
+    rng = random.Random(seed)
+    records = []
+    monitor = None
+
+    async def drive():
+        pool = _Clients(clients, url, app, timeout)
+        try:
+            start = time.perf_counter()
+            deadline = start + duration if duration else None
+            if rate is None:
+                await _closed_loop(pool, entries, rng, concurrency, requests, deadline, records)
+            else:
+                await _open_loop(pool, entries, rng, rate, requests, deadline, records)
+            return time.perf_counter() - start
+        finally:
+            await pool.aclose()
+
+    if app is None:
+        return records, await drive(), None
+    async with app.router.lifespan_context(app):
+        monitor = _LoopMonitor()
+        monitor.start()
+        try:
+            elapsed = await drive()
+        finally:
+            await monitor.stop()
+    return records, elapsed, monitor.lags
+
+
+def _summarize(records, elapsed):
+    ok = [r for r in records if r["status"] == 200]
+    return {
+        "requests": len(records),
+        "ok": len(ok),
+        "errors": len(records) - len(ok),
+        "error_rate": (len(records) - len(ok)) / len(records) if records else 0.0,
+        "throughput_rps": len(records) / elapsed if elapsed > 0 else None,
+        "ok_throughput_rps": len(ok) / elapsed if elapsed > 0 else None,
+        "latency_ms": _latency_summary([r["seconds"] for r in ok]),
+        "error_latency_ms": _latency_summary([r["seconds"] for r in records if r["status"] != 200]),
+        "bytes_out": sum(r["bytes"] for r in ok),
+        "errors_by_kind": dict(collections.Counter(r["error"] for r in records if r["error"])),
+    }
+
+
+def run(mix=DEFAULT_MIX, url=None, concurrency=8, rate=None, requests=200, duration=None, clients=None,
+        timeout=120.0, leak_grace=5.0, corpus_dir=DEFAULT_CORPUS_DIR, seed=DEFAULT_SEED, log=print):
+    """
+    执行压力测试。
+    :param mix: 请求组合，格式见 parse_mix。
+    :param url: 外部服务地址；为 None 时在进程内压测。
+    :param concurrency: 闭环模式的并发数。
+    :param rate: 开环模式的请求速率（每秒）；为 None 时使用闭环模式。
+    :param requests: 请求总数；为 None 时只受 duration 限制。
+    :param duration: 最长压测时间（秒）；为 None 时只受 requests 限制。
+    :param clients: 模拟的客户端数，默认与并发数相同（开环模式下不少于每秒请求数）。
+    :param timeout: 单个请求的超时时间（秒）。
+    :param leak_grace: 压测结束后等待临时目录被清理的最长时间（秒）；小于 0 时不检查。
+                       压测外部服务时只有服务运行在本机才有意义。
+    :param corpus_dir: 语料缓存目录。
+    :param seed: 选择请求组合项使用的随机种子。
+    :param log: 进度输出函数。
+    :return: 结果字典，可直接保存为 JSON。
+    """
+    entries = parse_mix(mix)
+    clients = clients or (concurrency if rate is None else max(concurrency, int(rate)))
+    load_inputs(entries, corpus_dir)
+    before = _temp_dirs()
+    log(f"Running {'open loop at %g req/s' % rate if rate else 'closed loop with %d workers' % concurrency} "
+        f"against {url or 'in-process app'} ...")
+
+    records, elapsed, lags = asyncio.run(
+        _run(entries, url, concurrency, rate, requests, duration, clients, timeout, seed))
+
+    leaked = None
+    if leak_grace >= 0:
+        # 响应发送后才在后台任务中清理临时目录，留出一段时间再判定为泄漏
+        deadline = time.perf_counter() + leak_grace
+        leaked = _temp_dirs() - before
+        while leaked and time.perf_counter() < deadline:
+            time.sleep(0.1)
+            leaked = _temp_dirs() - before
+
+    by_label = collections.defaultdict(list)
+    for record in records:
+        by_label[record["label"]].append(record)
+
+    meta = {
+        "timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "target": url or "in-process",
+        "mode": "open" if rate else "closed",
+        "concurrency": None if rate else concurrency,
+        "rate": rate,
+        "clients": clients,
+        "seed": seed,
+        "mix": {entry.label: {"weight": entry.weight, "input_bytes": len(entry.data)} for entry in entries},
+        "converter_version": subtitle_converter.CONVERTER_VERSION,
+    }
+    if url is None:
+        import config
+        meta.update(worker_mode=config.WORKER_MODE, worker_count=config.WORKER_COUNT,
+                    max_concurrent_conversions=config.MAX_CONCURRENT_CONVERSIONS)
+    return {
+        "meta": meta,
+        "duration_seconds": elapsed,
+        "summary": _summarize(records, elapsed),
+        "by_type": {label: _summarize(items, elapsed) for label, items in by_label.items()},
+        "event_loop_lag_ms": None if lags is None else _latency_summary(lags),
+        "temp_dirs": None if leaked is None else {
+            "directory": tempfile.gettempdir(),
+            "leaked": len(leaked),
+            "names": sorted(leaked),
+        },
+    }
+
+
+def _format_latency(latency):
+    if latency is None:
+        return "-"
+    return f"p50 {latency['p50']:8.1f}  p95 {latency['p95']:8.1f}  p99 {latency['p99']:8.1f}  max {latency['max']:8.1f} ms"
+
+
+def format_report(result):
+    """
+    :return: 便于阅读的报告文本。
+    """
+    summary = result["summary"]
+    lines = [
+        f"{summary['requests']} requests in {result['duration_seconds']:.2f} s: "
+        f"{summary['throughput_rps']:.1f} req/s, {summary['ok']} ok, "
+        f"{summary['errors']} errors ({summary['error_rate'] * 100:.1f}%)",
+        f"latency   {_format_latency(summary['latency_ms'])}",
+    ]
+    if summary["errors_by_kind"]:
+        lines.append("errors    " + ", ".join(f"{kind} x{count}" for kind, count in
+                                             sorted(summary["errors_by_kind"].items())))
+    lines.append("")
+    for label, item in sorted(result["by_type"].items()):
+        lines.append(f"{label:<28} {item['requests']:>6} req  {item['error_rate'] * 100:5.1f}% err  "
+                     f"{_format_latency(item['latency_ms'])}")
+    if result["event_loop_lag_ms"] is not None:
+        lag = result["event_loop_lag_ms"]
+        lines.append(f"\nevent loop lag  p99 {lag['p99']:.1f} ms  max {lag['max']:.1f} ms")
+    temp_dirs = result["temp_dirs"]
+    if temp_dirs is not None:
+        lines.append(f"leaked temp dirs: {temp_dirs['leaked']}"
+                     + (f" ({', '.join(temp_dirs['names'][:5])})" if temp_dirs["leaked"] else ""))
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description="述格 (ScriptGrid) HTTP 压力测试")
+    parser.add_argument("--mix", nargs="+", default=list(DEFAULT_MIX), metavar="TYPE[:CUES[:WEIGHT]]",
+                        help="请求组合：转换类型、字幕条数（默认 1000）与权重（默认 1），"
+                             f"默认 {' '.join(DEFAULT_MIX)}")
+    parser.add_argument("--url", help="压测已启动的服务，如 http://127.0.0.1:8000；默认在进程内压测")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="闭环模式的并发数，默认 8")
+    parser.add_argument("--rate", type=float, help="开环模式：每秒发送的请求数")
+    parser.add_argument("-n", "--requests", type=int, default=None, help="请求总数，未指定 --duration 时默认 200")
+    parser.add_argument("-d", "--duration", type=float, help="最长压测时间（秒）")
+    parser.add_argument("--clients", type=int, help="模拟的客户端数，默认与并发数相同")
+    parser.add_argument("--timeout", type=float, default=120.0, help="单个请求的超时时间（秒），默认 120")
+    parser.add_argument("--leak-grace", type=float, default=5.0,
+                        help="压测结束后等待临时目录被清理的秒数，默认 5；负数表示不检查")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR, help="语料缓存目录")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="选择请求组合项的随机种子")
+    parser.add_argument("-o", "--output", help="将结果保存为 JSON 文件")
+    parser.add_argument("--max-error-rate", type=float, default=None,
+                        help="错误率超过该比例时退出码为 1（临时目录泄漏时同样为 1）")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    requests = args.requests if args.requests is not None or args.duration else 200
+    if args.concurrency <= 0 or (args.rate is not None and args.rate <= 0):
+        parser.error("--concurrency and --rate must be positive")
+    # 逐请求的访问与转换日志会干扰计时与输出
+    logging.disable(logging.WARNING)
+
+    try:
+        result = run(args.mix, args.url, args.concurrency, args.rate, requests, args.duration, args.clients,
+                     args.timeout, args.leak_grace, args.corpus_dir, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(format_report(result))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Results saved to {args.output}")
+
+    failed = False
+    if args.max_error_rate is not None and result["summary"]["error_rate"] > args.max_error_rate:
+        print(f"\nError rate over {args.max_error_rate:.1%}.")
+        failed = True
+    if result["temp_dirs"] is not None and result["temp_dirs"]["leaked"]:
+        print(f"\n{result['temp_dirs']['leaked']} temporary directories were not cleaned up.")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
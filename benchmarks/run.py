@@ -0,0 +1,237 @@
+"""
+基准测试入口
+分别测量各解析、写入阶段以及每种端到端转换的耗时与峰值内存，结果可保存为 JSON，
+并可与之前保存的基准结果比较，超过阈值的变慢视为性能回退。
+
+在仓库根目录下运行:
+    python -m benchmarks.run                                   # 默认规模: 100, 10000, 100000
+    python -m benchmarks.run --sizes 100 1000000 -o base.json  # 保存结果
+    python -m benchmarks.run --compare base.json               # 与基准比较，回退时退出码为 1
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import parsers
+import subtitle_converter
+import writers
+from cues import CueList
+from retime import Retime
+from benchmarks.corpus import CORPUS_VERSION, DEFAULT_SEED, ensure_corpus
+
+DEFAULT_SIZES = (100, 10000, 100000)
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".corpus")
+
+STAGES = (
+    "parse_srt",
+    "parse_ass",
+    "parse_xlsx",
+    "write_excel",
+    "write_srt",
+    "write_csv",
+    "write_vtt",
+    "retime",
+    "convert_srt_to_excel",
+    "convert_ass_to_excel",
+    "convert_ass_to_srt",
+    "convert_xlsx_to_srt",
+)
+
+
+def _build_cases(corpus_dir, count, work_dir, stages):
+    """
+    准备某个规模下的所有测试用例。语料生成与写入阶段所需的输入数据在此准备，不计入耗时。
+    :return: [(阶段名, 无参数的被测函数)]。
+    """
+    srt = ensure_corpus(corpus_dir, 'srt', count)
+    ass = ensure_corpus(corpus_dir, 'ass', count)
+    xlsx = ensure_corpus(corpus_dir, 'xlsx', count)
+    out_xlsx = os.path.join(work_dir, "out.xlsx")
+    out_srt = os.path.join(work_dir, "out.srt")
+    out_csv = os.path.join(work_dir, "out.csv")
+    out_vtt = os.path.join(work_dir, "out.vtt")
+
+    cues = parsers.parse_srt(srt) if {"write_excel", "write_srt", "write_csv", "write_vtt", "retime"} & set(stages) else None
+    # 重新定时原地修改时间列，使用独立的副本，不影响写入阶段的输入
+    retime_cues = CueList(cues) if "retime" in stages else None
+    frame_rate = Retime(offset=1000, source_fps='24000/1001', target_fps='25')
+
+    cases = {
+        "parse_srt": lambda: parsers.parse_srt(srt),
+        "parse_ass": lambda: parsers.parse_ass_to_srt_structure(ass),
+        "parse_xlsx": lambda: writers.parse_xlsx(xlsx),
+        "write_excel": lambda: writers.write_to_excel(cues, out_xlsx),
+        "write_srt": lambda: writers.write_to_srt(cues, out_srt),
+        "write_csv": lambda: writers.write_to_csv(cues, out_csv),
+        "write_vtt": lambda: writers.write_to_vtt(cues, out_vtt),
+        "retime": lambda: frame_rate.apply(retime_cues),
+        "convert_srt_to_excel": lambda: subtitle_converter.convert(srt, out_xlsx, 'subtitle_to_excel'),
+        "convert_ass_to_excel": lambda: subtitle_converter.convert(ass, out_xlsx, 'subtitle_to_excel'),
+        "convert_ass_to_srt": lambda: subtitle_converter.convert(ass, out_srt, 'ass_to_srt'),
+        "convert_xlsx_to_srt": lambda: subtitle_converter.convert(xlsx, out_srt, 'xlsx_to_srt'),
+    }
+    return [(stage, cases[stage]) for stage in stages]
+
+
+def _time(func, repeat):
+    """
+    :return: 每次执行的耗时列表（秒）。
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def _peak_memory(func):
+    """
+    在 tracemalloc 下单独执行一次，测量峰值内存。tracemalloc 会显著拖慢执行，因此不与计时混在一起。
+    :return: 执行期间 Python 分配的峰值内存（字节）。
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes=DEFAULT_SIZES, stages=STAGES, repeat=3, measure_memory=True, corpus_dir=DEFAULT_CORPUS_DIR, log=print):
+    """
+    执行基准测试。
+    :param sizes: 语料规模（字幕条数）列表。
+    :param stages: 要测量的阶段。
+    :param repeat: 每个用例的计时次数，取最小值与中位数。
+    :param measure_memory: 是否测量峰值内存。
+    :param corpus_dir: 语料缓存目录。
+    :param log: 进度输出函数。
+    :return: 结果字典，可直接保存为 JSON。
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="scriptgrid-bench-") as work_dir:
+        for count in sizes:
+            for stage, func in _build_cases(corpus_dir, count, work_dir, stages):
+                timings = _time(func, repeat)
+                record = {
+                    "stage": stage,
+                    "cues": count,
+                    "min_seconds": min(timings),
+                    "median_seconds": statistics.median(timings),
+                    "cues_per_second": count / min(timings) if min(timings) > 0 else None,
+                }
+                if measure_memory:
+                    record["peak_bytes"] = _peak_memory(func)
+                results[f"{stage}@{count}"] = record
+                log(_format_record(record))
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus_version": CORPUS_VERSION,
+            "seed": DEFAULT_SEED,
+            "converter_version": subtitle_converter.CONVERTER_VERSION,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def _format_record(record):
+    memory = f"{record['peak_bytes'] / 1024 / 1024:9.1f} MB" if "peak_bytes" in record else ""
+    return f"{record['stage']:<22} {record['cues']:>8} cues  {record['min_seconds'] * 1000:10.1f} ms  {memory}"
+
+
+def compare(current, baseline, threshold=0.10, memory_threshold=0.10, min_delta=0.005):
+    """
+    与基准结果比较。
+    :param current: 本次结果（run 的返回值）。
+    :param baseline: 基准结果。
+    :param threshold: 耗时增加超过该比例视为回退。
+    :param memory_threshold: 峰值内存增加超过该比例视为回退。
+    :param min_delta: 耗时增加的绝对值不超过该秒数时忽略，避免小规模用例的计时噪声。
+    :return: (比较行列表, 回退项列表)。
+    """
+    rows = []
+    regressions = []
+    for key, record in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        ratio = record["min_seconds"] / base["min_seconds"] if base["min_seconds"] > 0 else 1.0
+        slower = ratio > 1 + threshold and record["min_seconds"] - base["min_seconds"] > min_delta
+        memory_ratio = None
+        bigger = False
+        if "peak_bytes" in record and base.get("peak_bytes"):
+            memory_ratio = record["peak_bytes"] / base["peak_bytes"]
+            bigger = memory_ratio > 1 + memory_threshold
+        flag = "REGRESSION" if slower or bigger else ""
+        memory_text = f"{memory_ratio:6.2f}x mem" if memory_ratio is not None else ""
+        rows.append(f"{key:<32} {base['min_seconds'] * 1000:10.1f} -> {record['min_seconds'] * 1000:10.1f} ms "
+                    f"{ratio:6.2f}x  {memory_text}  {flag}")
+        if flag:
+            regressions.append(key)
+    return rows, regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="述格 (ScriptGrid) 性能基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="语料规模（字幕条数），默认 100 10000 100000，最大可到 1000000")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="只测量指定阶段")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例的计时次数，默认 3")
+    parser.add_argument("--no-memory", action="store_true", help="不测量峰值内存（大规模语料下可节省时间）")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR, help="语料缓存目录")
+    parser.add_argument("-o", "--output", help="将结果保存为 JSON 文件")
+    parser.add_argument("--compare", metavar="BASELINE", help="与之前保存的 JSON 结果比较")
+    parser.add_argument("--threshold", type=float, default=0.10, help="耗时回退阈值（比例），默认 0.10")
+    parser.add_argument("--memory-threshold", type=float, default=0.10, help="峰值内存回退阈值（比例），默认 0.10")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # 转换过程的逐文件日志会干扰计时与输出
+    logging.disable(logging.WARNING)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    result = run(args.sizes, args.stages, max(1, args.repeat), not args.no_memory, args.corpus_dir)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if baseline is not None:
+        if baseline.get("meta", {}).get("corpus_version") != CORPUS_VERSION:
+            print("Warning: baseline was produced with a different corpus version.", file=sys.stderr)
+        rows, regressions = compare(result, baseline, args.threshold, args.memory_threshold)
+        print()
+        print("\n".join(rows))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over threshold: {', '.join(regressions)}")
+            return 1
+        print("\nNo regressions over threshold.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
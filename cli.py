@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+
+"""
+命令行批量转换工具
+遍历目录树，使用进程池并行转换其中的字幕文件，不经过 HTTP 服务。
+已是最新的输出会被跳过（按修改时间或内容哈希判断），转换失败的文件汇总写入 JSON 文件。
+
+用法示例:
+    python cli.py archive/ output/ -t ass_to_srt
+    python cli.py archive/ output/ -t subtitle_to_excel --jobs 8 --check hash
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import config
+import formats
+import subtitle_converter
+from exceptions import SubtitleConverterError
+from timeline import Normalize
+
+# 哈希模式下记录已转换文件的清单，保存在输出目录中
+MANIFEST_NAME = ".scriptgrid-manifest.json"
+DEFAULT_SUMMARY_NAME = "scriptgrid-failures.json"
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def _file_hash(path):
+    """
+    :param path: 文件路径。
+    :return: 文件内容的 SHA-256 十六进制摘要。
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _init_worker(verbose):
+    """
+    工作进程初始化：非 verbose 模式下关闭逐文件的日志，失败信息统一记录在汇总中。
+    """
+    if verbose:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    else:
+        logging.disable(logging.ERROR)
+
+
+def _convert_one(input_path, output_path, conversion_type, check, known_hash, normalize=None):
+    """
+    在工作进程中转换一个文件。
+    先写入同目录下的临时文件，成功后再替换为最终文件，中途中断不会留下看似最新的不完整输出。
+    :param input_path: 输入文件路径。
+    :param output_path: 输出文件路径。
+    :param conversion_type: 转换类型。
+    :param check: 跳过判断方式，'hash' 时计算输入文件的哈希并与 known_hash 比较。
+    :param known_hash: 上次成功转换时输入文件的哈希，没有记录时为 None。
+    :param normalize: 可选的时间轴规范化。
+    :return: 结果字典，包含 status ('converted' / 'skipped' / 'failed')、hash、error。
+    """
+    result = {"status": "converted", "hash": None, "error": None}
+    try:
+        if check == 'hash':
+            result["hash"] = _file_hash(input_path)
+            if result["hash"] == known_hash and os.path.exists(output_path):
+                result["status"] = "skipped"
+                return result
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        directory, name = os.path.split(output_path)
+        temp_path = os.path.join(directory, f".{name}.{os.getpid()}.partial")
+        try:
+            subtitle_converter.convert(input_path, temp_path, conversion_type, normalize=normalize)
+            os.replace(temp_path, output_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    except SubtitleConverterError as e:
+        result.update(status="failed", error=str(e))
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    return result
+
+
+def find_inputs(input_dir, conversion_type):
+    """
+    遍历目录树，找出转换类型所接受的所有输入文件（跳过隐藏文件与隐藏目录）。
+    :param input_dir: 输入目录。
+    :param conversion_type: 转换类型。
+    :return: 相对于 input_dir 的路径列表，按路径排序。
+    """
+    extensions = formats.get_conversion(conversion_type).input_extensions
+    found = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in files:
+            if not name.startswith('.') and name.lower().endswith(extensions):
+                found.append(os.path.relpath(os.path.join(root, name), input_dir))
+    found.sort()
+    return found
+
+
+def _output_path(output_dir, relative_input, conversion_type):
+    directory, name = os.path.split(relative_input)
+    return os.path.join(output_dir, directory, subtitle_converter.output_filename(name, conversion_type))
+
+
+def _is_up_to_date_by_mtime(input_path, output_path):
+    try:
+        return os.stat(output_path).st_mtime >= os.stat(input_path).st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def _load_manifest(path, conversion_type, normalize=None):
+    """
+    读取哈希清单，转换类型、转换器版本或时间轴规范化参数不同的记录视为无效。
+    :return: {相对输入路径: 输入文件哈希}。
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("conversion_type") != conversion_type or manifest.get("version") != subtitle_converter.CONVERTER_VERSION:
+        return {}
+    if manifest.get("normalize") != repr(normalize):
+        return {}
+    return manifest.get("files", {})
+
+
+def _save_manifest(path, conversion_type, hashes, normalize=None):
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "conversion_type": conversion_type,
+            "version": subtitle_converter.CONVERTER_VERSION,
+            "normalize": repr(normalize),
+            "files": hashes,
+        }, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+class Progress:
+    """
+    在标准错误输出上显示进度与吞吐量。终端中原地刷新，重定向到文件时按固定间隔逐行输出。
+    """
+
+    def __init__(self, total, quiet=False, interval=None):
+        self.total = total
+        self.quiet = quiet
+        self.is_tty = sys.stderr.isatty()
+        self.interval = interval if interval is not None else (0.2 if self.is_tty else 5.0)
+        self.started = time.monotonic()
+        self._last_report = self.started
+        self.done = 0
+        self.converted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+
+    def update(self, status, size):
+        self.done += 1
+        if status == 'converted':
+            self.converted += 1
+            self.bytes += size
+        elif status == 'skipped':
+            self.skipped += 1
+        else:
+            self.failed += 1
+        now = time.monotonic()
+        if now - self._last_report >= self.interval or self.done == self.total:
+            self._last_report = now
+            self._report(now)
+
+    def line(self, now=None):
+        elapsed = max((now or time.monotonic()) - self.started, 1e-9)
+        percent = self.done * 100 / self.total if self.total else 100.0
+        width = len(str(self.total))
+        return (f"[{self.done:>{width}}/{self.total}] {percent:5.1f}%  "
+                f"{self.converted / elapsed:7.1f} files/s  {self.bytes / elapsed / 1024 / 1024:6.2f} MB/s  "
+                f"converted {self.converted}, skipped {self.skipped}, failed {self.failed}")
+
+    def _report(self, now):
+        if self.quiet:
+            return
+        if self.is_tty:
+            end = '\n' if self.done == self.total else ''
+            print(f"\r{self.line(now)}", end=end, file=sys.stderr, flush=True)
+        else:
+            print(self.line(now), file=sys.stderr, flush=True)
+
+
+def run(input_dir, output_dir, conversion_type, jobs=None, check='mtime', force=False,
+        summary_path=None, quiet=False, verbose=False, normalize=None):
+    """
+    批量转换目录树。
+    :param input_dir: 输入目录。
+    :param output_dir: 输出目录，保持与输入目录相同的子目录结构。
+    :param conversion_type: 转换类型。
+    :param jobs: 工作进程数，默认取 CPU 核数。
+    :param check: 判断输出是否最新的方式：'mtime' (输出比输入新) 或 'hash' (输入内容未变)。
+    :param force: 为 True 时忽略最新判断，全部重新转换。
+    :param summary_path: 失败汇总 JSON 的路径，默认写入输出目录；没有失败时删除已有的汇总文件。
+    :param quiet: 不显示进度。
+    :param verbose: 显示工作进程中的逐文件日志。
+    :param normalize: 可选的时间轴规范化，作用于每个文件。
+    :return: 汇总字典。
+    """
+    inputs = find_inputs(input_dir, conversion_type)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    known_hashes = _load_manifest(manifest_path, conversion_type, normalize) if check == 'hash' else {}
+    hashes = {}
+    failures = []
+    progress = Progress(len(inputs), quiet=quiet)
+
+    # 不同输入可能得到同一个输出文件（如 ep01.ass 与 ep01.srt 都转为 ep01.xlsx），只转换第一个
+    outputs = {}
+    tasks = []
+    for relative_input in inputs:
+        output_path = _output_path(output_dir, relative_input, conversion_type)
+        key = os.path.normcase(output_path)
+        if key in outputs:
+            failures.append({"input": relative_input, "error": f"输出文件与 {outputs[key]} 冲突: {output_path}"})
+            progress.update('failed', 0)
+            continue
+        outputs[key] = relative_input
+        input_path = os.path.join(input_dir, relative_input)
+        if not force and check == 'mtime' and _is_up_to_date_by_mtime(input_path, output_path):
+            progress.update('skipped', 0)
+            continue
+        tasks.append((relative_input, input_path, output_path))
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(verbose,)) as executor:
+        futures = {
+            executor.submit(
+                _convert_one, input_path, output_path, conversion_type, check,
+                None if force else known_hashes.get(relative_input), normalize
+            ): (relative_input, input_path)
+            for relative_input, input_path, output_path in tasks
+        }
+        try:
+            for future in as_completed(futures):
+                relative_input, input_path = futures[future]
+                result = future.result()
+                if result["status"] == 'failed':
+                    failures.append({"input": relative_input, "error": result["error"]})
+                elif result["hash"] is not None:
+                    hashes[relative_input] = result["hash"]
+                progress.update(result["status"], os.path.getsize(input_path) if result["status"] == 'converted' else 0)
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            # 中断时也保存已完成部分的清单，下次运行可以跳过这些文件
+            if check == 'hash' and (hashes or known_hashes):
+                # 保留本次未涉及、但仍存在的文件的旧记录
+                existing = set(inputs)
+                merged = {k: v for k, v in known_hashes.items() if k in existing}
+                for failure in failures:
+                    merged.pop(failure["input"], None)
+                merged.update(hashes)
+                os.makedirs(output_dir, exist_ok=True)
+                _save_manifest(manifest_path, conversion_type, merged, normalize)
+
+    elapsed = time.monotonic() - progress.started
+    summary = {
+        "input_dir": os.path.abspath(input_dir),
+        "output_dir": os.path.abspath(output_dir),
+        "conversion_type": conversion_type,
+        "total": len(inputs),
+        "converted": progress.converted,
+        "skipped": progress.skipped,
+        "failed": len(failures),
+        "elapsed_seconds": round(elapsed, 3),
+        "failures": failures,
+    }
+    summary_path = summary_path or os.path.join(output_dir, DEFAULT_SUMMARY_NAME)
+    if not failures:
+        # 删除上次运行遗留的失败汇总，避免误以为仍有失败
+        if os.path.exists(summary_path):
+            os.remove(summary_path)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        summary["summary_path"] = summary_path
+    return summary
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="scriptgrid",
+        description="述格 (ScriptGrid) 命令行批量转换：遍历目录树并行转换字幕文件。",
+    )
+    parser.add_argument("input_dir", help="输入目录，会递归查找其中的字幕文件")
+    parser.add_argument("output_dir", help="输出目录，保持与输入目录相同的子目录结构")
+    parser.add_argument("-t", "--type", dest="conversion_type", required=True,
+                        choices=sorted(formats.conversion_types()), help="转换类型")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="工作进程数，默认取 CPU 核数")
+    parser.add_argument("--check", choices=("mtime", "hash"), default="mtime",
+                        help="判断输出是否最新的方式：mtime 比较修改时间（默认），hash 比较输入内容哈希")
+    parser.add_argument("-f", "--force", action="store_true", help="忽略最新判断，全部重新转换")
+    parser.add_argument("--summary", dest="summary_path", default=None,
+                        help=f"失败汇总 JSON 的路径，默认为 <output_dir>/{DEFAULT_SUMMARY_NAME}")
+    parser.add_argument("--no-normalize", dest="normalize", action="store_false", default=config.TIMELINE_NORMALIZE,
+                        help="不规范化时间轴（默认按开始时间排序、检查时间并重新编号）")
+    parser.add_argument("--overlap-fix-ms", type=int, default=config.TIMELINE_OVERLAP_FIX_MS,
+                        help="消除不超过该时长（毫秒）的相邻字幕重叠，默认 %(default)s，0 表示只检查")
+    parser.add_argument("--gap-fix-ms", type=int, default=config.TIMELINE_GAP_FIX_MS,
+                        help="消除不超过该时长（毫秒）的相邻字幕间隔，默认 %(default)s，0 表示只检查")
+    parser.add_argument("--min-duration-ms", type=int, default=config.TIMELINE_MIN_DURATION_MS,
+                        help="结束时间早于开始时间的字幕改为持续该时长（毫秒），默认 %(default)s，0 表示只检查")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不显示进度")
+    parser.add_argument("-v", "--verbose", action="store_true", help="显示逐文件的转换日志")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.input_dir):
+        print(f"输入目录不存在: {args.input_dir}", file=sys.stderr)
+        return 2
+    normalize = None
+    if args.normalize:
+        try:
+            normalize = Normalize(args.overlap_fix_ms, args.gap_fix_ms, args.min_duration_ms)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+    _init_worker(args.verbose)
+
+    try:
+        summary = run(
+            args.input_dir, args.output_dir, args.conversion_type,
+            jobs=args.jobs, check=args.check, force=args.force,
+            summary_path=args.summary_path, quiet=args.quiet, verbose=args.verbose, normalize=normalize,
+        )
+    except KeyboardInterrupt:
+        print("\n已中断。", file=sys.stderr)
+        return 130
+
+    print(f"共 {summary['total']} 个文件：转换 {summary['converted']}，跳过 {summary['skipped']}，"
+          f"失败 {summary['failed']}，用时 {summary['elapsed_seconds']:.1f} 秒。")
+    if summary["failed"]:
+        print(f"失败详情已写入: {summary['summary_path']}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
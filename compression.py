@@ -0,0 +1,402 @@
+"""
+压缩传输模块
+SRT、ASS 等纯文本字幕压缩率很高，网络较慢时上传与下载的耗时远超服务端的转换耗时。
+- 上传：接受 gzip / zstd 压缩的文件（文件名带 .gz、.zst 后缀），或请求头 Content-Encoding 声明压缩的整个请求体，
+  边解压边交给解析器，并限制解压后的大小，防止解压炸弹。
+- 下载：客户端的 Accept-Encoding 允许时压缩文本格式的转换结果。
+zstd 需要可选依赖 zstandard，未安装时只支持 gzip。
+"""
+
+import gzip
+import io
+import os
+import zlib
+from collections import deque
+
+try:
+    import zstandard
+except ImportError:  # zstandard 是可选依赖
+    zstandard = None
+
+import admission
+from exceptions import InputTooLargeError, ParseError
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+
+# 压缩上传的文件名后缀
+_SUFFIXES = {'.gz': GZIP, '.gzip': GZIP, '.zst': ZSTD, '.zstd': ZSTD}
+# 请求头 Content-Encoding 的取值
+_CONTENT_ENCODINGS = {'gzip': GZIP, 'x-gzip': GZIP, 'zstd': ZSTD}
+# 压缩文件的后缀（压缩转换结果的临时文件使用）
+_FILE_SUFFIXES = {GZIP: '.gz', ZSTD: '.zst'}
+# 本身已是压缩格式的输出（.xlsx 是 ZIP 包），再压缩没有收益
+_PRECOMPRESSED_EXTENSIONS = frozenset({'.xlsx', '.zip'})
+
+# 小于该大小的输出直接返回，压缩收益抵不过额外的开销
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+_CHUNK_SIZE = 64 * 1024
+# zstd 的增量解压没有输出长度上限，按小块输入解压，限制单次解压产生的数据量
+_ZSTD_INPUT_SLICE = 4 * 1024
+
+_DECODE_ERRORS = (OSError, EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+class UnsupportedEncodingError(ValueError):
+    """不支持的压缩编码（或 zstd 所需的 zstandard 未安装）。"""
+    pass
+
+
+def available_encodings():
+    """
+    :return: 当前支持的压缩编码，按优先顺序排列。
+    """
+    return (ZSTD, GZIP) if zstandard is not None else (GZIP,)
+
+
+def _check_available(encoding):
+    if encoding not in available_encodings():
+        if encoding == ZSTD:
+            raise UnsupportedEncodingError("服务器未安装 zstandard，不支持 zstd 压缩，请改用 gzip。")
+        raise UnsupportedEncodingError(f"不支持的压缩编码: {encoding}")
+
+
+def split_filename(filename):
+    """
+    识别压缩上传的文件名，如 'movie.srt.gz'。
+    :param filename: 上传的文件名。
+    :return: (去掉压缩后缀的文件名, 压缩编码)；文件名没有压缩后缀时为 (原文件名, None)。
+    """
+    stem, suffix = os.path.splitext(filename)
+    encoding = _SUFFIXES.get(suffix.lower())
+    if encoding is None or not stem:
+        return filename, None
+    return stem, encoding
+
+
+class _DecompressingRaw(io.RawIOBase):
+    """
+    边读取边解压压缩流。支持定位：向后定位时跳过解压后的数据，向前定位时从头重新解压
+    （编码检测读取样本后会回到开头，代价只是重新解压样本部分）。
+    """
+
+    def __init__(self, stream, encoding, limit, owns_stream):
+        super().__init__()
+        self._stream = stream
+        self._start = stream.tell()
+        self._encoding = encoding
+        self._limit = limit
+        self._owns_stream = owns_stream
+        self._restart()
+
+    def _restart(self):
+        self._stream.seek(self._start)
+        if self._encoding == GZIP:
+            self._reader = gzip.GzipFile(fileobj=self._stream, mode='rb')
+        else:
+            self._reader = zstandard.ZstdDecompressor().stream_reader(
+                self._stream, read_across_frames=True, closefd=False
+            )
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("解压流不支持从末尾定位。")
+        if offset < self._position:
+            self._restart()
+        while self._position < offset:
+            if not self.read(min(_CHUNK_SIZE, offset - self._position)):
+                break
+        return self._position
+
+    def readinto(self, buffer):
+        try:
+            data = self._reader.read(len(buffer))
+        except _DECODE_ERRORS as e:
+            raise ParseError(f"无法解压上传的文件: {e}") from e
+        size = len(data)
+        buffer[:size] = data
+        self._position += size
+        if self._limit > 0 and self._position > self._limit:
+            raise InputTooLargeError(f"解压后的文件过大，上限为 {self._limit} 字节。")
+        return size
+
+    def close(self):
+        if not self.closed and self._owns_stream:
+            self._stream.close()
+        super().close()
+
+
+class DecompressingReader(io.BufferedReader):
+    """
+    解压后的二进制文件对象，可直接交给解析器流式读取。
+    """
+
+    def __init__(self, stream, encoding, limit=0, owns_stream=False):
+        """
+        :param stream: 可定位的压缩数据流（如上传文件），从当前位置开始读取。
+        :param encoding: GZIP 或 ZSTD。
+        :param limit: 解压后的大小上限（字节），超过时读取会抛出 InputTooLargeError；0 表示不限制。
+        :param owns_stream: 关闭时是否同时关闭 stream。
+        :raises UnsupportedEncodingError: 编码不受支持时。
+        """
+        _check_available(encoding)
+        super().__init__(_DecompressingRaw(stream, encoding, limit, owns_stream), _CHUNK_SIZE)
+        self.content_encoding = encoding
+        self.limit = limit
+
+    def reopen(self):
+        """
+        复制底层文件描述符，打开一个从头开始、可独立读取与关闭的解压流。
+        :return: DecompressingReader，由调用方负责关闭。
+        """
+        raw = self.raw
+        stream = os.fdopen(os.dup(raw._stream.fileno()), 'rb')
+        stream.seek(raw._start)
+        return DecompressingReader(stream, self.content_encoding, self.limit, owns_stream=True)
+
+
+def decompress_bytes(data, encoding, limit=0):
+    """
+    :return: 解压后的 bytes。
+    :raises InputTooLargeError: 解压后超过大小上限时。
+    :raises ParseError: 数据无法解压时。
+    """
+    with DecompressingReader(io.BytesIO(data), encoding, limit) as reader:
+        return reader.read()
+
+
+class _IncrementalDecoder:
+    """
+    请求体的增量解压器：每次输入一段压缩数据，产出不超过 _CHUNK_SIZE 的解压数据块。
+    """
+
+    def __init__(self, encoding):
+        _check_available(encoding)
+        self._encoding = encoding
+        self._decoder = self._new_decoder()
+
+    def _new_decoder(self):
+        if self._encoding == GZIP:
+            return zlib.decompressobj(wbits=31)
+        return zstandard.ZstdDecompressor().decompressobj()
+
+    def feed(self, data):
+        """
+        :return: 产出解压数据块的生成器。
+        :raises ParseError: 数据无法解压时。
+        """
+        try:
+            if self._encoding == GZIP:
+                yield from self._feed_gzip(data)
+            else:
+                for start in range(0, len(data), _ZSTD_INPUT_SLICE):
+                    piece = self._decoder.decompress(data[start:start + _ZSTD_INPUT_SLICE])
+                    if piece:
+                        yield piece
+        except _DECODE_ERRORS as e:
+            raise ParseError(f"无法解压请求体: {e}") from e
+
+    def _feed_gzip(self, data):
+        while True:
+            piece = self._decoder.decompress(data, _CHUNK_SIZE)
+            if piece:
+                yield piece
+            if self._decoder.eof:
+                # 多个 gzip 成员首尾相接
+                data = self._decoder.unused_data
+                if not data:
+                    return
+                self._decoder = self._new_decoder()
+                continue
+            data = self._decoder.unconsumed_tail
+            if not data and len(piece) < _CHUNK_SIZE:
+                return
+
+    def finish(self):
+        """
+        :raises ParseError: 压缩数据不完整时。
+        """
+        if self._encoding == GZIP and not self._decoder.eof:
+            raise ParseError("无法解压请求体: 压缩数据不完整。")
+
+
+class DecompressionMiddleware:
+    """
+    ASGI 中间件：指定路径的 POST 请求带有 Content-Encoding: gzip / zstd 时，边接收边解压请求体，
+    下游应用看到的是未压缩的请求。解压后超过大小上限返回 413，无法解压返回 400，不支持的编码返回 415。
+    应位于准入控制之内：准入控制按实际传输的（压缩后的）字节数限制上传大小。
+    """
+
+    def __init__(self, app, paths, max_bytes=0):
+        """
+        :param app: 下游 ASGI 应用。
+        :param paths: 接受压缩请求体的路径集合。
+        :param max_bytes: 解压后的请求体大小上限（字节），0 表示不限制。
+        """
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_encoding = None
+        for name, value in scope.get("headers", ()):
+            if name == b"content-encoding":
+                content_encoding = value.decode('latin-1').strip().lower()
+        if not content_encoding or content_encoding == 'identity':
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            decoder = _IncrementalDecoder(_CONTENT_ENCODINGS.get(content_encoding, content_encoding))
+        except UnsupportedEncodingError as e:
+            await admission.send_error(send, 415, str(e))
+            return
+
+        # 解压后的长度未知，去掉与压缩数据对应的长度与编码头
+        scope = dict(scope, headers=[
+            (name, value) for name, value in scope["headers"] if name not in (b"content-encoding", b"content-length")
+        ])
+        await self._call_decompressed(scope, receive, send, decoder)
+
+    async def _call_decompressed(self, scope, receive, send, decoder):
+        limit = self.max_bytes
+        pending = deque()
+        state = {"decoded": 0, "done": False, "rejected": False, "started": False}
+
+        async def reject(status, detail):
+            state["rejected"] = True
+            if not state["started"]:
+                state["started"] = True
+                await admission.send_error(send, status, detail)
+            return {"type": "http.disconnect"}
+
+        async def receive_wrapper():
+            if state["rejected"]:
+                return {"type": "http.disconnect"}
+            while not pending and not state["done"]:
+                message = await receive()
+                if message["type"] != "http.request":
+                    return message
+                more_body = message.get("more_body", False)
+                try:
+                    for piece in decoder.feed(message.get("body", b"")):
+                        state["decoded"] += len(piece)
+                        if limit > 0 and state["decoded"] > limit:
+                            admission.REJECTIONS.inc(reason="decompressed_too_large")
+                            return await reject(413, f"解压后的请求体过大，上限为 {limit} 字节。")
+                        pending.append(piece)
+                    if not more_body:
+                        decoder.finish()
+                except ParseError as e:
+                    return await reject(400, str(e))
+                state["done"] = not more_body
+            body = pending.popleft() if pending else b""
+            return {"type": "http.request", "body": body, "more_body": bool(pending) or not state["done"]}
+
+        async def send_wrapper(message):
+            if state["rejected"]:
+                return
+            if message["type"] == "http.response.start":
+                state["started"] = True
+            await send(message)
+
+        await self.app(scope, receive_wrapper, send_wrapper)
+
+
+def negotiate(accept_encoding):
+    """
+    按请求头 Accept-Encoding 选择响应的压缩编码：优先 zstd（已安装 zstandard 时），其次 gzip；q=0 表示拒绝。
+    :param accept_encoding: Accept-Encoding 请求头的值，可能为 None。
+    :return: GZIP、ZSTD 或 None（不压缩）。
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+    for encoding in available_encodings():
+        if weights.get(encoding, weights.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(filename):
+    """
+    :return: 该文件名的输出是否值得压缩（已是压缩格式的 .xlsx 等不压缩）。
+    """
+    return os.path.splitext(filename)[1].lower() not in _PRECOMPRESSED_EXTENSIONS
+
+
+def _compressor(encoding):
+    if encoding == GZIP:
+        # wbits=31 输出 gzip 格式；头部的修改时间为 0，相同内容的压缩结果相同
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    _check_available(encoding)
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+
+def compress(data, encoding):
+    """
+    :return: 压缩后的 bytes。
+    """
+    compressor = _compressor(encoding)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_chunks(encoding, func, *args, **kwargs):
+    """
+    压缩生成器产出的字节块，用于流式响应。可直接交给 worker_pool.stream，在工作线程中压缩。
+    :param encoding: GZIP 或 ZSTD。
+    :param func: 产出字节块的生成器函数。
+    :param args: 传给 func 的位置参数。
+    :param kwargs: 传给 func 的关键字参数。
+    :return: 产出压缩后字节块的生成器。
+    """
+    compressor = _compressor(encoding)
+    for chunk in func(*args, **kwargs):
+        chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def compress_file(path, encoding):
+    """
+    压缩文件，压缩结果保存在同一目录下（文件名加上 .gz 或 .zst 后缀）。
+    :return: 压缩文件的路径。
+    """
+    compressor = _compressor(encoding)
+    output_path = path + _FILE_SUFFIXES[encoding]
+    with open(path, 'rb') as source, open(output_path, 'wb') as output:
+        for chunk in iter(lambda: source.read(_CHUNK_SIZE), b''):
+            output.write(compressor.compress(chunk))
+        output.write(compressor.flush())
+    return output_path
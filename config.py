@@ -0,0 +1,146 @@
+"""
+运行配置模块
+从环境变量读取服务端的可调参数，集中管理，便于在容器中按需配置。
+所有环境变量均以 SCRIPTGRID_ 为前缀，未设置时使用此处的默认值。
+"""
+
+import os
+
+
+def _env_str(name, default):
+    """
+    读取字符串类型的环境变量。
+    :param name: 不带前缀的变量名。
+    :param default: 未设置时的默认值。
+    :return: 环境变量的值（已去除首尾空白）。
+    """
+    value = os.environ.get(f"SCRIPTGRID_{name}")
+    if value is None or not value.strip():
+        return default
+    return value.strip()
+
+
+def _env_bool(name, default):
+    """
+    读取布尔类型的环境变量，"1"、"true"、"yes"、"on"（不区分大小写）视为真。
+    :param name: 不带前缀的变量名。
+    :param default: 未设置时的默认值。
+    :return: 布尔值。
+    """
+    value = _env_str(name, None)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def _env_int(name, default):
+    """
+    读取整数类型的环境变量，格式错误时回退为默认值。
+    :param name: 不带前缀的变量名。
+    :param default: 未设置或无法解析时的默认值。
+    :return: 整数值。
+    """
+    value = _env_str(name, None)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+# --- 转换工作池 ---
+# 工作池类型: 'thread' (线程池) 或 'process' (进程池，可利用多核)
+WORKER_MODE = _env_str("WORKER_MODE", "thread").lower()
+# 工作池中的工作者数量，默认取 CPU 核数
+WORKER_COUNT = _env_int("WORKER_COUNT", os.cpu_count() or 1)
+# 同时执行的转换任务上限，超出的请求在事件循环中排队等待
+MAX_CONCURRENT_CONVERSIONS = _env_int("MAX_CONCURRENT_CONVERSIONS", WORKER_COUNT)
+
+# --- 上传处理 ---
+# 不超过该大小（字节）的上传在内存中完成转换，不创建临时文件；更大的文件落盘处理
+IN_MEMORY_MAX_BYTES = _env_int("IN_MEMORY_MAX_BYTES", 32 * 1024 * 1024)
+# 批量转换一次最多接受的文件数（包括 ZIP 压缩包中的文件）；批量转换中每个文件的大小上限同 IN_MEMORY_MAX_BYTES
+BATCH_MAX_FILES = _env_int("BATCH_MAX_FILES", 200)
+
+# --- 准入控制 ---
+# 转换类请求的请求体大小上限（字节），超过时在接收过程中立即返回 413；0 表示不限制
+MAX_UPLOAD_BYTES = _env_int("MAX_UPLOAD_BYTES", 512 * 1024 * 1024)
+# 同时处理（包括接收上传与返回结果）的转换类请求上限，0 表示不限制
+ADMISSION_MAX_ACTIVE = _env_int("ADMISSION_MAX_ACTIVE", 2 * MAX_CONCURRENT_CONVERSIONS)
+# 超出上限后排队等待的请求数上限，队列已满时返回 503；0 表示不限制
+ADMISSION_MAX_QUEUED = _env_int("ADMISSION_MAX_QUEUED", 4 * MAX_CONCURRENT_CONVERSIONS)
+# 单个客户端（按 IP）同时处理与排队等待的请求数上限，0 表示不限制
+ADMISSION_CLIENT_MAX_ACTIVE = _env_int("ADMISSION_CLIENT_MAX_ACTIVE", 2)
+ADMISSION_CLIENT_MAX_QUEUED = _env_int("ADMISSION_CLIENT_MAX_QUEUED", 4)
+# 排队等待的最长时间（秒），超时返回 503；0 表示一直等待
+ADMISSION_QUEUE_TIMEOUT = _env_int("ADMISSION_QUEUE_TIMEOUT", 30)
+# 503 响应中建议客户端重试的间隔（秒）
+ADMISSION_RETRY_AFTER = _env_int("ADMISSION_RETRY_AFTER", 5)
+# 部署在反向代理之后时开启，以 X-Forwarded-For 中的第一个地址区分客户端
+TRUST_FORWARDED_FOR = _env_bool("TRUST_FORWARDED_FOR", False)
+
+# --- 压缩传输 ---
+# 客户端的 Accept-Encoding 允许时压缩文本格式的转换结果（gzip；安装了 zstandard 时也支持 zstd）
+RESPONSE_COMPRESSION = _env_bool("RESPONSE_COMPRESSION", True)
+# 压缩上传解压后的大小上限（字节），防止解压炸弹；0 表示不限制
+MAX_DECOMPRESSED_BYTES = _env_int("MAX_DECOMPRESSED_BYTES", MAX_UPLOAD_BYTES)
+
+# --- 异步转换任务 ---
+# 任务结束后结果的保留时间（秒），超过后连同临时文件一起删除
+JOB_TTL_SECONDS = _env_int("JOB_TTL_SECONDS", 3600)
+# 同时保存的最大任务数（包括未完成与已完成的任务）
+JOB_MAX_JOBS = _env_int("JOB_MAX_JOBS", 100)
+
+# --- 转换进度 ---
+# 进度在请求结束后（或只有订阅、没有对应请求时）保留的时间（秒）
+PROGRESS_TTL_SECONDS = _env_int("PROGRESS_TTL_SECONDS", 300)
+# 同时保存的最大进度数，超出后丢弃最早创建的进度
+PROGRESS_MAX_ENTRIES = _env_int("PROGRESS_MAX_ENTRIES", 1000)
+
+# --- 解析 ---
+# 解析 .srt、.ass 文件路径或 bytes 输入时使用内存映射并按字节扫描，只解码字幕文本；关闭后按文本方式逐行解析
+MMAP_PARSING = _env_bool("MMAP_PARSING", True)
+
+# --- 时间轴规范化 ---
+# 转换时默认对时间轴做规范化：按开始时间排序、检查时间并重新编号；请求可以单独关闭
+TIMELINE_NORMALIZE = _env_bool("TIMELINE_NORMALIZE", True)
+# 默认消除不超过该时长（毫秒）的相邻字幕重叠与间隔，0 表示只检查不修正
+TIMELINE_OVERLAP_FIX_MS = _env_int("TIMELINE_OVERLAP_FIX_MS", 0)
+TIMELINE_GAP_FIX_MS = _env_int("TIMELINE_GAP_FIX_MS", 0)
+# 默认把结束时间早于开始时间的字幕改为持续该时长（毫秒），0 表示只检查不修正
+TIMELINE_MIN_DURATION_MS = _env_int("TIMELINE_MIN_DURATION_MS", 0)
+
+# --- 预览 ---
+# 预览接口一次最多返回的字幕条数
+PREVIEW_MAX_CUES = _env_int("PREVIEW_MAX_CUES", 500)
+
+# --- 性能剖析 ---
+# 对 /api/convert 的每次转换做性能剖析（会明显拖慢转换，仅用于排查问题）；
+# 关闭时管理员仍可通过请求头 X-Profile: 1 对单个请求开启
+PROFILE_CONVERSIONS = _env_bool("PROFILE_CONVERSIONS", False)
+# 保留的剖析结果数，超出后丢弃最早的结果
+PROFILE_MAX_RESULTS = _env_int("PROFILE_MAX_RESULTS", 20)
+# 剖析报告中每个阶段列出的函数数与内存分配位置数
+PROFILE_TOP_ENTRIES = _env_int("PROFILE_TOP_ENTRIES", 25)
+
+# --- 输出格式 ---
+# XLSX 写入器: 'fast' (流式写入，默认) 或 'openpyxl' (构建完整工作簿，较慢)
+XLSX_WRITER = _env_str("XLSX_WRITER", "fast").lower()
+
+# --- 管理接口 ---
+# 管理接口的访问令牌，通过请求头 X-Admin-Token 传入；为空时所有管理接口均不可用
+ADMIN_TOKEN = _env_str("ADMIN_TOKEN", "")
+
+# --- 转换结果缓存 ---
+# 默认关闭：开启后上传内容的转换结果会在服务端保留一段时间，与"处理后立即销毁"的隐私承诺不同，需要显式开启
+CACHE_ENABLED = _env_bool("CACHE_ENABLED", False)
+# 内存缓存的最大条目数与最大总字节数
+CACHE_MAX_ENTRIES = _env_int("CACHE_MAX_ENTRIES", 256)
+CACHE_MAX_BYTES = _env_int("CACHE_MAX_BYTES", 256 * 1024 * 1024)
+# 缓存条目的存活时间（秒）
+CACHE_TTL_SECONDS = _env_int("CACHE_TTL_SECONDS", 3600)
+# 磁盘缓存目录，为空表示不启用磁盘缓存；内存中淘汰的条目会转存到这里
+CACHE_DIR = _env_str("CACHE_DIR", "")
+# 磁盘缓存的最大总字节数
+CACHE_DISK_MAX_BYTES = _env_int("CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024)
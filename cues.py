@@ -0,0 +1,185 @@
+"""
+字幕数据模型模块
+定义统一的内部字幕数据结构，以及时间码与整数毫秒之间的转换。
+所有时间在解析时只转换一次为整数毫秒，仅在写入器需要时才格式化为字符串。
+"""
+
+import datetime
+import re
+from array import array
+
+# 通用时间码，兼容 SRT ("00:00:06,400")、ASS ("0:00:06.40") 以及不带毫秒的 "00:00:06"
+_TIME_PATTERN = re.compile(r'\s*(\d+):(\d{1,2}):(\d{1,2})(?:[,.](\d+))?\s*$')
+
+
+def hms_to_ms(hours, minutes, seconds, fraction=''):
+    """
+    将时、分、秒和秒的小数部分组合为整数毫秒。
+    :param hours: 小时（字符串或整数）。
+    :param minutes: 分钟（字符串或整数）。
+    :param seconds: 秒（字符串或整数）。
+    :param fraction: 秒的小数部分的数字字符串，如 "4"、"40"、"400"，按小数位解释。
+    :return: 整数毫秒。
+    """
+    ms = int(fraction.ljust(3, '0')[:3]) if fraction else 0
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + ms
+
+
+def parse_time(text):
+    """
+    将时间码字符串解析为整数毫秒。
+    例如 "00:00:06,400"、"0:00:06.40" 都会被解析为 6400。
+    :param text: 时间码字符串。
+    :return: 整数毫秒。
+    :raises ValueError: 当时间码格式不正确时。
+    """
+    # 快速路径：最常见的标准SRT时间码 "HH:MM:SS,mmm"，直接按位置切片
+    if len(text) == 12 and text[2] == ':' and text[5] == ':' and text[8] in ',.' and text.isascii():
+        try:
+            return ((int(text[0:2]) * 60 + int(text[3:5])) * 60 + int(text[6:8])) * 1000 + int(text[9:12])
+        except ValueError:
+            pass
+    match = _TIME_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"无法识别的时间格式: {text!r}")
+    return hms_to_ms(*match.groups(default=''))
+
+
+# Excel 日期序列号的起点（1900 日期系统，已包含 1900 年闰年错误的修正）
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+
+
+def to_milliseconds(value):
+    """
+    将表格单元格中的时间值转换为整数毫秒。
+    除时间码字符串外，也能正确处理 Excel 以数字（一天的比例）保存的时间，
+    以及 openpyxl 读出的 datetime.time、datetime.timedelta、datetime.datetime。
+    :param value: 单元格的值。
+    :return: 整数毫秒。
+    :raises ValueError: 当无法识别时间值时。
+    """
+    if isinstance(value, str):
+        return parse_time(value)
+    if isinstance(value, bool):
+        raise ValueError(f"无法识别的时间值: {value!r}")
+    if isinstance(value, (int, float)):
+        return round(value * 86400000)
+    if isinstance(value, datetime.datetime):
+        return round((value - _EXCEL_EPOCH).total_seconds() * 1000)
+    if isinstance(value, datetime.time):
+        return ((value.hour * 60 + value.minute) * 60 + value.second) * 1000 + round(value.microsecond / 1000)
+    if isinstance(value, datetime.timedelta):
+        return round(value.total_seconds() * 1000)
+    raise ValueError(f"无法识别的时间值: {value!r}")
+
+
+def format_srt_time(ms):
+    """
+    将整数毫秒格式化为SRT时间码，例如 6400 -> "00:00:06,400"。
+    :param ms: 整数毫秒，负数按 0 处理。
+    :return: SRT格式的时间字符串。
+    """
+    if ms < 0:
+        ms = 0
+    seconds, ms = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def format_vtt_time(ms):
+    """
+    将整数毫秒格式化为 WebVTT 时间码，例如 6400 -> "00:00:06.400"。
+    :param ms: 整数毫秒，负数按 0 处理。
+    :return: WebVTT 格式的时间字符串。
+    """
+    if ms < 0:
+        ms = 0
+    seconds, ms = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{ms:03d}"
+
+
+class Cue:
+    """
+    一行字幕。使用 __slots__ 避免为每个实例创建 __dict__。
+    """
+    __slots__ = ('index', 'start', 'end', 'text')
+
+    def __init__(self, index, start, end, text):
+        """
+        :param index: 序号（整数）。
+        :param start: 开始时间（整数毫秒）。
+        :param end: 结束时间（整数毫秒）。
+        :param text: 字幕内容。
+        """
+        self.index = index
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def to_row(self):
+        """
+        :return: 表格中的一行：[序号, 开始时间, 结束时间, 字幕内容]，时间格式化为SRT时间码。
+        """
+        return [self.index, format_srt_time(self.start), format_srt_time(self.end), self.text]
+
+    def __eq__(self, other):
+        if not isinstance(other, Cue):
+            return NotImplemented
+        return (self.index, self.start, self.end, self.text) == (other.index, other.start, other.end, other.text)
+
+    def __repr__(self):
+        return f"Cue({self.index!r}, {self.start!r}, {self.end!r}, {self.text!r})"
+
+
+class CueList:
+    """
+    紧凑的字幕容器。
+    序号、开始时间、结束时间分别存放在 array('q') 列中，字幕内容存放在列表中，
+    与逐行保存对象相比内存占用更低，按时间排序和校验也只需访问整数数组。
+    """
+    __slots__ = ('indexes', 'starts', 'ends', 'texts')
+
+    def __init__(self, cues=None):
+        """
+        :param cues: 可选的 Cue 可迭代对象，用于初始化容器。
+        """
+        self.indexes = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.texts = []
+        if cues is not None:
+            self.extend(cues)
+
+    def append(self, index, start, end, text):
+        """
+        追加一行字幕。
+        :param index: 序号（整数）。
+        :param start: 开始时间（整数毫秒）。
+        :param end: 结束时间（整数毫秒）。
+        :param text: 字幕内容。
+        """
+        self.indexes.append(index)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.texts.append(text)
+
+    def extend(self, cues):
+        """
+        追加多行字幕。
+        :param cues: Cue 的可迭代对象。
+        """
+        for cue in cues:
+            self.append(cue.index, cue.start, cue.end, cue.text)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        return Cue(self.indexes[i], self.starts[i], self.ends[i], self.texts[i])
+
+    def __iter__(self):
+        for i in range(len(self.texts)):
+            yield Cue(self.indexes[i], self.starts[i], self.ends[i], self.texts[i])
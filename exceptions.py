@@ -11,6 +11,10 @@ class ParseError(SubtitleConverterError):
     """解析文件时发生的错误"""
     pass
 
+class InputTooLargeError(ParseError):
+    """输入（如解压后的上传文件）超过大小上限"""
+    pass
+
 class WriteError(SubtitleConverterError):
     """写入文件时发生的错误"""
     pass
@@ -0,0 +1,201 @@
+"""
+格式注册表模块
+登记每种文件格式的读取器与写入器，以及每种转换类型接受的输入格式和输出格式。
+读写函数以 "模块:函数名" 的形式登记，首次使用时才导入所在模块：
+只做 ass_to_srt 的工作进程不会加载 .xlsx 相关的代码（以及 openpyxl），启动更快、内存占用更低。
+"""
+
+import functools
+import importlib
+from pathlib import Path
+
+
+class Codec:
+    """
+    对一个读取或写入函数的延迟引用。
+    """
+    __slots__ = ('target', 'kwargs', '_func')
+
+    def __init__(self, target, **kwargs):
+        """
+        :param target: "模块:函数名"，如 "parsers:iter_srt"。
+        :param kwargs: 调用时附加的关键字参数（如 CSV 的分隔符）。
+        """
+        self.target = target
+        self.kwargs = kwargs
+        self._func = None
+
+    def resolve(self):
+        """
+        :return: 导入后的函数（已绑定附加参数）。
+        """
+        # 模块导入本身是线程安全的，并发的首次调用至多重复绑定一次
+        if self._func is None:
+            module_name, _, name = self.target.partition(':')
+            func = getattr(importlib.import_module(module_name), name)
+            self._func = functools.partial(func, **self.kwargs) if self.kwargs else func
+        return self._func
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"Codec({self.target!r})"
+
+
+def _codec(value):
+    if value is None or isinstance(value, Codec):
+        return value
+    return Codec(value)
+
+
+class Format:
+    """
+    一种文件格式及其读写函数。不支持的方向为 None。
+    """
+    __slots__ = ('name', 'extension', 'reader', 'writer', 'chunk_writer')
+
+    def __init__(self, name, extension, reader=None, writer=None, chunk_writer=None):
+        """
+        :param name: 格式名，如 'srt'。
+        :param extension: 小写的文件扩展名，如 '.srt'。
+        :param reader: 读取器，参数为 (输入源)，返回 CueList 或逐行产出 Cue 的可迭代对象。
+        :param writer: 写入器，参数为 (字幕数据, 输出路径或二进制文件对象)。
+        :param chunk_writer: 流式写入器，参数为 (字幕数据)，返回产出字节块的生成器。
+        """
+        self.name = name
+        self.extension = extension
+        self.reader = _codec(reader)
+        self.writer = _codec(writer)
+        self.chunk_writer = _codec(chunk_writer)
+
+    def __repr__(self):
+        return f"Format({self.name!r})"
+
+
+class ConversionType:
+    """
+    一种转换类型：接受的输入格式与输出格式。
+    """
+    __slots__ = ('name', 'inputs', 'output')
+
+    def __init__(self, name, inputs, output):
+        """
+        :param name: 转换类型名，如 'ass_to_srt'。
+        :param inputs: 接受的输入 Format 元组。
+        :param output: 输出 Format。
+        """
+        self.name = name
+        self.inputs = inputs
+        self.output = output
+
+    @property
+    def input_extensions(self):
+        return tuple(fmt.extension for fmt in self.inputs)
+
+    def input_format(self, filename):
+        """
+        :param filename: 输入文件名。
+        :return: 按扩展名匹配到的输入 Format；该转换类型不接受此文件时返回 None。
+        """
+        extension = Path(filename).suffix.lower()
+        for fmt in self.inputs:
+            if fmt.extension == extension:
+                return fmt
+        return None
+
+    def __repr__(self):
+        return f"ConversionType({self.name!r})"
+
+
+_formats = {}
+_conversions = {}
+
+
+def register_format(name, extension, reader=None, writer=None, chunk_writer=None):
+    """
+    登记一种文件格式。读写函数可以是 "模块:函数名" 字符串或 Codec。
+    :return: Format。
+    """
+    fmt = Format(name, extension.lower(), reader, writer, chunk_writer)
+    _formats[name] = fmt
+    return fmt
+
+
+def register_conversion(name, inputs, output):
+    """
+    登记一种转换类型。
+    :param name: 转换类型名。
+    :param inputs: 输入格式名的序列，各格式须有读取器。
+    :param output: 输出格式名，该格式须有写入器。
+    :return: ConversionType。
+    :raises ValueError: 引用的格式不存在或缺少所需的读写函数时。
+    """
+    if any(input_name not in _formats for input_name in inputs) or output not in _formats:
+        raise ValueError(f"转换类型 {name} 引用了未登记的格式。")
+    input_formats = tuple(_formats[input_name] for input_name in inputs)
+    output_format = _formats[output]
+    if any(fmt.reader is None for fmt in input_formats) or output_format.writer is None:
+        raise ValueError(f"转换类型 {name} 引用的格式缺少读取器或写入器。")
+    conversion = ConversionType(name, input_formats, output_format)
+    _conversions[name] = conversion
+    return conversion
+
+
+def get_format(name):
+    """
+    :return: 格式名对应的 Format；不存在时返回 None。
+    """
+    return _formats.get(name)
+
+
+def find_format(filename):
+    """
+    :param filename: 文件名。
+    :return: 按扩展名匹配到的 Format；没有匹配的格式时返回 None。
+    """
+    extension = Path(filename).suffix.lower()
+    for fmt in _formats.values():
+        if fmt.extension == extension:
+            return fmt
+    return None
+
+
+def get_conversion(conversion_type):
+    """
+    :return: 转换类型对应的 ConversionType；不存在时返回 None。
+    """
+    return _conversions.get(conversion_type)
+
+
+def conversion_types():
+    """
+    :return: 所有已登记的转换类型名（按登记顺序）。
+    """
+    return list(_conversions)
+
+
+# --- 内置格式 ---
+register_format('srt', '.srt', reader='parsers:iter_srt',
+                writer='writers:write_to_srt', chunk_writer='writers:iter_srt_chunks')
+register_format('ass', '.ass', reader='parsers:iter_ass_events')
+register_format('vtt', '.vtt', reader='parsers:iter_vtt',
+                writer='writers:write_to_vtt', chunk_writer='writers:iter_vtt_chunks')
+register_format('xlsx', '.xlsx', reader='writers:parse_xlsx',
+                writer='writers:write_to_excel', chunk_writer='writers:iter_excel_chunks')
+register_format('csv', '.csv', reader=Codec('writers:iter_csv', delimiter=','),
+                writer=Codec('writers:write_to_csv', delimiter=','),
+                chunk_writer=Codec('writers:iter_csv_chunks', delimiter=','))
+register_format('tsv', '.tsv', reader=Codec('writers:iter_csv', delimiter='\t'),
+                writer=Codec('writers:write_to_csv', delimiter='\t'),
+                chunk_writer=Codec('writers:iter_csv_chunks', delimiter='\t'))
+
+# --- 内置转换类型 ---
+register_conversion('subtitle_to_excel', ('ass', 'srt', 'vtt'), 'xlsx')
+register_conversion('subtitle_to_csv', ('ass', 'srt', 'vtt'), 'csv')
+register_conversion('subtitle_to_tsv', ('ass', 'srt', 'vtt'), 'tsv')
+register_conversion('subtitle_to_vtt', ('ass', 'srt'), 'vtt')
+register_conversion('ass_to_srt', ('ass',), 'srt')
+register_conversion('vtt_to_srt', ('vtt',), 'srt')
+register_conversion('xlsx_to_srt', ('xlsx',), 'srt')
+register_conversion('csv_to_srt', ('csv', 'tsv'), 'srt')
@@ -0,0 +1,265 @@
+"""
+异步转换任务模块
+大文件可以先提交为任务：上传保存后立即返回任务 ID，转换在工作池中后台执行，
+客户端轮询任务状态（包括已转换的字幕行数），完成后再下载结果。
+任务结果保存在临时目录中，超过存活时间后连同目录一起删除。
+"""
+
+import asyncio
+import datetime
+import logging
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import config
+import metrics
+import subtitle_converter
+import worker_pool
+from exceptions import ConversionError
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobLimitError(Exception):
+    """同时保存的任务数已达上限。"""
+    pass
+
+
+def _isoformat(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat(timespec='seconds')
+
+
+class Job:
+    """
+    一个转换任务。状态字段只在事件循环中修改；进度 (cues) 在执行转换的线程中更新。
+    """
+
+    def __init__(self, job_id, input_name, conversion_type, work_dir, retime=None, normalize=None):
+        """
+        :param job_id: 任务 ID。
+        :param input_name: 上传的原始文件名。
+        :param conversion_type: 转换类型。
+        :param work_dir: 保存输入与输出文件的临时目录。
+        :param retime: 可选的重新定时操作。
+        :param normalize: 可选的时间轴规范化。
+        """
+        self.id = job_id
+        self.input_name = input_name
+        self.conversion_type = conversion_type
+        self.retime = retime
+        self.normalize = normalize
+        self.output_name = subtitle_converter.output_filename(input_name, conversion_type)
+        self.work_dir = work_dir
+        self.input_path = work_dir / f"input{Path(input_name).suffix.lower()}"
+        self.output_path = work_dir / f"output{Path(self.output_name).suffix}"
+        self.status = QUEUED
+        self.cues = 0
+        self.output_bytes = None
+        self.timeline = None
+        self.error = None
+        # 失败时的异常，下载结果时据此返回与同步转换接口相同的状态码
+        self.exception = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancelled = False
+        self.task = None
+
+    @property
+    def finished(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def report_progress(self, cues):
+        """
+        进度回调，在执行转换的线程中调用。任务已被删除时抛出异常以中止转换。
+        :param cues: 已转换的字幕行数。
+        """
+        if self.cancelled:
+            raise ConversionError("任务已取消。")
+        self.cues = cues
+
+    def to_dict(self, ttl_seconds):
+        """
+        :param ttl_seconds: 任务结束后的保留时间，用于计算过期时间。
+        :return: 任务状态字典。
+        """
+        expires_at = self.finished_at + ttl_seconds if self.finished_at is not None else None
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "input_name": self.input_name,
+            "conversion_type": self.conversion_type,
+            "output_name": self.output_name,
+            "progress": {"cues": self.cues},
+            "output_bytes": self.output_bytes,
+            "timeline": self.timeline,
+            "error": self.error,
+            "created_at": _isoformat(self.created_at),
+            "started_at": _isoformat(self.started_at),
+            "finished_at": _isoformat(self.finished_at),
+            "expires_at": _isoformat(expires_at),
+        }
+
+
+class JobStore:
+    """
+    保存任务并在结束后超过存活时间时淘汰。淘汰是惰性的：每次访问任务时顺带清理过期任务。
+    """
+
+    def __init__(self, ttl_seconds, max_jobs):
+        """
+        :param ttl_seconds: 任务结束后结果的保留时间（秒）。
+        :param max_jobs: 同时保存的最大任务数（包括未完成与已完成的任务）。
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, input_name, conversion_type, retime=None, normalize=None):
+        """
+        创建任务及其临时目录。保存的任务数已达上限时，先淘汰最早结束的任务。
+        :param input_name: 上传的原始文件名。
+        :param conversion_type: 转换类型。
+        :param retime: 可选的重新定时操作。
+        :param normalize: 可选的时间轴规范化。
+        :return: Job。
+        :raises JobLimitError: 未完成的任务已占满上限时。
+        """
+        self.evict_expired()
+        with self._lock:
+            if len(self._jobs) >= self.max_jobs:
+                finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at)
+                if not finished:
+                    raise JobLimitError(f"正在执行的任务数已达上限 ({self.max_jobs})，请稍后再试。")
+                self._discard(finished[0])
+            job_id = uuid.uuid4().hex
+            work_dir = Path(tempfile.mkdtemp(prefix="scriptgrid-job-"))
+            job = Job(job_id, input_name, conversion_type, work_dir, retime, normalize)
+            self._jobs[job_id] = job
+        return job
+
+    def get(self, job_id):
+        """
+        :return: 任务；不存在或已过期时返回 None。
+        """
+        self.evict_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def remove(self, job_id):
+        """
+        删除任务及其文件。正在执行的任务会在下一次报告进度时中止。
+        :return: 任务是否存在。
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            self._discard(job)
+        return True
+
+    def evict_expired(self):
+        """
+        淘汰结束时间超过存活时间的任务。
+        """
+        deadline = time.time() - self.ttl_seconds
+        with self._lock:
+            for job in [job for job in self._jobs.values() if job.finished and job.finished_at <= deadline]:
+                logger.info(f"Job {job.id} expired.")
+                self._discard(job)
+
+    def clear(self):
+        """
+        删除所有任务，应用关闭时调用。
+        """
+        with self._lock:
+            for job in list(self._jobs.values()):
+                self._discard(job)
+
+    def _discard(self, job):
+        # 调用方需持有锁
+        del self._jobs[job.id]
+        job.cancelled = True
+        if job.task is not None and not job.task.done():
+            job.task.cancel()
+        shutil.rmtree(job.work_dir, ignore_errors=True)
+
+
+async def execute(job):
+    """
+    在工作池中执行任务的转换，并更新任务状态。
+    线程池模式下转换过程中持续报告进度；进程池模式下进度回调无法跨进程传递，完成时一次性更新行数。
+    :param job: 已保存输入文件的任务。
+    """
+    progress = job.report_progress if config.WORKER_MODE != 'process' else None
+    conversion_type = job.conversion_type
+    try:
+        with metrics.CONVERSIONS_IN_FLIGHT.track(conversion_type=conversion_type):
+            # 等待工作池空位期间保持 queued 状态，取得空位后才开始计时
+            async with worker_pool.slot():
+                job.status = RUNNING
+                job.started_at = time.time()
+                stats = await worker_pool.run_in_slot(
+                    subtitle_converter.convert, str(job.input_path), str(job.output_path), conversion_type,
+                    progress=progress, retime=job.retime, normalize=job.normalize
+                )
+    except asyncio.CancelledError:
+        logger.info(f"Job {job.id} cancelled.")
+        raise
+    except Exception as e:
+        if job.cancelled:
+            logger.info(f"Job {job.id} cancelled.")
+            return
+        logger.error(f"Job {job.id} failed. Error: {e}")
+        metrics.record_error(conversion_type, e)
+        job.error = str(e)
+        # 不保留调用栈，避免任务过期前一直引用转换过程中的对象
+        job.exception = e.with_traceback(None)
+        job.status = FAILED
+    else:
+        metrics.record_conversion(conversion_type, stats)
+        job.cues = stats.cues
+        job.output_bytes = stats.output_bytes
+        job.timeline = stats.timeline
+        job.status = SUCCEEDED
+        logger.info(f"Job {job.id} succeeded: {stats.cues} cues.")
+    finally:
+        job.finished_at = time.time()
+        # 输入文件在转换结束后即可删除，只保留结果
+        if job.input_path.exists():
+            job.input_path.unlink(missing_ok=True)
+
+
+_store: JobStore = None
+
+
+def get_store():
+    """
+    获取（必要时创建）全局任务存储。
+    """
+    global _store
+    if _store is None:
+        _store = JobStore(ttl_seconds=config.JOB_TTL_SECONDS, max_jobs=config.JOB_MAX_JOBS)
+    return _store
+
+
+def shutdown():
+    """
+    取消所有任务并删除其文件。应用关闭时调用。
+    """
+    global _store
+    if _store is not None:
+        _store.clear()
+    _store = None
@@ -0,0 +1,267 @@
+"""
+运行指标模块
+提供最小化的 Prometheus 指标实现（计数器、仪表、直方图）与文本格式输出，不依赖第三方库。
+转换的各阶段耗时、字节数、字幕条数、错误数与在途请求数都记录在这里，通过 /metrics 接口暴露。
+"""
+
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认的耗时直方图桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """指标基类：按标签值分别保存数据。"""
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Counter(_Metric):
+    """只增不减的计数器。"""
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """可增可减的仪表。"""
+    type_name = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def track(self, **labels):
+        """
+        :return: 上下文管理器，进入时加一，退出时减一。
+        """
+        return _GaugeTracker(self, labels)
+
+
+class _GaugeTracker:
+    def __init__(self, gauge, labels):
+        self._gauge = gauge
+        self._labels = labels
+
+    def __enter__(self):
+        self._gauge.inc(**self._labels)
+
+    def __exit__(self, *exc_info):
+        self._gauge.dec(**self._labels)
+
+
+class Histogram(_Metric):
+    """累积直方图，记录观测值的分布、总和与次数。"""
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """
+        :return: 上下文管理器，记录 with 块的执行时间。
+        """
+        return _HistogramTimer(self, labels)
+
+    def _render_samples(self, items):
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _HistogramTimer:
+    def __init__(self, histogram, labels):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started, **self._labels)
+
+
+class Registry:
+    """指标注册表，负责按 Prometheus 文本格式输出所有指标。"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "scriptgrid_stage_seconds",
+    "Time spent in each conversion stage (receive, save, parse, write, send).",
+    ("stage", "conversion_type"),
+))
+INPUT_BYTES = REGISTRY.register(Counter(
+    "scriptgrid_input_bytes_total", "Bytes of uploaded input files.", ("conversion_type",),
+))
+OUTPUT_BYTES = REGISTRY.register(Counter(
+    "scriptgrid_output_bytes_total", "Bytes of converted output files.", ("conversion_type",),
+))
+CUES = REGISTRY.register(Counter(
+    "scriptgrid_cues_total", "Subtitle cues converted.", ("conversion_type",),
+))
+CONVERSIONS = REGISTRY.register(Counter(
+    "scriptgrid_conversions_total", "Conversions finished, by result.", ("conversion_type", "result"),
+))
+ERRORS = REGISTRY.register(Counter(
+    "scriptgrid_conversion_errors_total", "Failed conversions by exception class.", ("conversion_type", "exception"),
+))
+CONVERSIONS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "scriptgrid_conversions_in_flight", "Conversions waiting for or running in the worker pool.", ("conversion_type",),
+))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "scriptgrid_http_requests_in_flight", "HTTP requests currently being handled.",
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "scriptgrid_http_request_seconds", "Total HTTP request handling time, by method and status.", ("method", "status"),
+))
+
+
+def record_conversion(conversion_type, stats):
+    """
+    记录一次成功转换的统计信息。
+    :param conversion_type: 转换类型。
+    :param stats: subtitle_converter.ConversionStats。
+    """
+    STAGE_SECONDS.observe(stats.parse_seconds, stage="parse", conversion_type=conversion_type)
+    STAGE_SECONDS.observe(stats.write_seconds, stage="write", conversion_type=conversion_type)
+    OUTPUT_BYTES.inc(stats.output_bytes, conversion_type=conversion_type)
+    CUES.inc(stats.cues, conversion_type=conversion_type)
+    CONVERSIONS.inc(conversion_type=conversion_type, result="success")
+
+
+def record_error(conversion_type, error):
+    """
+    记录一次失败的转换。被包装为 SubtitleConverterError 的异常按其原始异常类计数。
+    :param conversion_type: 转换类型。
+    :param error: 捕获到的异常。
+    """
+    cause = error.__cause__
+    # 进程池传回的异常以 _RemoteTraceback 作为 __cause__，它只携带远程调用栈文本，不是原始异常
+    if cause is None or type(cause).__name__ == '_RemoteTraceback':
+        cause = error
+    ERRORS.inc(conversion_type=conversion_type, exception=type(cause).__name__)
+    CONVERSIONS.inc(conversion_type=conversion_type, result="error")
+
+
+class MetricsMiddleware:
+    """
+    ASGI 中间件：统计在途请求数与请求总耗时，并记录响应发送阶段的耗时。
+    端点把转换类型写入 request.state.conversion_type 后，发送阶段的耗时按该转换类型记录。
+    对流式响应而言，发送阶段与边转换边输出的解析、写入阶段相互重叠。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        scope.setdefault("state", {})["request_started"] = started
+        status = [500]
+        send_started = [None]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                send_started[0] = time.perf_counter()
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                conversion_type = scope["state"].get("conversion_type")
+                if conversion_type is not None and send_started[0] is not None:
+                    STAGE_SECONDS.observe(time.perf_counter() - send_started[0], stage="send", conversion_type=conversion_type)
+
+        with REQUESTS_IN_FLIGHT.track():
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"], status=status[0])
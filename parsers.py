@@ -1,148 +1,516 @@
 """
 字幕解析模块
-负责将 .srt 和 .ass 格式的字幕文件解析为统一的内部数据结构。
-内部数据结构: List[List[str]]，每个子列表代表一行字幕，格式为 [index, start_time, end_time, text]。
+负责将 .srt、.ass 和 .vtt 格式的字幕文件解析为统一的内部数据结构。
+内部数据结构: 逐行产出 cues.Cue（序号、整数毫秒的开始/结束时间、字幕内容），
+整体保存时使用紧凑的 cues.CueList 容器。
 """
 
+import html
+import io
+import logging
 import os
 import re
+from contextlib import contextmanager
+from cues import Cue, CueList, hms_to_ms, parse_time
 from exceptions import ParseError
+import config
+import sources
 
-def parse_srt(file_path):
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def open_text(source, encoding=None, newline=None):
     """
-    解析 .srt 字幕文件。
-    :param file_path: .srt 文件的路径。
-    :return: 一个二维列表，每个子列表代表一行字幕：[序号, 开始时间, 结束时间, 字幕内容]。
+    以文本方式打开输入源，统一处理文件路径、字节串和二进制文件对象。
+    对于调用方传入的文件对象，退出时不会关闭它。
+    :param source: 文件路径、bytes 或二进制文件对象（如上传流、BytesIO）。
+    :param encoding: 文本编码；默认根据内容自动判断（UTF-8，可带 BOM；否则按 GB18030 兼容 GBK），见 sources.detect_encoding。
+    :param newline: 换行符处理方式，同内置 open；读取 CSV 时应传入 ''。
+    :return: 一个文本文件对象。
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f, open_text(f, encoding, newline) as text_stream:
+            yield text_stream
+        return
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    if encoding is None:
+        encoding = sources.detect_stream_encoding(source)
+    text_stream = io.TextIOWrapper(source, encoding=encoding, newline=newline)
+    try:
+        yield text_stream
+    finally:
+        # 解除包装，避免关闭调用方的文件对象
+        text_stream.detach()
+
+
+def describe_source(source):
+    """
+    返回输入源的可读描述，用于错误信息。
+    :param source: 文件路径或文件对象。
+    :return: 描述字符串。
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return str(source)
+    return getattr(source, 'name', None) or '<内存数据>'
+
+
+# SRT 时间轴行，如 "00:00:01,000 --> 00:00:02,500"，兼容以 '.' 分隔毫秒的写法及行尾的位置信息
+_SRT_TIMING_PATTERN = re.compile(r'(\d{2}):(\d{2}):(\d{2})[,.](\d{3})\s*-->\s*(\d{2}):(\d{2}):(\d{2})[,.](\d{3})')
+# 同一模式的字节版本，用于按字节扫描
+_SRT_TIMING_BYTES_PATTERN = re.compile(_SRT_TIMING_PATTERN.pattern.encode('ascii'))
+
+
+def iter_srt(source):
+    """
+    以流式方式逐块解析 .srt 字幕文件，每解析完一个字幕块就立即产出，内存占用与文件大小无关。
+    兼容 CRLF 换行，以及文件末尾缺少空行的情况。
+    文件路径、bytes 与真实文件对象（config.MMAP_PARSING 开启时）映射到内存后按字节扫描，见 _iter_srt_mapped。
+    :param source: .srt 文件的路径、bytes 或二进制文件对象（如上传流）。
+    :return: 生成器，每次产出一个 Cue。
     :raises ParseError: 当解析过程出错时。
     """
     try:
-        # 使用 'utf-8-sig' 编码读取文件，可以正确处理可能存在的BOM头
-        with open(file_path, 'r', encoding='utf-8-sig') as f:
-            content = f.read()
-
-        # 定义一个强大的正则表达式来匹配一个完整的SRT字幕块
-        # re.DOTALL 标志让 '.' 可以匹配包括换行符在内的任意字符
-        pattern = re.compile(r'(\d+)\n(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2},\d{3})\n(.*?)\n\n', re.DOTALL)
-        # 找到所有匹配项
-        matches = pattern.findall(content)
-
-        data = [] # 准备存放结果
-        for match in matches:
-            # match 是一个元组，包含了正则表达式中每个括号捕获到的内容
-            index = match[0]
-            start_time = match[1]
-            end_time = match[2]
-            # 将可能存在的多行字幕文本合并为一行，用空格分隔
-            text = ' '.join(match[3].replace('\r\n', '\n').split('\n'))
-            data.append([index, start_time, end_time, text])
-
-        return data
+        if config.MMAP_PARSING:
+            with sources.map_source(source) as mapped:
+                if mapped is not None:
+                    yield from _iter_srt_mapped(mapped)
+                    return
+        with open_text(source) as f:
+            # --- 使用状态机逐行解析，空行表示一个字幕块的结束 ---
+            index = None        # 当前块的序号行
+            timing = None       # 当前块的时间轴匹配结果，为 None 表示尚未进入字幕文本
+            text_lines = []     # 当前块的字幕文本行
+            cue_count = 0       # 已产出的字幕数，用于为缺少序号的块补全序号
+
+            # 文本模式下按行迭代时由底层缓冲区分块读取，\r\n 会被统一转换为 \n
+            for line in f:
+                line = line.rstrip('\r\n')
+                if not line.strip():
+                    if timing is not None:
+                        cue_count += 1
+                        yield _make_srt_cue(index, timing, text_lines, cue_count)
+                        text_lines = []
+                    index = None
+                    timing = None
+                    continue
+
+                if timing is None:
+                    match = _SRT_TIMING_PATTERN.search(line)
+                    if match:
+                        timing = match
+                    elif line.strip().isdecimal():
+                        index = line.strip()
+                    # 时间轴之前的其他内容（不规范的行）直接忽略
+                    continue
+
+                text_lines.append(line)
+
+            # 文件末尾没有空行时，最后一个字幕块在这里产出
+            if timing is not None:
+                cue_count += 1
+                yield _make_srt_cue(index, timing, text_lines, cue_count)
+    except ParseError:
+        raise
     except Exception as e:
-        raise ParseError(f"解析 SRT 文件 '{file_path}' 时出错: {e}") from e
+        raise ParseError(f"解析 SRT 文件 '{describe_source(source)}' 时出错: {e}") from e
 
 
-def _convert_ass_time_to_srt(ass_time):
+def _iter_srt_mapped(mapped):
     """
-    一个内部辅助函数，用于将ASS时间格式转换为SRT时间格式。
-    例如，它能将 "0:00:06.40" 转换为 "00:00:06,400"。
-    :param ass_time: ASS格式的时间字符串。
-    :return: SRT格式的时间字符串。
+    按字节扫描 SRT 内容：时间轴、序号与块边界都直接在字节上匹配，只有字幕文本被解码为 str。
+    结果与逐行解析相同；只是不支持只用 \\r 换行的文件（此时整个文件被视为一行，解析不出字幕）。
+    :param mapped: sources.MappedSource。
+    :return: 生成器，每次产出一个 Cue。
     """
-    try:
-        # 按小数点分割时间的主体部分和厘秒(cs)部分
-        hms_part, cs_part = ass_time.split('.')
+    buffer, position, encoding = mapped.buffer, mapped.start, mapped.encoding
+    size = len(buffer)
+    search = _SRT_TIMING_BYTES_PATTERN.search
+    cue_count = 0
+    while True:
+        timing = search(buffer, position)
+        if timing is None:
+            return
+        # 时间轴之前（上一个空行之后）最后一个纯数字行是序号，其他不规范的行直接忽略
+        line_start = max(buffer.rfind(b'\n', position, timing.start()) + 1, position)
+        index = None
+        for line in buffer[position:line_start].splitlines():
+            line = line.strip()
+            if not line:
+                index = None
+            elif line.isdigit():
+                index = line
 
-        # 按冒号分割小时、分钟、秒
-        time_components = hms_part.split(':')
+        # 时间轴之后直到空行为止都是字幕文本，逐行解码
+        text_lines = []
+        position = buffer.find(b'\n', timing.end())
+        position = size if position < 0 else position + 1
+        while position < size:
+            end = buffer.find(b'\n', position)
+            if end < 0:
+                end = size
+            line = buffer[position:end].decode(encoding).rstrip('\r')
+            position = end + 1
+            if not line.strip():
+                break
+            text_lines.append(line)
 
-        # 使用 zfill(2) 方法确保小时、分钟、秒都是两位数，不足则在左侧补零
-        h = time_components[0].zfill(2)
-        m = time_components[1].zfill(2)
-        s = time_components[2].zfill(2)
+        cue_count += 1
+        start_h, start_m, start_s, start_ms, end_h, end_m, end_s, end_ms = map(int, timing.groups())
+        yield Cue(int(index) if index else cue_count,
+                  ((start_h * 60 + start_m) * 60 + start_s) * 1000 + start_ms,
+                  ((end_h * 60 + end_m) * 60 + end_s) * 1000 + end_ms,
+                  ' '.join(text_lines))
 
-        # 使用 ljust(3, '0') 将厘秒(2位)转换为毫秒(3位)，通过在右侧补零
-        ms_part = cs_part.ljust(3, '0')
 
-        # 按SRT格式重新组合，并用逗号分隔秒和毫秒
-        return f"{h}:{m}:{s},{ms_part}"
-    except Exception:
-        # 如果转换过程中出现任何意外（如不规范的时间格式），返回原始时间，以防程序崩溃
-        return ass_time
+def _make_srt_cue(index, timing, text_lines, cue_count):
+    """
+    一个内部辅助函数，用于将一个 SRT 字幕块的各部分组合为一个 Cue。
+    多行字幕文本合并为一行，用空格分隔；缺少或无法识别的序号使用块的顺序编号。
+    """
+    start = hms_to_ms(*timing.group(1, 2, 3, 4))
+    end = hms_to_ms(*timing.group(5, 6, 7, 8))
+    return Cue(int(index) if index else cue_count, start, end, ' '.join(text_lines))
 
 
-def parse_ass_to_srt_structure(file_path):
+def parse_srt(source):
     """
-    解析 .ass 文件，并将其内容转换为SRT的标准数据结构。
-    这种方法非常稳健，因为它只关注我们需要的字段，忽略其他复杂信息。
-    :param file_path: .ass 文件的路径。
-    :return: 一个二维列表，格式与 parse_srt 的返回结果完全相同。
+    解析 .srt 字幕文件。
+    :param source: .srt 文件的路径、bytes 或二进制文件对象。
+    :return: 包含所有字幕的 CueList。
+    :raises ParseError: 当解析过程出错时。
+    """
+    return CueList(iter_srt(source))
+
+
+# ASS 特效标签（如 {\fad(200,200)}、{\k20}）与换行符 \N、\n，预编译后在一次扫描中全部处理
+_ASS_TEXT_CLEAN_PATTERN = re.compile(r'\{[^}]*\}|\\[Nn]')
+
+
+def _replace_ass_markup(match):
+    """特效标签替换为空字符串，ASS 换行符替换为空格。"""
+    return ' ' if match.group()[0] == '\\' else ''
+
+
+def clean_ass_text(raw_text):
+    """
+    清除 ASS 字幕文本中的特效标签，并将 \\N、\\n 换行符替换为空格。
+    :param raw_text: Dialogue 行的 Text 字段。
+    :return: 纯文本字幕内容。
+    """
+    # 大多数行没有任何标签，直接返回以省去正则扫描
+    if '{' not in raw_text and '\\' not in raw_text:
+        return raw_text
+    return _ASS_TEXT_CLEAN_PATTERN.sub(_replace_ass_markup, raw_text)
+
+
+class ParseDiagnostics:
+    """
+    解析诊断信息收集器。
+    解析器把跳过的行记录在这里，而不是直接打印到标准输出，调用方可在解析结束后统一查看或上报。
+    """
+
+    def __init__(self, max_records=100):
+        """
+        :param max_records: 最多保留的详细记录条数，超出部分只计数，避免异常文件占用过多内存。
+        """
+        self.max_records = max_records
+        self.skipped_count = 0
+        self.records = []
+
+    def skip(self, line_number, reason, line):
+        """
+        记录一条被跳过的行。
+        :param line_number: 行号（从 1 开始）。
+        :param reason: 跳过原因。
+        :param line: 原始行内容。
+        """
+        self.skipped_count += 1
+        if len(self.records) < self.max_records:
+            self.records.append({'line_number': line_number, 'reason': reason, 'line': line})
+        logger.debug(f"Skipped line {line_number}: {reason}")
+
+    def to_dict(self):
+        """
+        :return: 可序列化为 JSON 的诊断摘要。
+        """
+        return {'skipped_count': self.skipped_count, 'records': list(self.records)}
+
+
+def iter_ass_events(source, diagnostics=None):
+    """
+    以流式方式解析 .ass 文件的 [Events] 段，逐行产出SRT标准数据结构的字幕。
+    只关注我们需要的 Start、End、Text 字段，忽略其他复杂信息；[Events] 之前的内容只做最少的检查。
+    文件路径、bytes 与真实文件对象（config.MMAP_PARSING 开启时）映射到内存后按字节扫描，见 _iter_ass_events_mapped。
+    :param source: .ass 文件的路径、bytes 或二进制文件对象。
+    :param diagnostics: 可选的 ParseDiagnostics，用于收集被跳过的行。
+    :return: 生成器，每次产出一个 Cue。
     :raises ParseError: 当解析过程出错时（例如缺少关键字段）。
     """
-    data = []
+    if diagnostics is None:
+        diagnostics = ParseDiagnostics()
     try:
-        with open(file_path, 'r', encoding='utf-8-sig') as f:
-            lines = f.readlines()
+        if config.MMAP_PARSING:
+            with sources.map_source(source) as mapped:
+                if mapped is not None:
+                    yield from _iter_ass_events_mapped(mapped, diagnostics)
+                    return
+        with open_text(source) as f:
+            # --- 1. 跳过 [Events] 之前的所有内容 ---
+            line_number = 0
+            for line in f:
+                line_number += 1
+                if line[:1] == '[' and line.strip().lower() == '[events]':
+                    break
+            else:
+                return
+
+            # --- 2. 解析 Format 行与 Dialogue 行 ---
+            field_count = 0         # Format 行定义的字段数量，为 0 表示尚未解析 Format 行
+            dialogue_count = 1      # 手动为每一行字幕生成序号
+            for line in f:
+                line_number += 1
+                line = line.strip()
+                if not line:
+                    continue
+
+                prefix = line[:9].lower()
+                if prefix == 'dialogue:':
+                    if not field_count:
+                        diagnostics.skip(line_number, "Dialogue 行出现在 Format 行之前", line)
+                        continue
+                    # 只在 Text 字段之前进行分割，maxsplit 确保字幕内容中的逗号不会被错误地分割
+                    parts = line[9:].strip().split(',', field_count - 1)
+                    if len(parts) < field_count:
+                        diagnostics.skip(line_number, "Dialogue 行字段不完整", line)
+                        continue
+                    try:
+                        # ASS 时间格式为 "0:00:06.40"，小数部分为厘秒
+                        start = parse_time(parts[start_index])
+                        end = parse_time(parts[end_index])
+                    except ValueError as e:
+                        diagnostics.skip(line_number, f"时间格式错误: {e}", line)
+                        continue
+                    yield Cue(dialogue_count, start, end, clean_ass_text(parts[text_index]))
+                    dialogue_count += 1
+
+                elif prefix[:7] == 'format:':
+                    # 解析 Format 行，这决定了 Dialogue 行的数据顺序
+                    fields = [field.strip().lower() for field in line[7:].split(',')]
+                    if 'start' not in fields or 'end' not in fields or 'text' not in fields:
+                        raise ParseError("ASS 'Format' 行缺少 Start, End, 或 Text 关键字段。")
+                    field_count = len(fields)
+                    start_index = fields.index('start')
+                    end_index = fields.index('end')
+                    text_index = fields.index('text')
+
+                elif line[0] == '[':
+                    # [Events] 段结束
+                    break
+    except ParseError:
+        raise
     except Exception as e:
-        raise ParseError(f"读取 ASS 文件 '{file_path}' 时出错: {e}") from e
-
-    # --- 使用状态机思想进行解析 ---
-    in_events_section = False  # 一个标志，用于判断当前是否在 [Events] 段落内
-    format_map = {}            # 一个字典，用于存储 Format 行定义的字段顺序
-    dialogue_count = 1         # 手动为每一行字幕生成序号
-
-    for line in lines:
-        line = line.strip() # 去除行首尾的空白字符
-        if line.lower() == '[events]':
-            in_events_section = True
-            continue # 进入下一轮循环
-
-        if not in_events_section:
-            continue # 如果还没到 [Events] 段，就忽略当前行
-
-        if line.lower().startswith('format:'):
-            # 解析 Format 行，这决定了 Dialogue 行的数据顺序
-            fields = [field.strip().lower() for field in line.split(':', 1)[1].split(',')]
-            # 创建一个从字段名到其索引位置的映射，如 {'start': 1, 'end': 2, 'text': 9}
-            format_map = {field: i for i, field in enumerate(fields)}
-            if 'start' not in format_map or 'end' not in format_map or 'text' not in format_map:
-                raise ParseError("ASS 'Format' 行缺少 Start, End, 或 Text 关键字段。")
+        raise ParseError(f"解析 ASS 文件 '{describe_source(source)}' 时出错: {e}") from e
+    finally:
+        if diagnostics.skipped_count:
+            logger.warning(f"Skipped {diagnostics.skipped_count} malformed line(s) in ASS file '{describe_source(source)}'.")
 
-        elif line.lower().startswith('dialogue:') and format_map:
-            # 只处理 Dialogue 行，并且前提是已经解析过 Format 行
-            # 这是最关键的一步：只在 Text 字段之前进行分割。
-            # maxsplit 参数确保了字幕内容中的逗号不会被错误地分割。
-            try:
-                parts = line.split(':', 1)[1].strip().split(',', len(format_map) - 1)
-            except Exception as e:
-                # 如果分割出错，跳过这一行并记录警告
-                print(f"警告: 解析 Dialogue 行时出错，已跳过: {line}. 错误: {e}")
-                continue
 
-            # 根据之前创建的映射，从 parts 列表中安全地提取数据
-            try:
-                ass_start_time = parts[format_map['start']]
-                ass_end_time = parts[format_map['end']]
-
-                # 调用辅助函数，将ASS时间转换为SRT标准格式
-                start_time = _convert_ass_time_to_srt(ass_start_time)
-                end_time = _convert_ass_time_to_srt(ass_end_time)
-
-                raw_text = parts[format_map['text']]
-                # 使用正则表达式清除ASS特效标签，如 {\fad(200,200)} 或 {\an8}
-                clean_text = re.sub(r'\{.*?\}', '', raw_text)
-                # ASS中的换行符是 \N 或 \n，都替换为空格
-                clean_text = clean_text.replace('\\N', ' ').replace('\\n', ' ')
-
-                # 将处理好的数据存入列表，格式与SRT解析结果统一
-                data.append([str(dialogue_count), start_time, end_time, clean_text])
-                dialogue_count += 1 # 序号加一
-            except (IndexError, KeyError) as e:
-                # 如果字段访问出错，跳过这一行并记录警告
-                print(f"警告: Dialogue 行字段不完整或格式错误，已跳过: {line}. 错误: {e}")
+def _iter_ass_events_mapped(mapped, diagnostics):
+    """
+    按字节扫描 ASS 内容，逻辑与 iter_ass_events 的逐行解析相同：
+    行首关键字、字段分割与时间都直接在字节上处理，只有 Text 字段被解码为 str。
+    :param mapped: sources.MappedSource。
+    :param diagnostics: ParseDiagnostics。
+    :return: 生成器，每次产出一个 Cue。
+    """
+    buffer, position, encoding = mapped.buffer, mapped.start, mapped.encoding
+    size = len(buffer)
+    find = buffer.find
+
+    # 行号只在记录被跳过的行时才需要，从上次计数的位置起增量统计换行数
+    counted = [position, 0]
+
+    def line_number(line_start):
+        counted[1] += buffer[counted[0]:line_start].count(b'\n')
+        counted[0] = line_start
+        return counted[1] + 1
+
+    def skip(line_start, reason, line):
+        diagnostics.skip(line_number(line_start), reason, line.decode(encoding, errors='replace'))
+
+    # --- 1. 跳过 [Events] 之前的所有内容 ---
+    while True:
+        if position >= size:
+            return
+        line_end = find(b'\n', position)
+        if line_end < 0:
+            line_end = size
+        line = buffer[position:line_end]
+        position = line_end + 1
+        if line[:1] == b'[' and line.strip().lower() == b'[events]':
+            break
+
+    # --- 2. 解析 Format 行与 Dialogue 行 ---
+    field_count = 0
+    dialogue_count = 1
+    while position < size:
+        line_start = position
+        line_end = find(b'\n', position)
+        if line_end < 0:
+            line_end = size
+        line = buffer[position:line_end].strip()
+        position = line_end + 1
+        if not line:
+            continue
+
+        prefix = line[:9].lower()
+        if prefix == b'dialogue:':
+            if not field_count:
+                skip(line_start, "Dialogue 行出现在 Format 行之前", line)
                 continue
-            except Exception as e:
-                # 其他与处理相关的错误
-                print(f"警告: 处理 Dialogue 行时出错，已跳过: {line}. 错误: {e}")
+            parts = line[9:].strip().split(b',', field_count - 1)
+            if len(parts) < field_count:
+                skip(line_start, "Dialogue 行字段不完整", line)
                 continue
+            try:
+                start = parse_time(parts[start_index].decode('ascii'))
+                end = parse_time(parts[end_index].decode('ascii'))
+            except ValueError as e:
+                skip(line_start, f"时间格式错误: {e}", line)
+                continue
+            text = parts[text_index].decode(encoding)
+            if text_is_last:
+                # 与逐行解析一致：行尾的 Unicode 空白（如全角空格）也被去除
+                text = text.rstrip()
+            yield Cue(dialogue_count, start, end, clean_ass_text(text))
+            dialogue_count += 1
+
+        elif prefix[:7] == b'format:':
+            fields = [field.strip().lower() for field in line[7:].decode(encoding).split(',')]
+            if 'start' not in fields or 'end' not in fields or 'text' not in fields:
+                raise ParseError("ASS 'Format' 行缺少 Start, End, 或 Text 关键字段。")
+            field_count = len(fields)
+            start_index = fields.index('start')
+            end_index = fields.index('end')
+            text_index = fields.index('text')
+            text_is_last = text_index == field_count - 1
+
+        elif line[:1] == b'[':
+            # [Events] 段结束
+            break
+
+
+def parse_ass_to_srt_structure(source, diagnostics=None):
+    """
+    解析 .ass 文件，并将其内容转换为SRT的标准数据结构。
+    :param source: .ass 文件的路径、bytes 或二进制文件对象。
+    :param diagnostics: 可选的 ParseDiagnostics，用于收集被跳过的行。
+    :return: 包含所有字幕的 CueList，格式与 parse_srt 的返回结果完全相同。
+    :raises ParseError: 当解析过程出错时（例如缺少关键字段）。
+    """
+    return CueList(iter_ass_events(source, diagnostics))
+
+
+# WebVTT 时间轴行，如 "00:00:01.000 --> 00:00:02.500 line:90%"，小时部分可以省略
+_VTT_TIMING_PATTERN = re.compile(r'(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})\s+-->\s+(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})')
+
+# WebVTT 文本中的标签，如 <b>、</i>、<v Speaker>、<c.yellow>、<00:00:01.500>
+_VTT_TAG_PATTERN = re.compile(r'<[^>]*>')
+
+# 不包含字幕的块：注释、样式与区域定义
+_VTT_SKIPPED_BLOCKS = ('NOTE', 'STYLE', 'REGION')
 
-    return data
\ No newline at end of file
+
+def clean_vtt_text(raw_text):
+    """
+    清除 WebVTT 字幕文本中的标签，并还原 &amp;、&lt; 等字符引用。
+    :param raw_text: 字幕文本。
+    :return: 纯文本字幕内容。
+    """
+    if '<' in raw_text:
+        raw_text = _VTT_TAG_PATTERN.sub('', raw_text)
+    if '&' in raw_text:
+        raw_text = html.unescape(raw_text)
+    return raw_text
+
+
+def iter_vtt(source):
+    """
+    以流式方式逐块解析 .vtt (WebVTT) 字幕文件，每解析完一个字幕块就立即产出。
+    忽略 NOTE、STYLE、REGION 块与时间轴行中的位置设置；多行字幕文本合并为一行，用空格分隔。
+    :param source: .vtt 文件的路径、bytes 或二进制文件对象（如上传流）。
+    :return: 生成器，每次产出一个 Cue。
+    :raises ParseError: 当文件不是 WebVTT 格式或解析过程出错时。
+    """
+    try:
+        with open_text(source) as f:
+            first_line = f.readline()
+            if not first_line.startswith('WEBVTT') or first_line[6:7] not in ('', ' ', '\t', '\r', '\n'):
+                raise ParseError(f"文件 '{describe_source(source)}' 不是有效的 WebVTT 文件（缺少 WEBVTT 文件头）。")
+
+            identifier = None       # 当前块的标识行
+            timing = None           # 当前块的时间轴匹配结果，为 None 表示尚未进入字幕文本
+            skipping = True         # 当前块是否需要忽略；第一个空行之前的内容属于文件头
+            block_started = False   # 当前块是否已读到过非空行
+            text_lines = []         # 当前块的字幕文本行
+            cue_count = 0           # 已产出的字幕数，用于为没有数字标识的块补全序号
+
+            for line in f:
+                line = line.rstrip('\r\n')
+                if not line.strip():
+                    if timing is not None:
+                        cue_count += 1
+                        yield _make_vtt_cue(identifier, timing, text_lines, cue_count)
+                        text_lines = []
+                    identifier = None
+                    timing = None
+                    skipping = False
+                    block_started = False
+                    continue
+
+                if skipping:
+                    continue
+
+                if timing is None:
+                    match = _VTT_TIMING_PATTERN.search(line)
+                    if match:
+                        timing = match
+                    elif not block_started and line.split(None, 1)[0] in _VTT_SKIPPED_BLOCKS:
+                        skipping = True
+                    else:
+                        identifier = line.strip()
+                    block_started = True
+                    continue
+
+                text_lines.append(line)
+
+            if timing is not None:
+                cue_count += 1
+                yield _make_vtt_cue(identifier, timing, text_lines, cue_count)
+    except ParseError:
+        raise
+    except Exception as e:
+        raise ParseError(f"解析 WebVTT 文件 '{describe_source(source)}' 时出错: {e}") from e
+
+
+def _make_vtt_cue(identifier, timing, text_lines, cue_count):
+    """
+    将一个 WebVTT 字幕块的各部分组合为一个 Cue。数字标识用作序号，其他标识使用块的顺序编号。
+    """
+    start = hms_to_ms(timing.group(1) or 0, *timing.group(2, 3, 4))
+    end = hms_to_ms(timing.group(5) or 0, *timing.group(6, 7, 8))
+    index = int(identifier) if identifier and identifier.isdecimal() else cue_count
+    return Cue(index, start, end, clean_vtt_text(' '.join(text_lines)))
+
+
+def parse_vtt(source):
+    """
+    解析 .vtt 字幕文件。
+    :param source: .vtt 文件的路径、bytes 或二进制文件对象。
+    :return: 包含所有字幕的 CueList。
+    :raises ParseError: 当解析过程出错时。
+    """
+    return CueList(iter_vtt(source))
@@ -0,0 +1,151 @@
+"""
+预览模块
+流式解析上传的文件，只返回前若干条字幕或某个时间窗口内的字幕，以及整份文件的统计信息
+（条数、总时长、重叠与间隔），不生成任何输出文件。
+解析过程中只保留每条字幕的开始、结束时间（整数毫秒数组），字幕内容只保留可能被返回的部分。
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+import formats
+from cues import format_srt_time
+from exceptions import SubtitleConverterError
+
+# 未指定窗口结束时间时，窗口延伸到文件结尾
+_NO_END = 2 ** 63 - 1
+
+
+class TimeIndex:
+    """
+    按开始时间排序的时间索引，用于统计重叠、间隔以及查询时间窗口。
+    除排序后的开始、结束时间外，还保存结束时间的前缀最大值：它单调不减，
+    因此窗口查询的两端都可以用二分查找定位，跨越窗口起点的长字幕也不会遗漏。
+    """
+    __slots__ = ('order', 'starts', 'ends', 'max_ends')
+
+    def __init__(self, starts, ends):
+        """
+        :param starts: 按文件顺序的开始时间数组。
+        :param ends: 按文件顺序的结束时间数组。
+        """
+        self.order = array('q', sorted(range(len(starts)), key=starts.__getitem__))
+        self.starts = array('q', [starts[i] for i in self.order])
+        self.ends = array('q', [ends[i] for i in self.order])
+        self.max_ends = array('q')
+        running = None
+        for end in self.ends:
+            running = end if running is None or end > running else running
+            self.max_ends.append(running)
+
+    def __len__(self):
+        return len(self.order)
+
+    def window(self, start, end):
+        """
+        查询与时间窗口 [start, end) 有交集的字幕。
+        :param start: 窗口开始时间（毫秒）。
+        :param end: 窗口结束时间（毫秒）。
+        :return: 生成器，按开始时间顺序产出字幕在文件中的位置。
+        """
+        # 开始时间不早于 end 的字幕都在窗口之后；前缀最大结束时间早于 start 的字幕都在窗口之前
+        hi = bisect_left(self.starts, end)
+        lo = bisect_left(self.max_ends, start)
+        for i in range(lo, hi):
+            if self.ends[i] > start or self.starts[i] >= start:
+                yield self.order[i]
+
+    def stats(self):
+        """
+        :return: 统计信息字典：字幕条数、最早开始与最晚结束时间、总时长，
+                 与前面字幕重叠的条数、字幕之间的间隔数、间隔总时长与最长间隔。
+        """
+        count = len(self.order)
+        overlaps = gaps = gap_ms = longest_gap_ms = 0
+        for i in range(1, count):
+            previous_end = self.max_ends[i - 1]
+            start = self.starts[i]
+            if start < previous_end:
+                overlaps += 1
+            elif start > previous_end:
+                gaps += 1
+                gap_ms += start - previous_end
+                longest_gap_ms = max(longest_gap_ms, start - previous_end)
+        first_start = self.starts[0] if count else None
+        last_end = self.max_ends[-1] if count else None
+        return {
+            "cues": count,
+            "first_start_ms": first_start,
+            "last_end_ms": last_end,
+            "duration_ms": last_end - first_start if count else 0,
+            "overlaps": overlaps,
+            "gaps": gaps,
+            "gap_ms": gap_ms,
+            "longest_gap_ms": longest_gap_ms,
+            "in_order": all(self.order[i] < self.order[i + 1] for i in range(count - 1)),
+        }
+
+
+def _cue_dict(cue):
+    return {
+        "index": cue.index,
+        "start_ms": cue.start,
+        "end_ms": cue.end,
+        "start": format_srt_time(cue.start),
+        "end": format_srt_time(cue.end),
+        "text": cue.text,
+    }
+
+
+def preview(source, input_name, limit, start_ms=None, end_ms=None):
+    """
+    预览字幕文件。
+    :param source: 输入内容，bytes 或二进制文件对象。
+    :param input_name: 原始文件名，用于判断输入格式。
+    :param limit: 最多返回的字幕条数。
+    :param start_ms: 可选的时间窗口开始时间（毫秒）；与 end_ms 都未提供时返回文件开头的字幕。
+    :param end_ms: 可选的时间窗口结束时间（毫秒），不提供表示到文件结尾。
+    :return: 预览结果字典（可 JSON 序列化）：format、stats、window、cues、truncated。
+    :raises SubtitleConverterError: 输入格式不受支持或解析失败时。
+    """
+    input_format = formats.find_format(input_name)
+    if input_format is None or input_format.reader is None:
+        raise SubtitleConverterError(f"不支持预览 {Path(input_name).suffix.lower() or '无扩展名的'} 文件。")
+    windowed = start_ms is not None or end_ms is not None
+    window_start = start_ms or 0
+    window_end = end_ms if end_ms is not None else _NO_END
+    if windowed and window_end <= window_start:
+        raise SubtitleConverterError("时间窗口的结束时间必须晚于开始时间。")
+
+    starts, ends = array('q'), array('q')
+    # 只保留可能被返回的字幕：开头模式下的前 limit 条；窗口模式下与窗口有交集、且开始时间最早的 limit 条，
+    # 用以 (开始时间, 位置) 的相反数为键的堆维护，与 TimeIndex 的排序一致
+    kept = []
+    for position, cue in enumerate(input_format.reader(source)):
+        starts.append(cue.start)
+        ends.append(cue.end)
+        if not windowed:
+            if position < limit:
+                kept.append((position, cue))
+        elif cue.start < window_end and (cue.end > window_start or cue.start >= window_start):
+            if len(kept) < limit:
+                heapq.heappush(kept, (-cue.start, -position, cue))
+            elif kept and (-cue.start, -position) > kept[0][:2]:
+                heapq.heapreplace(kept, (-cue.start, -position, cue))
+
+    index = TimeIndex(starts, ends)
+    result = {"format": input_format.name, "stats": index.stats(), "window": None}
+    if windowed:
+        kept = {-position: cue for _, position, cue in kept}
+        positions = list(index.window(window_start, window_end))
+        result["window"] = {"start_ms": window_start, "end_ms": end_ms, "cues": len(positions)}
+        selected = positions[:limit]
+        result["truncated"] = len(positions) > limit
+    else:
+        kept = dict(kept)
+        selected = range(min(limit, len(starts)))
+        result["truncated"] = len(starts) > limit
+    result["cues"] = [_cue_dict(kept[position]) for position in selected]
+    return result
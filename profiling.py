@@ -0,0 +1,216 @@
+"""
+性能剖析模块
+排查个别文件转换慢或占用内存多的问题：对一次转换分别剖析解析与写入阶段，
+记录每个阶段的 cProfile 函数耗时、tracemalloc 峰值内存与分配最多的代码位置。
+剖析结果保存在内存中（数量有上限），可通过管理接口查看报告或下载 .prof 文件（可用 pstats、snakeviz 等工具打开）。
+只有被要求剖析的转换才经过这里，其余转换的执行路径不受任何影响。
+"""
+
+import cProfile
+import datetime
+import marshal
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import config
+import subtitle_converter
+
+PHASES = ("parse", "write")
+
+# tracemalloc 的跟踪状态是进程级的，cProfile 也不能在同一线程中嵌套，因此同一进程内的剖析依次执行
+_lock = threading.Lock()
+# 快照中排除剖析工具自身（包括前一阶段保存的剖析数据）的内存分配
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, pstats.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<unknown>"),
+    # 首次使用某种格式时延迟导入读写模块产生的分配，与转换本身无关
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+def _function_label(key):
+    filename, line, name = key
+    if filename == '~':
+        # 内置函数，如 <method 'append' of 'list' objects>
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+class _PhaseRecorder:
+    """
+    以阶段名调用时返回包裹该阶段的上下文管理器，分别记录每个阶段的剖析数据。
+    """
+
+    def __init__(self, top):
+        self.top = top
+        self.phases = {}
+        self.profiles = {}
+
+    @contextmanager
+    def __call__(self, name):
+        profiler = cProfile.Profile()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            current, peak = tracemalloc.get_traced_memory()
+            # 在阶段结束时（该阶段的结果仍被引用）取快照，列出当前占用内存最多的代码位置
+            snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            self._record(name, profiler, elapsed, peak - baseline, current - baseline, snapshot)
+
+    def _record(self, name, profiler, elapsed, peak_bytes, retained_bytes, snapshot):
+        stats = pstats.Stats(profiler).stats
+        functions = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top]
+        self.phases[name] = {
+            "seconds": elapsed,
+            "peak_bytes": peak_bytes,
+            "retained_bytes": retained_bytes,
+            "top_functions": [
+                {
+                    "function": _function_label(key),
+                    "calls": calls,
+                    "own_seconds": own_seconds,
+                    "cumulative_seconds": cumulative_seconds,
+                }
+                for key, (_, calls, own_seconds, cumulative_seconds, _) in functions
+            ],
+            "top_allocations": [
+                {
+                    "location": f"{statistic.traceback[0].filename}:{statistic.traceback[0].lineno}",
+                    "size_bytes": statistic.size,
+                    "count": statistic.count,
+                }
+                for statistic in snapshot.statistics('lineno')[:self.top]
+            ],
+        }
+        # 与 pstats.Stats.dump_stats 写出的 .prof 文件格式相同
+        self.profiles[name] = marshal.dumps(stats)
+
+
+class ProfileResult:
+    """
+    一次剖析的结果：report 为可 JSON 序列化的报告，profiles 为各阶段的 .prof 文件内容。可被 pickle。
+    """
+    __slots__ = ('id', 'report', 'profiles')
+
+    def __init__(self, report, profiles):
+        self.id = report["profile_id"]
+        self.report = report
+        self.profiles = profiles
+
+
+def profile_conversion(source, input_name, conversion_type, retime=None, top=None, normalize=None):
+    """
+    在内存中执行一次转换并剖析。解析结果会先整体载入内存再写入，以便分别观察两个阶段；
+    线程池模式下 tracemalloc 也会统计同一时间其他线程的内存分配。
+    :param source: 输入内容，bytes 或二进制文件对象。
+    :param input_name: 原始文件名，用于判断输入格式。
+    :param conversion_type: 转换类型。
+    :param retime: 可选的重新定时操作。
+    :param top: 报告中每个阶段列出的函数数与内存分配位置数，默认取配置。
+    :param normalize: 可选的时间轴规范化，计入解析阶段。
+    :return: (转换结果 bytes, ConversionStats, ProfileResult)。
+    :raises SubtitleConverterError: 转换过程中发生的任何错误。
+    """
+    recorder = _PhaseRecorder(top or config.PROFILE_TOP_ENTRIES)
+    with _lock:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            output, stats = subtitle_converter.convert_bytes_in_phases(
+                source, input_name, conversion_type, recorder, retime, normalize
+            )
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+    report = {
+        "profile_id": uuid.uuid4().hex,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        "input_name": input_name,
+        "conversion_type": conversion_type,
+        "retime": repr(retime) if retime is not None else None,
+        "normalize": repr(normalize) if normalize is not None else None,
+        "cues": stats.cues,
+        "output_bytes": stats.output_bytes,
+        "phases": recorder.phases,
+    }
+    return output, stats, ProfileResult(report, recorder.profiles)
+
+
+class ProfileStore:
+    """
+    保存最近的剖析结果，超出数量上限时丢弃最早的结果。
+    """
+
+    def __init__(self, max_results):
+        """
+        :param max_results: 保留的最大结果数。
+        """
+        self.max_results = max_results
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        """
+        :param result: ProfileResult。
+        """
+        with self._lock:
+            self._results[result.id] = result
+            while len(self._results) > max(1, self.max_results):
+                self._results.popitem(last=False)
+
+    def get(self, profile_id):
+        """
+        :return: ProfileResult；不存在时返回 None。
+        """
+        with self._lock:
+            return self._results.get(profile_id)
+
+    def summaries(self):
+        """
+        :return: 所有结果的摘要列表，最新的在前。
+        """
+        with self._lock:
+            results = list(self._results.values())
+        return [
+            {
+                "profile_id": result.id,
+                "created_at": result.report["created_at"],
+                "input_name": result.report["input_name"],
+                "conversion_type": result.report["conversion_type"],
+                "cues": result.report["cues"],
+                "seconds": {name: phase["seconds"] for name, phase in result.report["phases"].items()},
+                "peak_bytes": {name: phase["peak_bytes"] for name, phase in result.report["phases"].items()},
+            }
+            for result in reversed(results)
+        ]
+
+
+_store: ProfileStore = None
+
+
+def get_store():
+    """
+    获取（必要时创建）全局剖析结果存储。
+    """
+    global _store
+    if _store is None:
+        _store = ProfileStore(max_results=config.PROFILE_MAX_RESULTS)
+    return _store
@@ -0,0 +1,284 @@
+"""
+转换进度模块
+长时间的转换过程中，客户端可以通过 Server-Sent Events 实时看到请求所处的阶段与进度：
+客户端为一次转换请求生成进度 ID，在请求头 X-Progress-Id 中带上它，同时订阅 /api/progress/{id}。
+请求经过 ProgressMiddleware 时记录接收的上传字节数；转换过程中记录已转换的字幕行数与已输出的字节数。
+
+进度由处理请求的协程与执行转换的线程直接写入（只是给属性赋值），不加锁也不跨线程唤醒订阅方；
+订阅方按固定间隔读取进度、只在发生变化时推送事件，因此报告进度不会拖慢解析与写入的循环。
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+
+import config
+
+WAITING = "waiting"
+RECEIVING = "receiving"
+CONVERTING = "converting"
+DONE = "done"
+FAILED = "failed"
+
+# 订阅方读取进度的间隔（秒），也是推送事件的最高频率
+EVENT_INTERVAL = 0.25
+# 进度长时间没有变化时发送注释行，避免代理或浏览器断开空闲连接
+HEARTBEAT_SECONDS = 15
+
+_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{8,64}')
+
+
+def is_valid_id(progress_id):
+    """
+    :return: 进度 ID 是否为 8~64 个字母、数字、下划线或连字符。
+    """
+    return progress_id is not None and _ID_PATTERN.fullmatch(progress_id) is not None
+
+
+class Progress:
+    """
+    一次请求的进度。订阅方可能在请求到达之前就已开始订阅，此时进度保持 waiting 状态。
+    """
+
+    def __init__(self, progress_id):
+        """
+        :param progress_id: 进度 ID。
+        """
+        self.id = progress_id
+        self.phase = WAITING
+        self.received_bytes = 0
+        self.total_bytes = None
+        self.cues = 0
+        self.output_bytes = 0
+        self.status = None
+        self.attached = False
+        self.created_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.phase in (DONE, FAILED)
+
+    def start(self, total_bytes=None):
+        """
+        请求到达时调用，重置进度。
+        :param total_bytes: 请求体的总大小（Content-Length），未知时为 None。
+        """
+        self.phase = WAITING
+        self.received_bytes = 0
+        self.total_bytes = total_bytes
+        self.cues = 0
+        self.output_bytes = 0
+        self.status = None
+        self.attached = True
+        self.finished_at = None
+
+    def add_received(self, size):
+        """
+        :param size: 新接收的请求体字节数。
+        """
+        if self.phase == WAITING:
+            self.phase = RECEIVING
+        self.received_bytes += size
+
+    def set_converting(self):
+        """
+        上传接收完毕、开始转换（包括等待转换名额）时调用。
+        """
+        self.phase = CONVERTING
+
+    def report_cues(self, cues):
+        """
+        转换的进度回调，在执行转换的线程中调用。
+        :param cues: 已转换的字幕行数。
+        """
+        self.cues = cues
+
+    def report_output(self, output_bytes):
+        """
+        :param output_bytes: 已产出的转换结果字节数。
+        """
+        self.output_bytes = output_bytes
+
+    def finish(self, status):
+        """
+        请求处理完毕时调用。
+        :param status: 响应的 HTTP 状态码；没有发出响应（如客户端已断开）时为 None。
+        """
+        self.status = status
+        self.phase = DONE if status is not None and status < 400 else FAILED
+        self.finished_at = time.monotonic()
+
+    def to_dict(self):
+        """
+        :return: 进度字典，作为事件的数据。
+        """
+        return {
+            "progress_id": self.id,
+            "phase": self.phase,
+            "received_bytes": self.received_bytes,
+            "total_bytes": self.total_bytes,
+            "cues": self.cues,
+            "output_bytes": self.output_bytes,
+            "status": self.status,
+        }
+
+
+class ProgressStore:
+    """
+    保存进度，结束后超过存活时间时淘汰；只有订阅、没有对应请求的进度在创建后超过存活时间时同样淘汰。
+    淘汰是惰性的：每次访问时顺带清理。
+    """
+
+    def __init__(self, ttl_seconds, max_entries):
+        """
+        :param ttl_seconds: 进度的存活时间（秒）。
+        :param max_entries: 同时保存的最大进度数，超出时丢弃最早创建的进度。
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, progress_id):
+        """
+        :param progress_id: 进度 ID。
+        :return: Progress；ID 格式无效时返回 None。
+        """
+        if not is_valid_id(progress_id):
+            return None
+        self.evict_expired()
+        with self._lock:
+            entry = self._entries.get(progress_id)
+            if entry is None:
+                while len(self._entries) >= max(1, self.max_entries):
+                    oldest = min(self._entries.values(), key=lambda item: item.created_at)
+                    del self._entries[oldest.id]
+                entry = self._entries[progress_id] = Progress(progress_id)
+            return entry
+
+    def evict_expired(self):
+        """
+        淘汰结束时间（或从未关联请求时的创建时间）超过存活时间的进度。
+        """
+        deadline = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            expired = [
+                entry.id for entry in self._entries.values()
+                if (entry.finished and entry.finished_at <= deadline)
+                or (not entry.attached and entry.created_at <= deadline)
+            ]
+            for progress_id in expired:
+                del self._entries[progress_id]
+
+
+def from_request(request):
+    """
+    :return: 当前请求的 Progress；请求没有带进度 ID 时返回 None。
+    """
+    return getattr(request.state, 'progress', None)
+
+
+def _event(data):
+    return f"event: progress\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+
+async def iter_events(progress):
+    """
+    以 Server-Sent Events 格式产出进度事件：订阅开始时先发送当前进度，之后只在进度变化时发送，
+    请求结束（phase 为 done 或 failed）后发送最后一个事件并结束。
+    订阅后超过存活时间仍没有对应的请求到达时，同样结束。
+    :param progress: Progress。
+    :return: 异步生成器，产出事件的字节串。
+    """
+    last = progress.to_dict()
+    yield _event(last)
+    idle = 0.0
+    while not progress.finished:
+        await asyncio.sleep(EVENT_INTERVAL)
+        if not progress.attached and time.monotonic() - progress.created_at > get_store().ttl_seconds:
+            return
+        current = progress.to_dict()
+        if current != last:
+            last = current
+            idle = 0.0
+            yield _event(current)
+        else:
+            idle += EVENT_INTERVAL
+            if idle >= HEARTBEAT_SECONDS:
+                idle = 0.0
+                yield b": keep-alive\n\n"
+    # 结束前的最后一次变化可能发生在上一次读取之后
+    current = progress.to_dict()
+    if current != last:
+        yield _event(current)
+
+
+class ProgressMiddleware:
+    """
+    ASGI 中间件：对指定路径中带 X-Progress-Id 请求头的 POST 请求记录进度。
+    位于准入控制之外，排队等待名额期间进度为 waiting；开始接收请求体后为 receiving；
+    端点开始转换后为 converting；响应发送完毕后按状态码为 done 或 failed。
+    """
+
+    def __init__(self, app, paths):
+        """
+        :param app: 下游 ASGI 应用。
+        :param paths: 记录进度的路径集合。
+        """
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        progress_id = None
+        total_bytes = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-progress-id":
+                progress_id = value.decode('latin-1')
+            elif name == b"content-length" and value.isdigit():
+                total_bytes = int(value)
+        progress = get_store().get_or_create(progress_id) if progress_id is not None else None
+        if progress is None:
+            await self.app(scope, receive, send)
+            return
+
+        progress.start(total_bytes)
+        scope.setdefault("state", {})["progress"] = progress
+        status = [None]
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                progress.add_received(len(message.get("body", b"")))
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except BaseException:
+            progress.finish(None)
+            raise
+        progress.finish(status[0])
+
+
+_store: ProgressStore = None
+
+
+def get_store():
+    """
+    获取（必要时创建）全局进度存储。
+    """
+    global _store
+    if _store is None:
+        _store = ProgressStore(ttl_seconds=config.PROGRESS_TTL_SECONDS, max_entries=config.PROGRESS_MAX_ENTRIES)
+    return _store
@@ -0,0 +1,284 @@
+"""
+转换结果缓存模块
+以"上传内容的哈希 + 转换参数 + 转换器版本"为键缓存转换结果，相同文件重复上传时无需再次解析和写入。
+缓存分为内存层和可选的磁盘层，两层都按最近最少使用 (LRU) 的顺序淘汰，并受条目数、总字节数与存活时间限制；
+内存层淘汰的条目会转存到磁盘层，磁盘层命中的条目会重新提升到内存层。
+缓存默认关闭，需通过 config.CACHE_ENABLED 显式开启。
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 缓存键是 SHA-256 的十六进制摘要，同时用作磁盘缓存的文件名
+_KEY_PATTERN = re.compile(r'[0-9a-f]{64}$')
+_DISK_SUFFIX = '.bin'
+
+
+def make_key(content, *parts):
+    """
+    计算缓存键。
+    :param content: 上传文件的完整字节内容。
+    :param parts: 影响转换结果的其他参数，如转换器版本、转换类型、输入扩展名。
+    :return: 64 位十六进制字符串。
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(content)
+    return digest.hexdigest()
+
+
+def is_valid_key(key):
+    """
+    :param key: 待检查的字符串。
+    :return: 是否为合法的缓存键（防止以任意路径访问磁盘缓存）。
+    """
+    return bool(_KEY_PATTERN.match(key))
+
+
+class ResultCache:
+    """
+    两层 LRU 转换结果缓存，线程安全。
+    """
+
+    def __init__(self, max_entries, max_bytes, ttl_seconds, disk_dir=None, disk_max_bytes=0):
+        """
+        :param max_entries: 内存层最多保存的条目数。
+        :param max_bytes: 内存层最多占用的字节数。
+        :param ttl_seconds: 条目的存活时间（秒），两层共用。
+        :param disk_dir: 磁盘层目录，为空时不启用磁盘层。
+        :param disk_max_bytes: 磁盘层最多占用的字节数。
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+
+        self._lock = threading.Lock()
+        # key -> (过期时间, 内容)，按最近使用顺序排列，最旧的在前
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        # key -> (过期时间, 大小)，内容保存在磁盘文件中
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    # --- 读写 ---
+
+    def get(self, key):
+        """
+        读取缓存的转换结果，命中时将其标记为最近使用。
+        :param key: 缓存键。
+        :return: 缓存的字节内容，未命中或已过期时返回 None。
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._drop_memory(key)
+
+            disk_entry = self._disk.get(key)
+            if disk_entry is None or disk_entry[0] <= now:
+                if disk_entry is not None:
+                    self._drop_disk(key)
+                self.misses += 1
+                return None
+            expires_at = disk_entry[0]
+
+        # 磁盘读取在锁外进行，避免阻塞其他线程的内存层访问
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            logger.warning(f"Failed to read cache entry {key} from disk: {e}")
+            with self._lock:
+                if key in self._disk:
+                    self._drop_disk(key)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            # 读取期间条目可能已被清除，此时不再提升到内存层
+            if key in self._disk:
+                self._disk.move_to_end(key)
+                self._store_memory(key, expires_at, data)
+        return data
+
+    def put(self, key, data):
+        """
+        保存转换结果。超过内存层上限的单个结果直接写入磁盘层（若已启用）。
+        :param key: 缓存键。
+        :param data: 转换结果的字节内容。
+        """
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store_memory(key, expires_at, data)
+
+    def purge(self, key=None):
+        """
+        清除缓存条目。
+        :param key: 要清除的缓存键；为 None 时清除全部条目。
+        :return: 清除的条目数（同一个键在两层中各算一次）。
+        """
+        with self._lock:
+            keys = [key] if key is not None else list(self._memory.keys() | self._disk.keys())
+            count = 0
+            for k in keys:
+                if k in self._memory:
+                    self._drop_memory(k)
+                    count += 1
+                if k in self._disk:
+                    self._drop_disk(k)
+                    count += 1
+        if count:
+            logger.info(f"Purged {count} cache entries.")
+        return count
+
+    def stats(self):
+        """
+        :return: 缓存统计信息字典，包括命中/未命中次数与各层占用。
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    # --- 内存层（调用方需持有锁） ---
+
+    def _store_memory(self, key, expires_at, data):
+        if key in self._memory:
+            self._drop_memory(key)
+        if len(data) > self.max_bytes or self.max_entries <= 0:
+            self._store_disk(key, expires_at, data)
+            return
+        self._memory[key] = (expires_at, data)
+        self._memory_bytes += len(data)
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes:
+            old_key, (old_expires_at, old_data) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old_data)
+            self.evictions += 1
+            if old_expires_at > time.time():
+                self._store_disk(old_key, old_expires_at, old_data)
+
+    def _drop_memory(self, key):
+        _, data = self._memory.pop(key)
+        self._memory_bytes -= len(data)
+
+    # --- 磁盘层（调用方需持有锁） ---
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + _DISK_SUFFIX)
+
+    def _store_disk(self, key, expires_at, data):
+        if not self.disk_dir or len(data) > self.disk_max_bytes:
+            return
+        if key in self._disk:
+            # 内容由键唯一确定，已存在时只需更新过期时间和使用顺序
+            self._disk[key] = (expires_at, self._disk[key][1])
+            self._disk.move_to_end(key)
+            return
+        try:
+            # 先写入临时文件再重命名，避免读取方看到写了一半的文件
+            fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self._disk_path(key))
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {key} to disk: {e}")
+            return
+        self._disk[key] = (expires_at, len(data))
+        self._disk_bytes += len(data)
+        while self._disk_bytes > self.disk_max_bytes:
+            old_key = next(iter(self._disk))
+            self._drop_disk(old_key)
+            self.evictions += 1
+
+    def _drop_disk(self, key):
+        _, size = self._disk.pop(key)
+        self._disk_bytes -= size
+        try:
+            os.remove(self._disk_path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove cache entry {key} from disk: {e}")
+
+    def _load_disk_index(self):
+        """
+        启动时扫描磁盘缓存目录，恢复未过期的条目，删除已过期的条目和残留的临时文件。
+        以文件修改时间作为写入时间，按其先后恢复 LRU 顺序。
+        """
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            key = name[:-len(_DISK_SUFFIX)] if name.endswith(_DISK_SUFFIX) else None
+            try:
+                stat = os.stat(path)
+                if key is None or not is_valid_key(key) or stat.st_mtime + self.ttl_seconds <= now:
+                    if name.endswith(('.tmp', _DISK_SUFFIX)):
+                        os.remove(path)
+                    continue
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, key, stat.st_size))
+        for mtime, key, size in sorted(entries):
+            self._disk[key] = (mtime + self.ttl_seconds, size)
+            self._disk_bytes += size
+        while self._disk_bytes > self.disk_max_bytes:
+            self._drop_disk(next(iter(self._disk)))
+        if self._disk:
+            logger.info(f"Loaded {len(self._disk)} cache entries from {self.disk_dir}")
+
+
+_cache: ResultCache = None
+
+
+def get_cache():
+    """
+    获取（必要时创建）全局结果缓存。
+    :return: ResultCache 实例；缓存未启用时返回 None。
+    """
+    global _cache
+    if not config.CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ResultCache(
+            max_entries=config.CACHE_MAX_ENTRIES,
+            max_bytes=config.CACHE_MAX_BYTES,
+            ttl_seconds=config.CACHE_TTL_SECONDS,
+            disk_dir=config.CACHE_DIR,
+            disk_max_bytes=config.CACHE_DISK_MAX_BYTES,
+        )
+        logger.info(f"Result cache enabled: max_entries={config.CACHE_MAX_ENTRIES}, disk_dir={config.CACHE_DIR or '-'}")
+    return _cache
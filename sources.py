@@ -0,0 +1,160 @@
+"""
+输入源处理模块
+判断输入文本的编码，并把文件路径、bytes 与真实文件对象映射为可按字节扫描的缓冲区（内存映射），
+供解析器直接在字节上查找块边界与时间轴，只解码需要输出的字幕文本。
+"""
+
+import codecs
+import io
+import mmap
+import os
+import re
+from contextlib import contextmanager
+
+# 编码检测使用的样本大小：从第一个非 ASCII 字节开始取样
+DETECT_SAMPLE_BYTES = 64 * 1024
+# 在文件开头查找第一个非 ASCII 字节的最大范围；ASS 文件的样式段等开头部分通常全是 ASCII
+DETECT_MAX_SCAN_BYTES = 8 * 1024 * 1024
+
+_NON_ASCII_PATTERN = re.compile(rb'[\x80-\xff]')
+
+
+def detect_encoding(sample):
+    """
+    根据样本判断文本编码：带 BOM 时按 BOM；样本是合法的 UTF-8（末尾被截断的多字节字符不计）时为 UTF-8；
+    否则按 GB18030 解码，它兼容 GBK 与 GB2312。
+    :param sample: 文件开头的字节，或从第一个非 ASCII 字节开始的一段字节。
+    :return: 'utf-8-sig'、'utf-16' 或 'gb18030'。
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return 'gb18030'
+    return 'utf-8-sig'
+
+
+def detect_buffer_encoding(buffer, start=0):
+    """
+    判断缓冲区（bytes 或 mmap）中文本的编码，不复制整个缓冲区。
+    :param buffer: bytes 或 mmap。
+    :param start: 文本开始的位置。
+    :return: 同 detect_encoding。
+    """
+    head = buffer[start:start + 3]
+    if head.startswith((codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return detect_encoding(head)
+    match = _NON_ASCII_PATTERN.search(buffer, start, start + DETECT_MAX_SCAN_BYTES)
+    if match is None:
+        return 'utf-8-sig'
+    return detect_encoding(buffer[match.start():match.start() + DETECT_SAMPLE_BYTES])
+
+
+def detect_stream_encoding(stream):
+    """
+    判断二进制文件对象中文本的编码，读取样本后恢复原来的读取位置。
+    :param stream: 二进制文件对象。
+    :return: 同 detect_encoding；无法回退读取位置的流按 'utf-8-sig' 处理。
+    """
+    try:
+        position = stream.tell()
+    except (AttributeError, OSError):
+        return 'utf-8-sig'
+    try:
+        head = stream.read(DETECT_SAMPLE_BYTES)
+        if head.startswith((codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return detect_encoding(head)
+        chunk, scanned = head, len(head)
+        while chunk:
+            match = _NON_ASCII_PATTERN.search(chunk)
+            if match is not None:
+                sample = chunk[match.start():]
+                if len(sample) < DETECT_SAMPLE_BYTES:
+                    sample += stream.read(DETECT_SAMPLE_BYTES - len(sample))
+                return detect_encoding(sample)
+            if scanned >= DETECT_MAX_SCAN_BYTES:
+                break
+            chunk = stream.read(DETECT_SAMPLE_BYTES)
+            scanned += len(chunk)
+        return 'utf-8-sig'
+    finally:
+        stream.seek(position)
+
+
+class MappedSource:
+    """
+    可按字节扫描的输入：buffer 为 bytes 或 mmap，文本从 start 开始（已跳过 BOM），
+    encoding 为解码字幕文本使用的编码。
+    """
+    __slots__ = ('buffer', 'start', 'encoding')
+
+    def __init__(self, buffer, start, encoding):
+        self.buffer = buffer
+        self.start = start
+        self.encoding = encoding
+
+
+def _mapped(buffer, start):
+    """
+    :return: MappedSource；编码不能按字节扫描（UTF-16）时返回 None。
+    """
+    encoding = detect_buffer_encoding(buffer, start)
+    if encoding == 'utf-16':
+        return None
+    if encoding == 'utf-8-sig':
+        if buffer[start:start + 3] == codecs.BOM_UTF8:
+            start += 3
+        # BOM 已跳过，字幕文本按普通 UTF-8 解码
+        encoding = 'utf-8'
+    return MappedSource(buffer, start, encoding)
+
+
+@contextmanager
+def map_source(source):
+    """
+    尝试把输入源映射为可按字节扫描的缓冲区。
+    文件路径与真实文件对象使用内存映射，文件内容由操作系统按需换入，不占用进程堆内存；bytes 直接使用。
+    UTF-8 与 GB18030 中，换行、逗号、冒号与数字这些 ASCII 字节不会出现在多字节字符内部，因此可以直接在字节上匹配。
+    :param source: 文件路径、bytes 或二进制文件对象。
+    :return: MappedSource；输入无法映射（如内存中的上传流、ZIP 条目）或编码为 UTF-16 时为 None，调用方应按文本方式读取。
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            with _map_file(f, 0) as mapped:
+                yield mapped
+        return
+
+    if isinstance(source, bytes):
+        yield _mapped(source, 0)
+        return
+
+    if isinstance(source, (io.BufferedReader, io.FileIO)):
+        try:
+            start = source.tell()
+            # 没有文件描述符的缓冲流（如解压流）无法映射
+            source.fileno()
+        except OSError:
+            yield None
+            return
+        with _map_file(source, start) as mapped:
+            yield mapped
+        return
+
+    yield None
+
+
+@contextmanager
+def _map_file(f, start):
+    """
+    :param f: 真实文件对象。
+    :param start: 文本开始的位置（文件对象当前的读取位置）。
+    """
+    size = os.fstat(f.fileno()).st_size
+    if size <= start:
+        yield _mapped(b'', 0)
+        return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        yield _mapped(buffer, start)
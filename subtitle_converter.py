@@ -2,85 +2,165 @@
 
 """
 核心转换逻辑模块 (适用于 Web 后端)
-负责协调解析和写入过程。
+负责协调 解析 -> 检查 -> 时间轴处理 -> 写入 的过程：输入与输出格式由 formats 中的登记表决定，
+提供按文件路径、内存数据与流式输出的转换入口，并记录各阶段的统计信息。
 """
 
-# Note: This file is largely unchanged from the original, 
-# but we ensure it's compatible with being called by the web backend.
-# The main change is to make path handling more robust and add logging.
-
+import io
+import itertools
 import os
 import logging
-from typing import List
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Callable, ContextManager, Iterable, Iterator, List, Optional, Tuple, Union
 
-# Configure logger for this module
+# 日志的输出方式由调用方（Web 应用或命令行工具）统一配置
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-if not logger.handlers:
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
 
 # Import local modules
 # We assume these are in the same directory or PYTHONPATH
-from parsers import parse_srt, parse_ass_to_srt_structure
-from writers import write_to_excel, write_to_srt, parse_xlsx
-from exceptions import SubtitleConverterError, ParseError, WriteError
+from cues import Cue, CueList
+from retime import Retime
+from timeline import Normalize, TimelineReport
+from exceptions import SubtitleConverterError, ParseError, WriteError, InputTooLargeError
 import constants
+import formats
+
+
+# 转换器版本：输出内容的格式发生变化时递增，使旧的缓存结果失效
+CONVERTER_VERSION = "3"
 
 
-def convert(input_path: str, output_path: str, conversion_type: str) -> None:
+def get_conversion(conversion_type: str) -> formats.ConversionType:
     """
-    执行字幕文件的转换。
-    :param input_path: 输入文件的完整路径。
-    :param output_path: 输出文件的完整路径。
     :param conversion_type: 转换类型。
-                        'subtitle_to_excel': .srt/.ass -> .xlsx
-                        'ass_to_srt': .ass -> .srt
-                        'xlsx_to_srt': .xlsx -> .srt
-    :raises SubtitleConverterError: 转换过程中发生的任何错误。
+    :return: 格式注册表中的转换类型。
+    :raises SubtitleConverterError: 当转换类型不受支持时。
     """
-    logger.info(f"Starting conversion: {input_path} -> {output_path} (type: {conversion_type})")
-    data: List[List[str]] = []
-    try:
-        # --- 1. 解析阶段 ---
-        if conversion_type == 'subtitle_to_excel':
-            if input_path.lower().endswith('.srt'):
-                data = parse_srt(input_path)
-            elif input_path.lower().endswith('.ass'):
-                data = parse_ass_to_srt_structure(input_path)
-            else:
-                raise SubtitleConverterError(constants.MSG_WARNING_UNSUPPORTED_FORMAT)
-
-        elif conversion_type == 'ass_to_srt':
-            if input_path.lower().endswith('.ass'):
-                data = parse_ass_to_srt_structure(input_path)
-            else:
-                raise SubtitleConverterError("输入文件必须是 .ass 格式。")
-
-        elif conversion_type == 'xlsx_to_srt':
-            if input_path.lower().endswith('.xlsx'):
-                data = parse_xlsx(input_path)
-            else:
-                raise SubtitleConverterError("输入文件必须是 .xlsx 格式。")
-
-        else:
-            raise SubtitleConverterError(f"不支持的转换类型: {conversion_type}")
-
-        # --- 2. 检查解析结果 ---
-        if not data:
-            logger.warning("No data parsed from the input file.")
-            raise SubtitleConverterError(constants.MSG_WARNING_NO_DATA_PARSED)
+    conversion = formats.get_conversion(conversion_type)
+    if conversion is None:
+        raise SubtitleConverterError(f"不支持的转换类型: {conversion_type}")
+    return conversion
+
+
+def output_filename(input_name: str, conversion_type: str) -> str:
+    """
+    根据输入文件名和转换类型，生成输出文件名（保留原始文件名的词干）。
+    :param input_name: 输入文件名。
+    :param conversion_type: 转换类型。
+    :return: 输出文件名。
+    :raises SubtitleConverterError: 当转换类型不受支持时。
+    """
+    return f"{Path(input_name).stem}{get_conversion(conversion_type).output.extension}"
+
+
+class ConversionStats:
+    """
+    一次转换的统计信息，可被 pickle，进程池模式下随结果一起返回。
+    流式转换中解析与写入交替进行：写入器从解析器取出每一行所花的时间计为解析耗时，其余计为写入耗时。
+    timeline 为时间轴规范化报告（TimelineReport.to_dict()），未规范化时为 None。
+    """
+    __slots__ = ('parse_seconds', 'write_seconds', 'cues', 'output_bytes', 'timeline')
+
+    def __init__(self):
+        self.parse_seconds = 0.0
+        self.write_seconds = 0.0
+        self.cues = 0
+        self.output_bytes = 0
+        self.timeline = None
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return (f"ConversionStats(parse_seconds={self.parse_seconds:.6f}, write_seconds={self.write_seconds:.6f}, "
+                f"cues={self.cues}, output_bytes={self.output_bytes})")
+
+
+# 每转换多少行字幕调用一次进度回调
+PROGRESS_INTERVAL = 1000
+
+
+class _TimedCues:
+    """
+    包装解析结果的迭代器，累计取出每一行的耗时（即解析耗时）与行数，并定期报告进度。
+    """
+    __slots__ = ('_iterator', '_stats', '_progress')
+
+    def __init__(self, iterator: Iterator[Cue], stats: ConversionStats, progress: Optional[Callable[[int], None]] = None):
+        self._iterator = iterator
+        self._stats = stats
+        self._progress = progress
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            cue = next(self._iterator)
+        finally:
+            self._stats.parse_seconds += time.perf_counter() - started
+        self._stats.cues += 1
+        if self._progress is not None and not self._stats.cues % PROGRESS_INTERVAL:
+            self._progress(self._stats.cues)
+        return cue
 
-        # --- 3. 写入阶段 ---
-        if conversion_type == 'subtitle_to_excel':
-            write_to_excel(data, output_path)
-        elif conversion_type in ['ass_to_srt', 'xlsx_to_srt']:
-            write_to_srt(data, output_path)
-        
-        logger.info(f"Conversion successful: {output_path}")
 
+def _input_format(input_name: str, conversion_type: str) -> formats.Format:
+    """
+    根据转换类型和输入文件扩展名，从格式注册表中选择输入格式。
+    :param input_name: 输入文件名，用于判断文件格式。
+    :param conversion_type: 转换类型。
+    :return: 输入格式。
+    :raises SubtitleConverterError: 当转换类型不受支持或不接受该文件时。
+    """
+    conversion = get_conversion(conversion_type)
+    input_format = conversion.input_format(input_name)
+    if input_format is None:
+        raise SubtitleConverterError(f"输入文件必须是 {'、'.join(conversion.input_extensions)} 格式。")
+    return input_format
+
+
+def _peek_not_empty(data: Iterable[Cue]) -> Optional[Iterator[Cue]]:
+    """
+    检查字幕数据是否为空，且不会消耗惰性生成器中的数据。
+    :param data: 字幕数据（CueList 或生成器）。
+    :return: 与原数据内容相同的迭代器；如果没有任何字幕则返回 None。
+    """
+    iterator = iter(data)
+    first = next(iterator, None)
+    if first is None:
+        return None
+    return itertools.chain([first], iterator)
+
+
+def _write(data: Iterable[Cue], output, conversion_type: str) -> None:
+    """
+    写入阶段：根据转换类型选择写入器。写入器逐行消费数据，因此流式解析器的结果不会被整体载入内存。
+    :param data: 字幕数据。
+    :param output: 输出文件路径或可写的二进制文件对象。
+    :param conversion_type: 转换类型。
+    """
+    get_conversion(conversion_type).output.writer(data, output)
+
+
+@contextmanager
+def _conversion_errors():
+    """
+    将转换过程中的各类异常统一转换为 SubtitleConverterError。
+    """
+    try:
+        yield
+    except InputTooLargeError:
+        # 保留具体类型，由调用方返回 413
+        logger.error("Input exceeded the size limit.")
+        raise
     except (ParseError, WriteError) as e:
         # 重新抛出为更通用的转换错误
         logger.error(f"Parse/Write error during conversion: {e}")
@@ -92,4 +172,364 @@ def convert(input_path: str, output_path: str, conversion_type: str) -> None:
     except Exception as e:
         # 捕获所有其他未预期的错误
         logger.error(f"Unexpected error during conversion: {e}")
-        raise SubtitleConverterError(f"转换过程中发生未预期的错误: {e}") from e
\ No newline at end of file
+        raise SubtitleConverterError(f"转换过程中发生未预期的错误: {e}") from e
+
+
+def _parse_checked(source, input_format: formats.Format, stats: ConversionStats,
+                   progress: Optional[Callable[[int], None]] = None,
+                   retime: Optional[Retime] = None, normalize: Optional[Normalize] = None,
+                   stream_normalize: bool = False) -> Iterator[Cue]:
+    """
+    解析输入并确认至少有一行字幕。
+    :param input_format: 输入格式，由其读取器解析输入。
+    :param stats: 记录解析耗时与行数的统计对象。
+    :param progress: 可选的进度回调，每转换 PROGRESS_INTERVAL 行调用一次，参数为已转换的行数。
+    :param retime: 可选的重新定时操作。需要对整列时间计算，因此会先把全部字幕读入 CueList，耗时计入解析阶段。
+    :param normalize: 可选的时间轴规范化，在重新定时之后执行，同样先读入全部字幕；报告保存在 stats.timeline。
+    :param stream_normalize: 为 True、不需要重新定时且读取器逐行产出字幕时，以单次遍历规范化（不排序），
+                             保持边解析边写入，报告在字幕全部取出后才写入 stats.timeline；
+                             读取器返回整体载入的 CueList 时单次遍历省不了内存，仍读入后排序。
+    :return: 计时的字幕迭代器。
+    :raises SubtitleConverterError: 当没有解析出任何字幕时。
+    """
+    started = time.perf_counter()
+    # --- 1. 解析阶段 ---
+    data = input_format.reader(source)
+    if isinstance(data, CueList):
+        stream_normalize = False
+
+    # --- 2. 检查解析结果 ---
+    data = _peek_not_empty(data)
+    if retime is not None and retime.is_identity:
+        retime = None
+    if data is not None and (retime is not None or (normalize is not None and not stream_normalize)):
+        data = _apply_timeline(data, stats, progress, retime, normalize)
+        # 读入全部字幕时已报告过进度，写入时不再重复报告
+        progress = None
+    elif data is not None and normalize is not None:
+        data = _normalize_stream(data, stats, normalize)
+    stats.parse_seconds += time.perf_counter() - started
+    if data is None:
+        logger.warning("No data parsed from the input file.")
+        raise SubtitleConverterError(constants.MSG_WARNING_NO_DATA_PARSED)
+    return _TimedCues(data, stats, progress)
+
+
+def _apply_timeline(data: Iterator[Cue], stats: ConversionStats, progress: Optional[Callable[[int], None]],
+                    retime: Optional[Retime], normalize: Optional[Normalize]) -> Iterator[Cue]:
+    """
+    把全部字幕读入 CueList，依次执行重新定时与时间轴规范化。
+    :param progress: 可选的进度回调，读入过程中报告已读入的行数。
+    :return: 处理后的字幕迭代器。
+    """
+    # 读入的耗时由调用方计入解析阶段，行数在写入时统计，这里用临时的统计对象避免重复计数
+    cues = CueList(_TimedCues(data, ConversionStats(), progress))
+    if retime is not None:
+        retime.apply(cues)
+    if normalize is not None:
+        report = normalize.apply(cues)
+        stats.timeline = report.to_dict()
+        _log_timeline(report)
+    return iter(cues)
+
+
+def _normalize_stream(data: Iterator[Cue], stats: ConversionStats, normalize: Normalize) -> Iterator[Cue]:
+    """
+    单次遍历的时间轴规范化，字幕全部取出后把报告写入 stats.timeline。
+    :return: 规范化后的字幕迭代器。
+    """
+    report = TimelineReport()
+    yield from normalize.iter_apply(data, report)
+    stats.timeline = report.to_dict()
+    _log_timeline(report)
+
+
+def _streamed_out_of_order(stats: ConversionStats) -> bool:
+    """
+    :return: 单次遍历规范化时是否发现了未排序的字幕，即输出未按开始时间排序。
+             读入后规范化的报告中 in_order 为 False 时 reordered 一定大于 0，只有单次遍历时 reordered 为 0。
+    """
+    return stats.timeline is not None and not stats.timeline['in_order'] and not stats.timeline['reordered']
+
+
+def _log_timeline(report: TimelineReport) -> None:
+    if report.changed or not report.in_order:
+        logger.info(f"Timeline normalized: {report.summary()}")
+
+
+def _run(source, input_name: str, output, conversion_type: str,
+         progress: Optional[Callable[[int], None]] = None, retime: Optional[Retime] = None,
+         normalize: Optional[Normalize] = None, stream_normalize: bool = False) -> ConversionStats:
+    """
+    执行 解析 -> 检查 -> 写入 的完整流程，并统一处理异常。
+    :param progress: 可选的进度回调，参数为已转换的行数。
+    :param retime: 可选的重新定时操作。
+    :param normalize: 可选的时间轴规范化。
+    :param stream_normalize: 是否以单次遍历规范化，见 _parse_checked。
+    :return: 转换统计信息。
+    :raises SubtitleConverterError: 转换过程中发生的任何错误。
+    """
+    stats = ConversionStats()
+    with _conversion_errors():
+        data = _parse_checked(source, _input_format(input_name, conversion_type), stats, progress, retime, normalize,
+                              stream_normalize)
+
+        # --- 3. 写入阶段 ---
+        start_position = _tell(output)
+        started = time.perf_counter()
+        parse_seconds = stats.parse_seconds
+        _write(data, output, conversion_type)
+        stats.write_seconds = time.perf_counter() - started - (stats.parse_seconds - parse_seconds)
+        if isinstance(output, (str, os.PathLike)):
+            stats.output_bytes = os.path.getsize(output)
+        elif start_position is not None:
+            stats.output_bytes = _tell(output) - start_position
+    return stats
+
+
+def _tell(output):
+    """
+    :return: 文件对象的当前位置；输出为路径或不可 seek 的流时返回 None。
+    """
+    if isinstance(output, (str, os.PathLike)):
+        return None
+    try:
+        return output.tell()
+    except (AttributeError, OSError):
+        return None
+
+
+def convert(input_path: str, output_path: str, conversion_type: str,
+            progress: Optional[Callable[[int], None]] = None, retime: Optional[Retime] = None,
+            normalize: Optional[Normalize] = None) -> ConversionStats:
+    """
+    执行字幕文件的转换。
+    :param input_path: 输入文件的完整路径。
+    :param output_path: 输出文件的完整路径。
+    :param conversion_type: 转换类型（见 formats 中登记的转换类型）。
+                        'subtitle_to_excel': .srt/.ass/.vtt -> .xlsx
+                        'subtitle_to_csv': .srt/.ass/.vtt -> .csv
+                        'subtitle_to_tsv': .srt/.ass/.vtt -> .tsv
+                        'subtitle_to_vtt': .srt/.ass -> .vtt
+                        'ass_to_srt': .ass -> .srt
+                        'vtt_to_srt': .vtt -> .srt
+                        'xlsx_to_srt': .xlsx -> .srt
+                        'csv_to_srt': .csv/.tsv -> .srt
+    :param progress: 可选的进度回调，每转换 PROGRESS_INTERVAL 行在执行转换的线程中调用一次，参数为已转换的行数。
+                     回调抛出的异常会中止转换。
+    :param retime: 可选的重新定时操作（平移、缩放或帧率换算），在写入前作用于所有字幕的时间。
+    :param normalize: 可选的时间轴规范化（排序、检查并可选地修正时间、重新编号），在重新定时之后执行。
+                      输入文件可能很大，因此先以单次遍历边解析边写入；发现字幕未按开始时间排序时，
+                      再读入全部字幕、排序后重新转换一次，只有需要排序的文件才占用与字幕数成正比的内存。
+                      同时重新定时或输入本身整体载入（如 .xlsx）时直接读入后排序，只转换一次。
+    :return: 转换统计信息。
+    :raises SubtitleConverterError: 转换过程中发生的任何错误。
+    """
+    logger.info(f"Starting conversion: {input_path} -> {output_path} (type: {conversion_type})")
+    try:
+        stats = _run(input_path, input_path, output_path, conversion_type, progress, retime, normalize,
+                     stream_normalize=True)
+        if _streamed_out_of_order(stats):
+            logger.info(f"Timeline out of order, converting again with sorting: {input_path}")
+            stats = _run(input_path, input_path, output_path, conversion_type, progress, retime, normalize)
+    except SubtitleConverterError:
+        # 流式解析时，解析错误可能在写入开始后才出现，此时删除不完整的输出文件
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    logger.info(f"Conversion successful: {output_path}")
+    return stats
+
+
+def convert_stream(source: Union[bytes, BinaryIO], input_name: str, output: BinaryIO, conversion_type: str,
+                   retime: Optional[Retime] = None, progress: Optional[Callable[[int], None]] = None,
+                   normalize: Optional[Normalize] = None) -> ConversionStats:
+    """
+    在内存中执行转换：从字节串或文件对象读取输入，将结果写入可写的二进制文件对象。
+    整个过程不会在磁盘上创建任何临时文件。
+    :param source: 输入内容，bytes 或二进制文件对象（如上传流）。
+    :param input_name: 原始文件名，用于判断输入格式。
+    :param output: 可写的二进制文件对象（如 BytesIO）。
+    :param conversion_type: 转换类型，取值同 convert。
+    :param retime: 可选的重新定时操作，同 convert。
+    :param progress: 可选的进度回调，同 convert。
+    :param normalize: 可选的时间轴规范化，同 convert。
+    :return: 转换统计信息。
+    :raises SubtitleConverterError: 转换过程中发生的任何错误。
+    """
+    logger.info(f"Starting in-memory conversion: {input_name} (type: {conversion_type})")
+    stats = _run(source, input_name, output, conversion_type, progress, retime, normalize)
+    logger.info(f"In-memory conversion successful: {input_name}")
+    return stats
+
+
+def convert_bytes(source: Union[bytes, BinaryIO], input_name: str, conversion_type: str,
+                  retime: Optional[Retime] = None, normalize: Optional[Normalize] = None) -> bytes:
+    """
+    在内存中执行转换，并以 bytes 返回转换结果。
+    :param source: 输入内容，bytes 或二进制文件对象。
+    :param input_name: 原始文件名，用于判断输入格式。
+    :param conversion_type: 转换类型，取值同 convert。
+    :param retime: 可选的重新定时操作，同 convert。
+    :param normalize: 可选的时间轴规范化，同 convert。
+    :return: 转换后文件的完整内容。
+    :raises SubtitleConverterError: 转换过程中发生的任何错误。
+    """
+    return convert_bytes_with_stats(source, input_name, conversion_type, retime, normalize=normalize)[0]
+
+
+def convert_bytes_with_stats(source: Union[bytes, BinaryIO], input_name: str, conversion_type: str,
+                             retime: Optional[Retime] = None,
+                             progress: Optional[Callable[[int], None]] = None,
+                             normalize: Optional[Normalize] = None) -> Tuple[bytes, ConversionStats]:
+    """
+    同 convert_bytes，同时返回转换统计信息。
+    :param progress: 可选的进度回调，同 convert。
+    :return: (转换后文件的完整内容, 转换统计信息)。
+    :raises SubtitleConverterError: 转换过程中发生的任何错误。
+    """
+    output = io.BytesIO()
+    stats = convert_stream(source, input_name, output, conversion_type, retime, progress, normalize)
+    return output.getvalue(), stats
+
+
+def convert_bytes_in_phases(source: Union[bytes, BinaryIO], input_name: str, conversion_type: str,
+                            phase: Callable[[str], ContextManager], retime: Optional[Retime] = None,
+                            normalize: Optional[Normalize] = None) -> Tuple[bytes, ConversionStats]:
+    """
+    先完整解析、再写入的内存转换，供性能剖析分别观察两个阶段。
+    与 convert_bytes 不同，解析结果会整体载入 CueList，而不是边解析边写入。
+    :param source: 输入内容，bytes 或二进制文件对象。
+    :param input_name: 原始文件名，用于判断输入格式。
+    :param conversion_type: 转换类型，取值同 convert。
+    :param phase: 以阶段名 ('parse' 或 'write') 调用，返回包裹该阶段的上下文管理器。
+    :param retime: 可选的重新定时操作，同 convert。
+    :param normalize: 可选的时间轴规范化，同 convert，计入解析阶段。
+    :return: (转换后文件的完整内容, 转换统计信息)。
+    :raises SubtitleConverterError: 转换过程中发生的任何错误。
+    """
+    logger.info(f"Starting phased conversion: {input_name} (type: {conversion_type})")
+    stats = ConversionStats()
+    output = io.BytesIO()
+    with _conversion_errors():
+        input_format = _input_format(input_name, conversion_type)
+        with phase("parse"):
+            started = time.perf_counter()
+            data = CueList(_parse_checked(source, input_format, stats, retime=retime, normalize=normalize))
+            stats.parse_seconds = time.perf_counter() - started
+        with phase("write"):
+            started = time.perf_counter()
+            _write(data, output, conversion_type)
+            stats.write_seconds = time.perf_counter() - started
+    stats.output_bytes = output.tell()
+    logger.info(f"Phased conversion successful: {input_name}")
+    return output.getvalue(), stats
+
+
+def convert_multi(source: Union[bytes, BinaryIO], input_name: str,
+                  conversion_types: List[str], retime: Optional[Retime] = None,
+                  normalize: Optional[Normalize] = None) -> Tuple[List[bytes], ConversionStats]:
+    """
+    只解析一次输入，按多个转换类型分别输出（如同一个 .ass 文件同时导出 .xlsx 与 .srt）。
+    解析结果先保存为 CueList，各写入器依次消费同一份数据。
+    :param source: 输入内容，bytes 或二进制文件对象。
+    :param input_name: 原始文件名，用于判断输入格式。
+    :param conversion_types: 转换类型列表，各类型必须接受同一种输入格式。
+    :param retime: 可选的重新定时操作，作用于所有输出。
+    :param normalize: 可选的时间轴规范化，作用于所有输出。
+    :return: (与 conversion_types 一一对应的转换结果列表, 转换统计信息)；写入耗时与输出字节数为所有输出之和。
+    :raises SubtitleConverterError: 转换过程中发生的任何错误。
+    """
+    logger.info(f"Starting multi-target conversion: {input_name} (types: {', '.join(conversion_types)})")
+    stats = ConversionStats()
+    outputs = []
+    with _conversion_errors():
+        suffix = Path(input_name).suffix.lower()
+        for conversion_type in conversion_types:
+            if get_conversion(conversion_type).input_format(input_name) is None:
+                raise SubtitleConverterError(f"转换类型 {conversion_type} 不支持 {suffix} 文件。")
+        cues = CueList(_parse_checked(source, _input_format(input_name, conversion_types[0]), stats,
+                                      retime=retime, normalize=normalize))
+        for conversion_type in conversion_types:
+            output = io.BytesIO()
+            started = time.perf_counter()
+            _write(cues, output, conversion_type)
+            stats.write_seconds += time.perf_counter() - started
+            outputs.append(output.getvalue())
+            stats.output_bytes += len(outputs[-1])
+    logger.info(f"Multi-target conversion successful: {input_name}")
+    return outputs, stats
+
+
+def iter_convert(source: Union[bytes, BinaryIO], input_name: str, conversion_type: str,
+                 stats: Optional[ConversionStats] = None, retime: Optional[Retime] = None,
+                 progress: Optional[Callable[[int], None]] = None,
+                 normalize: Optional[Normalize] = None) -> Iterator[bytes]:
+    """
+    以生成器方式执行转换，边解析边产出输出文件的字节块，可直接用作 HTTP 流式响应的内容。
+    输入在产出第一个字节块之前就已开始解析，因此表头错误、空文件等问题会在开始输出前抛出。
+    :param source: 输入内容，bytes 或二进制文件对象（如上传流）。
+    :param input_name: 原始文件名，用于判断输入格式。
+    :param conversion_type: 转换类型，取值同 convert。
+    :param stats: 可选的统计对象，转换过程中持续更新。只在同一进程中有意义。
+    :param retime: 可选的重新定时操作。指定时需先读入全部字幕，输出不再与解析同步进行。
+    :param progress: 可选的进度回调，同 convert。
+    :param normalize: 可选的时间轴规范化。可能需要排序，因此与重新定时一样需先读入全部字幕，
+                      报告在产出第一个字节块之前写入 stats.timeline；超大文件需要保持内存占用时应使用 convert。
+    :return: 生成器，依次产出输出文件的字节块。
+    :raises SubtitleConverterError: 转换过程中发生的任何错误。
+    """
+    if stats is None:
+        stats = ConversionStats()
+    logger.info(f"Starting streaming conversion: {input_name} (type: {conversion_type})")
+    with _conversion_errors():
+        data = _parse_checked(source, _input_format(input_name, conversion_type), stats, progress, retime, normalize)
+        chunks = get_conversion(conversion_type).output.chunk_writer(data)
+        while True:
+            # 只计算产出字节块所花的时间，不包括消费方处理字节块的时间
+            started = time.perf_counter()
+            parse_seconds = stats.parse_seconds
+            chunk = next(chunks, None)
+            stats.write_seconds += time.perf_counter() - started - (stats.parse_seconds - parse_seconds)
+            if chunk is None:
+                break
+            stats.output_bytes += len(chunk)
+            yield chunk
+    logger.info(f"Streaming conversion successful: {input_name}")
+
+
+def retime_format(input_name: str) -> formats.Format:
+    """
+    单独重新定时时的输出格式：与输入格式相同；输入格式不能写出（如 .ass）时输出 .srt。
+    :param input_name: 输入文件名。
+    :return: 输出格式。
+    :raises SubtitleConverterError: 当输入格式不受支持时。
+    """
+    input_format = formats.find_format(input_name)
+    if input_format is None or input_format.reader is None:
+        raise SubtitleConverterError(f"不支持重新定时 {Path(input_name).suffix.lower() or '无扩展名的'} 文件。")
+    return input_format if input_format.writer is not None else formats.get_format('srt')
+
+
+def retime_bytes(source: Union[bytes, BinaryIO], input_name: str, retime: Retime) -> Tuple[bytes, ConversionStats]:
+    """
+    只调整时间、尽量不改变格式：解析输入，整体重新定时后按 retime_format 选择的格式写出。
+    :param source: 输入内容，bytes 或二进制文件对象。
+    :param input_name: 原始文件名，用于判断输入格式。
+    :param retime: 重新定时操作。
+    :return: (输出文件的完整内容, 转换统计信息)。
+    :raises SubtitleConverterError: 转换过程中发生的任何错误。
+    """
+    logger.info(f"Starting retime: {input_name} ({retime!r})")
+    stats = ConversionStats()
+    output = io.BytesIO()
+    with _conversion_errors():
+        output_format = retime_format(input_name)
+        data = _parse_checked(source, formats.find_format(input_name), stats, retime=retime)
+        started = time.perf_counter()
+        parse_seconds = stats.parse_seconds
+        output_format.writer(data, output)
+        stats.write_seconds = time.perf_counter() - started - (stats.parse_seconds - parse_seconds)
+    stats.output_bytes = output.tell()
+    logger.info(f"Retime successful: {input_name}")
+    return output.getvalue(), stats
@@ -0,0 +1,367 @@
+"""
+时间轴校验与规范化模块
+从 Excel 等表格转换回来的稿件常有字幕顺序错乱、相互重叠、结束时间早于开始时间、序号重复或缺失等问题，
+原样写出后播放器可能表现异常。规范化在解析与写入之间对整份字幕执行：
+
+1. 检查结束时间早于开始时间的字幕，可选地把结束时间改为开始时间加上最短时长；
+2. 未按开始时间排序时按开始时间稳定排序（先检查是否已排序，已排序时不做任何移动）；
+3. 一次遍历检查相邻字幕之间的重叠与间隔，可选地消除不超过阈值的小重叠与小间隔；
+4. 按顺序重新编号，并统计原序号中的重复与缺失。
+
+所有计算直接作用于 CueList 的整数毫秒数组：安装了 NumPy 时向量化计算，否则退回纯 Python 实现，两者的结果完全一致。
+除排序（对基本有序的输入接近线性）外，每一步都是线性时间。
+
+边解析边写入的流式转换使用 Normalize.iter_apply：只需一次遍历、内存占用基本不随字幕数增长，
+但不能排序，未按开始时间排序的输入只在报告中记录。
+"""
+
+from array import array
+
+try:
+    import numpy
+except ImportError:  # NumPy 是可选依赖
+    numpy = None
+
+# 行数少于此值时直接用纯 Python 计算，向量化带来的收益抵不过创建数组视图的开销
+NUMPY_MIN_CUES = 256
+
+
+class TimelineReport:
+    """
+    规范化报告：发现的问题与实际做出的修改。可被 pickle。
+    """
+
+    def __init__(self, max_records=100):
+        """
+        :param max_records: 最多保留的详细记录条数，超出部分只计数。
+        """
+        self.max_records = max_records
+        self.cues = 0
+        self.in_order = True
+        self.reordered = 0
+        self.invalid = 0
+        self.invalid_fixed = 0
+        self.overlaps = 0
+        self.overlaps_fixed = 0
+        self.gaps = 0
+        self.gaps_closed = 0
+        self.duplicate_indexes = 0
+        self.missing_indexes = 0
+        self.renumbered = 0
+        self.records = []
+
+    def record(self, issue, index, start, end):
+        """
+        记录一条有问题的字幕（使用原序号，便于在原文件中查找）。
+        :param issue: 问题类型，'end_before_start'、'overlap' 或 'out_of_order'（仅流式规范化）。
+        """
+        if len(self.records) < self.max_records:
+            self.records.append({'issue': issue, 'index': index, 'start_ms': start, 'end_ms': end})
+
+    @property
+    def changed(self):
+        """是否修改了任何字幕。"""
+        return bool(self.reordered or self.invalid_fixed or self.overlaps_fixed or self.gaps_closed or self.renumbered)
+
+    def summary(self):
+        """
+        :return: 不含详细记录的统计字典。
+        """
+        return {
+            'cues': self.cues,
+            'in_order': self.in_order,
+            'reordered': self.reordered,
+            'invalid': self.invalid,
+            'invalid_fixed': self.invalid_fixed,
+            'overlaps': self.overlaps,
+            'overlaps_fixed': self.overlaps_fixed,
+            'gaps': self.gaps,
+            'gaps_closed': self.gaps_closed,
+            'duplicate_indexes': self.duplicate_indexes,
+            'missing_indexes': self.missing_indexes,
+            'renumbered': self.renumbered,
+        }
+
+    def to_dict(self):
+        """
+        :return: 可序列化为 JSON 的完整报告。
+        """
+        result = self.summary()
+        result['records'] = list(self.records)
+        return result
+
+
+class Normalize:
+    """
+    一次时间轴规范化操作。可被 pickle，进程池模式下随任务一起传给工作进程。
+    重叠与间隔都按相邻两条字幕判断：后一条的开始时间早于此前所有字幕的最晚结束时间为重叠，晚于则为间隔。
+    只有当问题仅涉及前一条字幕时才会修正（把前一条的结束时间改为后一条的开始时间），
+    判断全部基于排序后的原始时间，修正结果与遍历顺序无关。
+    结束时间早于开始时间的字幕同样默认只检查：改为零时长会被播放器丢弃，因此只在指定了最短时长时修正。
+    """
+    __slots__ = ('overlap_ms', 'gap_ms', 'min_duration_ms')
+
+    def __init__(self, overlap_ms=0, gap_ms=0, min_duration_ms=0):
+        """
+        :param overlap_ms: 消除不超过该时长（毫秒）的重叠，0 表示只检查不修正。
+        :param gap_ms: 消除不超过该时长（毫秒）的间隔，0 表示只检查不修正。
+        :param min_duration_ms: 结束时间早于开始时间的字幕改为持续该时长（毫秒），0 表示只检查不修正。
+        :raises ValueError: 任一参数为负数时。
+        """
+        if overlap_ms < 0 or gap_ms < 0 or min_duration_ms < 0:
+            raise ValueError("重叠、间隔的阈值与最短时长不能为负数。")
+        self.overlap_ms = int(overlap_ms)
+        self.gap_ms = int(gap_ms)
+        self.min_duration_ms = int(min_duration_ms)
+
+    def apply(self, cues, report=None):
+        """
+        原地规范化 CueList。
+        :param cues: CueList。
+        :param report: 可选的 TimelineReport，不提供时新建。
+        :return: TimelineReport。
+        """
+        if report is None:
+            report = TimelineReport()
+        report.cues = len(cues)
+        self._fix_invalid(cues, report)
+        self._sort(cues, report)
+        if len(cues) > 1:
+            if numpy is not None and len(cues) >= NUMPY_MIN_CUES:
+                self._fix_neighbours_numpy(cues, report)
+            else:
+                self._fix_neighbours(cues, report)
+        _renumber(cues, report)
+        return report
+
+    def iter_apply(self, cues, report=None):
+        """
+        单次遍历的规范化，供边解析边写入的流式转换使用：只暂存前一条字幕（修正重叠与间隔时需要改写它的结束时间），
+        统计重复与缺失序号的位图每个序号只占 1 位，内存占用基本不随字幕数增长。
+        不排序：未按开始时间排序的字幕按原顺序输出，只在报告中记录（in_order 为 False，reordered 为 0）；
+        其余检查与修正与 apply 相同，输入已排序时两者的输出与统计完全一致。
+        :param cues: Cue 可迭代对象，产出的 Cue 会被原地修改。
+        :param report: 可选的 TimelineReport，迭代结束后才完整。
+        :return: 生成器，产出规范化后的 Cue。
+        """
+        if report is None:
+            report = TimelineReport()
+        overlap_ms, gap_ms, min_duration_ms = self.overlap_ms, self.gap_ms, self.min_duration_ms
+        seen = _IndexSet()
+        count = 0
+        previous = None
+        previous_end = None
+        earlier = None
+        for cue in cues:
+            count += 1
+            start = cue.start
+            if cue.end < start:
+                report.invalid += 1
+                report.record('end_before_start', cue.index, start, cue.end)
+                if min_duration_ms:
+                    cue.end = start + min_duration_ms
+                    report.invalid_fixed += 1
+            if previous is not None:
+                if start < previous.start:
+                    report.in_order = False
+                    report.record('out_of_order', cue.index, start, cue.end)
+                # 与 _fix_neighbours 相同，判断基于前一条字幕修正之前的结束时间
+                latest = previous_end if earlier is None or previous_end > earlier else earlier
+                if start < latest:
+                    report.overlaps += 1
+                    report.record('overlap', cue.index, start, cue.end)
+                    if latest - start <= overlap_ms and (earlier is None or earlier <= start):
+                        previous.end = start
+                        report.overlaps_fixed += 1
+                elif start > latest:
+                    report.gaps += 1
+                    if start - latest <= gap_ms and previous_end == latest:
+                        previous.end = start
+                        report.gaps_closed += 1
+                earlier = latest
+                yield previous
+            previous = cue
+            previous_end = cue.end
+            if not seen.add(cue.index):
+                report.duplicate_indexes += 1
+            if cue.index != count:
+                cue.index = count
+                report.renumbered += 1
+        if previous is not None:
+            yield previous
+        report.cues = count
+        report.missing_indexes = count - seen.count_up_to(count)
+
+    def _fix_invalid(self, cues, report):
+        starts, ends = cues.starts, cues.ends
+        if numpy is not None and len(cues) >= NUMPY_MIN_CUES:
+            start_values = numpy.frombuffer(starts, dtype=numpy.int64)
+            end_values = numpy.frombuffer(ends, dtype=numpy.int64)
+            positions = numpy.flatnonzero(end_values < start_values).tolist()
+        else:
+            positions = [i for i, (start, end) in enumerate(zip(starts, ends)) if end < start]
+        for i in positions:
+            report.record('end_before_start', cues.indexes[i], starts[i], ends[i])
+            if self.min_duration_ms:
+                ends[i] = starts[i] + self.min_duration_ms
+        report.invalid = len(positions)
+        if self.min_duration_ms:
+            report.invalid_fixed = len(positions)
+
+    @staticmethod
+    def _sort(cues, report):
+        starts = cues.starts
+        if numpy is not None and len(cues) >= NUMPY_MIN_CUES:
+            values = numpy.frombuffer(starts, dtype=numpy.int64)
+            if bool(numpy.all(values[1:] >= values[:-1])):
+                return
+            order = numpy.argsort(values, kind='stable')
+            report.reordered = int(numpy.count_nonzero(order != numpy.arange(len(order))))
+            cues.indexes = _take(cues.indexes, order)
+            cues.starts = _take(starts, order)
+            cues.ends = _take(cues.ends, order)
+            order = order.tolist()
+        else:
+            if all(a <= b for a, b in zip(starts, starts[1:])):
+                return
+            # Timsort 对大部分已排序、只有局部错乱的输入接近线性
+            order = sorted(range(len(starts)), key=starts.__getitem__)
+            report.reordered = sum(1 for i, j in enumerate(order) if i != j)
+            cues.indexes = array('q', [cues.indexes[i] for i in order])
+            cues.starts = array('q', [starts[i] for i in order])
+            cues.ends = array('q', [cues.ends[i] for i in order])
+        report.in_order = False
+        cues.texts = [cues.texts[i] for i in order]
+
+    def _fix_neighbours(self, cues, report):
+        starts, ends, indexes = cues.starts, cues.ends, cues.indexes
+        overlap_ms, gap_ms = self.overlap_ms, self.gap_ms
+        # earlier: 前一条之前所有字幕的最晚结束时间；修正只改写 ends[i - 1]，而它在本轮之前已被读取
+        earlier = None
+        previous_end = ends[0]
+        for i in range(1, len(starts)):
+            latest = previous_end if earlier is None or previous_end > earlier else earlier
+            start = starts[i]
+            end = ends[i]
+            if start < latest:
+                report.overlaps += 1
+                report.record('overlap', indexes[i], start, end)
+                if latest - start <= overlap_ms and (earlier is None or earlier <= start):
+                    ends[i - 1] = start
+                    report.overlaps_fixed += 1
+            elif start > latest:
+                report.gaps += 1
+                if start - latest <= gap_ms and previous_end == latest:
+                    ends[i - 1] = start
+                    report.gaps_closed += 1
+            earlier = latest
+            previous_end = end
+
+    def _fix_neighbours_numpy(self, cues, report):
+        starts = numpy.frombuffer(cues.starts, dtype=numpy.int64)
+        ends = numpy.frombuffer(cues.ends, dtype=numpy.int64)
+        previous_ends = ends[:-1].copy()
+        next_starts = starts[1:]
+        # latest[k]: 第 k+1 条之前所有字幕的最晚结束时间；earlier[k]: 第 k 条之前的最晚结束时间（第一对没有）
+        latest = numpy.maximum.accumulate(previous_ends)
+        earlier = numpy.empty_like(latest)
+        earlier[0] = numpy.iinfo(numpy.int64).min
+        earlier[1:] = latest[:-1]
+
+        overlapping = next_starts < latest
+        gapped = next_starts > latest
+        fix_overlap = overlapping & (latest - next_starts <= self.overlap_ms) & (earlier <= next_starts)
+        close_gap = gapped & (next_starts - latest <= self.gap_ms) & (previous_ends == latest)
+
+        report.overlaps = int(numpy.count_nonzero(overlapping))
+        report.gaps = int(numpy.count_nonzero(gapped))
+        report.overlaps_fixed = int(numpy.count_nonzero(fix_overlap))
+        report.gaps_closed = int(numpy.count_nonzero(close_gap))
+        # 记录与纯 Python 实现相同：按顺序记录前 max_records 个重叠
+        for k in numpy.flatnonzero(overlapping)[:max(0, report.max_records - len(report.records))].tolist():
+            report.record('overlap', cues.indexes[k + 1], cues.starts[k + 1], cues.ends[k + 1])
+        fixed = fix_overlap | close_gap
+        ends[:-1][fixed] = next_starts[fixed]
+
+    def __eq__(self, other):
+        if not isinstance(other, Normalize):
+            return NotImplemented
+        return ((self.overlap_ms, self.gap_ms, self.min_duration_ms)
+                == (other.overlap_ms, other.gap_ms, other.min_duration_ms))
+
+    def __repr__(self):
+        # 也用作结果缓存键的一部分，因此必须稳定
+        return f"Normalize(overlap_ms={self.overlap_ms}, gap_ms={self.gap_ms}, min_duration_ms={self.min_duration_ms})"
+
+
+def _take(column, order):
+    """
+    :param column: array('q') 列。
+    :param order: NumPy 下标数组。
+    :return: 按 order 重排后的新 array('q')。
+    """
+    result = array('q')
+    result.frombytes(numpy.frombuffer(column, dtype=numpy.int64)[order].tobytes())
+    return result
+
+
+class _IndexSet:
+    """
+    记录出现过的序号：1..MAX_BITMAP_INDEX 之间的序号保存在位图中，其余（罕见的）保存在集合中。
+    """
+    MAX_BITMAP_INDEX = 1 << 24
+
+    __slots__ = ('_bits', '_others')
+
+    def __init__(self):
+        self._bits = bytearray()
+        self._others = set()
+
+    def add(self, index):
+        """
+        :return: 序号此前是否未出现过。
+        """
+        if not 1 <= index <= self.MAX_BITMAP_INDEX:
+            if index in self._others:
+                return False
+            self._others.add(index)
+            return True
+        byte, bit = divmod(index - 1, 8)
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(max(byte + 1 - len(self._bits), len(self._bits))))
+        mask = 1 << bit
+        if self._bits[byte] & mask:
+            return False
+        self._bits[byte] |= mask
+        return True
+
+    def count_up_to(self, limit):
+        """
+        :return: 出现过的、位于 1..limit 之间的不同序号数。
+        """
+        full, rest = divmod(min(limit, self.MAX_BITMAP_INDEX), 8)
+        bits = self._bits[:full]
+        total = int.from_bytes(bits, 'little').bit_count()
+        if rest and full < len(self._bits):
+            total += (self._bits[full] & ((1 << rest) - 1)).bit_count()
+        return total + sum(1 for index in self._others if 1 <= index <= limit)
+
+
+def _renumber(cues, report):
+    """
+    按顺序重新编号为 1..n，并统计原序号中的重复与缺失。
+    """
+    count = len(cues)
+    expected = array('q', range(1, count + 1))
+    if cues.indexes == expected:
+        return
+    distinct = set(cues.indexes)
+    report.duplicate_indexes = count - len(distinct)
+    report.missing_indexes = count - sum(1 for index in distinct if 1 <= index <= count)
+    if numpy is not None and count >= NUMPY_MIN_CUES:
+        report.renumbered = int(numpy.count_nonzero(
+            numpy.frombuffer(cues.indexes, dtype=numpy.int64) != numpy.frombuffer(expected, dtype=numpy.int64)
+        ))
+    else:
+        report.renumbered = sum(1 for a, b in zip(cues.indexes, expected) if a != b)
+    cues.indexes = expected
@@ -0,0 +1,164 @@
+"""
+转换工作池模块
+将同步、CPU 密集的转换任务交给线程池或进程池执行，避免阻塞 FastAPI 的事件循环，
+并通过信号量限制同时执行的任务数量。
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_executor: Executor = None
+_semaphore: asyncio.Semaphore = None
+
+
+def get_executor():
+    """
+    获取（必要时创建）全局工作池。
+    :return: 根据 config.WORKER_MODE 创建的线程池或进程池。
+    """
+    global _executor
+    if _executor is None:
+        workers = max(1, config.WORKER_COUNT)
+        if config.WORKER_MODE == 'process':
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scriptgrid-worker")
+        logger.info(f"Conversion worker pool started: mode={config.WORKER_MODE}, workers={workers}")
+    return _executor
+
+
+def _get_semaphore():
+    """
+    获取限制并发转换数量的信号量。
+    信号量需在事件循环中创建，因此延迟到第一次使用时初始化。
+    """
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(max(1, config.MAX_CONCURRENT_CONVERSIONS))
+    return _semaphore
+
+
+def slot():
+    """
+    :return: 异步上下文管理器，进入时等待并占用一个转换名额。
+             需要在占用名额后、执行转换前做其他处理（如更新任务状态）时，与 run_in_slot 配合使用。
+    """
+    return _get_semaphore()
+
+
+async def run_in_slot(func, *args, **kwargs):
+    """
+    在工作池中执行一个同步函数，不再占用转换名额。调用方必须已经通过 slot() 占用了名额。
+    :param func: 要执行的同步函数。
+    :return: func 的返回值。
+    :raises Exception: func 抛出的任何异常都会原样传递给调用方。
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def run(func, *args, **kwargs):
+    """
+    在工作池中执行一个同步函数，并等待其结果。
+    进程池模式下，func 及其参数必须可以被 pickle。
+    :param func: 要执行的同步函数。
+    :return: func 的返回值。
+    :raises Exception: func 抛出的任何异常都会原样传递给调用方。
+    """
+    async with slot():
+        return await run_in_slot(func, *args, **kwargs)
+
+
+class _Failure:
+    """生产者线程中抛出的异常，经队列传递给消费者。"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+_DONE = object()
+
+
+def _collect(gen_func, args, kwargs):
+    """在进程池中完整执行生成器，返回所有产出项的列表。"""
+    return list(gen_func(*args, **kwargs))
+
+
+async def stream(gen_func, *args, queue_size=8, **kwargs):
+    """
+    在工作池中驱动一个同步生成器，并以异步生成器的方式逐项产出其结果，
+    适用于把流式转换的输出直接写入 HTTP 响应。
+    线程池模式下生成器在工作线程中执行，通过有界队列向事件循环传递数据，消费方变慢时生产方会等待；
+    进程池模式下生成器无法跨进程逐项传递，退化为在工作进程中完整执行后一次性返回。
+    :param gen_func: 返回同步生成器的函数。
+    :param queue_size: 线程与事件循环之间缓冲的最大项数。
+    :return: 异步生成器。
+    :raises Exception: 生成器抛出的任何异常都会在消费方原样抛出。
+    """
+    loop = asyncio.get_running_loop()
+    async with _get_semaphore():
+        if config.WORKER_MODE == 'process':
+            items = await loop.run_in_executor(get_executor(), _collect, gen_func, args, kwargs)
+            for item in items:
+                yield item
+            return
+
+        queue = asyncio.Queue(maxsize=queue_size)
+        cancelled = threading.Event()
+
+        def put(item):
+            # 在工作线程中阻塞等待队列有空位；消费方已放弃时返回 False
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while True:
+                try:
+                    future.result(timeout=0.5)
+                    return True
+                except FutureTimeoutError:
+                    if cancelled.is_set():
+                        future.cancel()
+                        return False
+
+        def produce():
+            generator = gen_func(*args, **kwargs)
+            try:
+                for item in generator:
+                    if not put(item):
+                        return
+                put(_DONE)
+            except BaseException as e:
+                put(_Failure(e))
+            finally:
+                generator.close()
+
+        producer = loop.run_in_executor(get_executor(), produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            cancelled.set()
+            await producer
+
+
+def shutdown():
+    """
+    关闭工作池，等待正在执行的任务结束。应用关闭时调用。
+    """
+    global _executor, _semaphore
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        logger.info("Conversion worker pool shut down.")
+    _executor = None
+    _semaphore = None
@@ -1,20 +1,90 @@
 """
 文件写入和读取模块
-负责将内部数据结构写入 .xlsx 或 .srt 文件，以及从 .xlsx 文件读取数据。
+负责将内部数据结构写入 .xlsx、.csv/.tsv、.srt 或 .vtt 文件，以及从 .xlsx、.csv/.tsv 表格文件读取数据。
 """
 
+import csv
+import io
+import logging
 import os
-from openpyxl import Workbook, load_workbook
+from contextlib import contextmanager
+from cues import Cue, CueList, format_srt_time, format_vtt_time, to_milliseconds
 from exceptions import WriteError, ParseError
+from parsers import ParseDiagnostics, describe_source, open_text
+import config
 import constants
+import xlsx_stream
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def open_text_output(output, encoding='utf-8', newline=None):
+    """
+    以文本方式打开输出目标，统一处理文件路径和二进制文件对象。
+    对于调用方传入的文件对象，退出时只刷新缓冲、不关闭它。
+    :param output: 输出文件路径或二进制文件对象（如 BytesIO）。
+    :param encoding: 文本编码。
+    :param newline: 换行符处理方式，同内置 open；写入 CSV 时应传入 ''。
+    :return: 一个文本文件对象。
+    """
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, 'w', encoding=encoding, newline=newline) as f:
+            yield f
+        return
+
+    text_stream = io.TextIOWrapper(output, encoding=encoding, newline=newline)
+    try:
+        yield text_stream
+    finally:
+        text_stream.flush()
+        text_stream.detach()
+
 
 def write_to_excel(data, output_path):
     """
     将提取的数据写入一个 .xlsx 文件。
-    :param data: 包含所有字幕信息的二维列表。
-    :param output_path: 输出的 .xlsx 文件的完整路径。
+    默认使用流式写入器逐行生成工作表 XML；设置 SCRIPTGRID_XLSX_WRITER=openpyxl 时改用 openpyxl。
+    :param data: 包含所有字幕的 CueList，或逐行产出 Cue 的可迭代对象。
+    :param output_path: 输出的 .xlsx 文件的完整路径，或可写的二进制文件对象。
     :raises WriteError: 当写入过程出错时。
     """
+    if config.XLSX_WRITER == 'openpyxl':
+        write_to_excel_openpyxl(data, output_path)
+        return
+    try:
+        xlsx_stream.write_xlsx(data, output_path)
+    except ParseError:
+        # 惰性解析的数据在写入过程中才被解析，解析错误原样抛出
+        raise
+    except Exception as e:
+        raise WriteError(f"写入 Excel 文件 '{describe_source(output_path)}' 时出错: {e}") from e
+
+
+def iter_excel_chunks(data):
+    """
+    以生成器方式产出 .xlsx 文件的字节块，用于流式响应。
+    :param data: 包含所有字幕的 CueList，或逐行产出 Cue 的可迭代对象。
+    :return: 生成器，依次产出 .xlsx 文件的字节块。
+    :raises WriteError: 当写入过程出错时。
+    """
+    try:
+        yield from xlsx_stream.iter_xlsx_chunks(data)
+    except ParseError:
+        raise
+    except Exception as e:
+        raise WriteError(f"生成 Excel 文件时出错: {e}") from e
+
+
+def write_to_excel_openpyxl(data, output_path):
+    """
+    使用 openpyxl 构建完整工作簿并写入 .xlsx 文件。速度较慢，作为备用实现保留。
+    :param data: 包含所有字幕的 CueList，或逐行产出 Cue 的可迭代对象。
+    :param output_path: 输出的 .xlsx 文件的完整路径，或可写的二进制文件对象。
+    :raises WriteError: 当写入过程出错时。
+    """
+    # openpyxl 导入较慢，只在使用备用实现时才导入
+    from openpyxl import Workbook
     try:
         wb = Workbook() # 创建一个新的Excel工作簿
         ws = wb.active  # 获取当前活动的工作表
@@ -23,72 +93,338 @@ def write_to_excel(data, output_path):
         # 写入表头
         ws.append(constants.EXCEL_HEADERS) # append 方法可以直接写入一行
 
-        # 遍历数据，将每一行字幕写入Excel工作表
-        for row_data in data:
-            ws.append(row_data)
+        # 遍历数据，将每一行字幕写入Excel工作表，时间在这里才格式化为SRT时间码
+        for cue in data:
+            ws.append(cue.to_row())
 
         # 保存工作簿到指定的路径，如果文件已存在则会覆盖
         wb.save(output_path)
+    except ParseError:
+        # 惰性解析的数据在写入过程中才被解析，解析错误原样抛出
+        raise
     except Exception as e:
-        raise WriteError(f"写入 Excel 文件 '{output_path}' 时出错: {e}") from e
+        raise WriteError(f"写入 Excel 文件 '{describe_source(output_path)}' 时出错: {e}") from e
+
+
+def _srt_block(cue):
+    """
+    :return: 一个 SRT 字幕块的文本。SRT格式要求：序号、时间码、文本、空行。
+    """
+    return f"{cue.index}\n{format_srt_time(cue.start)} --> {format_srt_time(cue.end)}\n{cue.text}\n\n"
+
+
+def _iter_text_chunks(blocks, chunk_size, encoding='utf-8'):
+    """
+    把逐个产出的文本块合并为大小适中的字节块。
+    :param blocks: 文本块的可迭代对象。
+    :param chunk_size: 每个字节块的大致字符数。
+    :param encoding: 文本编码。
+    :return: 生成器，依次产出编码后的字节块。
+    """
+    pending = []
+    size = 0
+    for block in blocks:
+        pending.append(block)
+        size += len(block)
+        if size >= chunk_size:
+            yield ''.join(pending).encode(encoding)
+            pending.clear()
+            size = 0
+    if pending:
+        yield ''.join(pending).encode(encoding)
+
+
+def iter_srt_chunks(data, chunk_size=64 * 1024):
+    """
+    以生成器方式产出 .srt 文件的 UTF-8 字节块，用于流式响应。
+    :param data: 包含所有字幕的 CueList，或逐行产出 Cue 的可迭代对象。
+    :param chunk_size: 每个字节块的大致字符数。
+    :return: 生成器，依次产出 .srt 文件的字节块。
+    """
+    return _iter_text_chunks(map(_srt_block, data), chunk_size)
 
 
 def write_to_srt(data, output_path):
     """
     将提取的数据写入一个 .srt 文件。
-    :param data: 包含所有字幕信息的二维列表。格式: [序号, 开始时间, 结束时间, 字幕内容]
-    :param output_path: 输出的 .srt 文件的完整路径。
+    :param data: 包含所有字幕的 CueList，或逐行产出 Cue 的可迭代对象。
+    :param output_path: 输出的 .srt 文件的完整路径，或可写的二进制文件对象。
+    :raises WriteError: 当写入过程出错时。
+    """
+    try:
+        with open_text_output(output_path) as f:
+            for cue in data:
+                f.write(_srt_block(cue))
+    except ParseError:
+        # 惰性解析的数据在写入过程中才被解析，解析错误原样抛出
+        raise
+    except Exception as e:
+        raise WriteError(f"写入 SRT 文件 '{describe_source(output_path)}' 时出错: {e}") from e
+
+
+def _vtt_text(text):
+    """
+    转义 WebVTT 字幕文本中的 &、<、>，并去除文本内的空行（空行在 WebVTT 中表示字幕块结束）。
+    """
+    if '&' in text or '<' in text or '>' in text:
+        text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    if '\n' in text:
+        text = '\n'.join(line for line in text.splitlines() if line.strip())
+    return text
+
+
+def _vtt_blocks(data):
+    """
+    :return: 生成器，依次产出 WebVTT 文件头与每个字幕块的文本。
+    """
+    yield "WEBVTT\n\n"
+    for cue in data:
+        yield f"{cue.index}\n{format_vtt_time(cue.start)} --> {format_vtt_time(cue.end)}\n{_vtt_text(cue.text)}\n\n"
+
+
+def iter_vtt_chunks(data, chunk_size=64 * 1024):
+    """
+    以生成器方式产出 .vtt 文件的 UTF-8 字节块，用于流式响应。
+    :param data: 包含所有字幕的 CueList，或逐行产出 Cue 的可迭代对象。
+    :param chunk_size: 每个字节块的大致字符数。
+    :return: 生成器，依次产出 .vtt 文件的字节块。
+    """
+    return _iter_text_chunks(_vtt_blocks(data), chunk_size)
+
+
+def write_to_vtt(data, output_path):
+    """
+    将提取的数据写入一个 .vtt (WebVTT) 文件。
+    :param data: 包含所有字幕的 CueList，或逐行产出 Cue 的可迭代对象。
+    :param output_path: 输出的 .vtt 文件的完整路径，或可写的二进制文件对象。
+    :raises WriteError: 当写入过程出错时。
+    """
+    try:
+        with open_text_output(output_path) as f:
+            for block in _vtt_blocks(data):
+                f.write(block)
+    except ParseError:
+        # 惰性解析的数据在写入过程中才被解析，解析错误原样抛出
+        raise
+    except Exception as e:
+        raise WriteError(f"写入 WebVTT 文件 '{describe_source(output_path)}' 时出错: {e}") from e
+
+
+# CSV/TSV 使用带 BOM 的 UTF-8，Excel 直接打开时中文不会乱码
+CSV_ENCODING = 'utf-8-sig'
+
+# 文件扩展名对应的分隔符
+CSV_DELIMITERS = {
+    '.csv': ',',
+    '.tsv': '\t',
+}
+
+
+def _csv_blocks(data, delimiter, chunk_size):
+    """
+    逐行格式化表格文本，每累计约 chunk_size 个字符产出一次。列与 .xlsx 表格相同（constants.EXCEL_HEADERS）。
+    :return: 生成器，依次产出表格文本块。
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator='\r\n')
+    writer.writerow(constants.EXCEL_HEADERS)
+    for cue in data:
+        writer.writerow(cue.to_row())
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_csv_chunks(data, delimiter=',', chunk_size=64 * 1024):
+    """
+    以生成器方式产出 .csv/.tsv 文件的字节块，用于流式响应。
+    :param data: 包含所有字幕的 CueList，或逐行产出 Cue 的可迭代对象。
+    :param delimiter: 分隔符，',' 或制表符。
+    :param chunk_size: 每个字节块的大致字符数。
+    :return: 生成器，依次产出文件的字节块。
     :raises WriteError: 当写入过程出错时。
     """
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            for i, entry in enumerate(data):
-                index, start_time, end_time, text = entry
-                # SRT格式要求：序号、时间码、文本、空行
-                f.write(f"{index}\n")
-                f.write(f"{start_time} --> {end_time}\n")
-                f.write(f"{text}\n")
-                f.write("\n") # 块之间的空行
+        yield '\ufeff'.encode('utf-8')
+        for block in _csv_blocks(data, delimiter, chunk_size):
+            yield block.encode('utf-8')
+    except ParseError:
+        raise
     except Exception as e:
-        raise WriteError(f"写入 SRT 文件 '{output_path}' 时出错: {e}") from e
+        raise WriteError(f"生成表格文件时出错: {e}") from e
+
+
+def write_to_csv(data, output_path, delimiter=','):
+    """
+    将提取的数据写入一个 .csv 或 .tsv 文件。
+    :param data: 包含所有字幕的 CueList，或逐行产出 Cue 的可迭代对象。
+    :param output_path: 输出文件的完整路径，或可写的二进制文件对象。
+    :param delimiter: 分隔符，',' 或制表符。
+    :raises WriteError: 当写入过程出错时。
+    """
+    try:
+        with open_text_output(output_path, encoding=CSV_ENCODING, newline='') as f:
+            for block in _csv_blocks(data, delimiter, 64 * 1024):
+                f.write(block)
+    except ParseError:
+        # 惰性解析的数据在写入过程中才被解析，解析错误原样抛出
+        raise
+    except Exception as e:
+        raise WriteError(f"写入表格文件 '{describe_source(output_path)}' 时出错: {e}") from e
+
+
+def _to_index(value, fallback):
+    """
+    将表格中的序号单元格转换为整数，无法识别时使用行的顺序编号。
+    :param value: 单元格的值（可能是整数、浮点数或字符串）。
+    :param fallback: 备用序号。
+    :return: 整数序号。
+    """
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().isdecimal():
+        return int(value.strip())
+    return fallback
+
+
+def _rows_to_cues(rows, diagnostics):
+    """
+    检查表头并把表格行转换为字幕。
+    :param rows: (行号, 单元格值序列) 的可迭代对象，第一项为表头行。
+    :param diagnostics: ParseDiagnostics，用于收集被跳过的行。
+    :return: 包含所有字幕的 CueList。
+    :raises ParseError: 当表头不正确时。
+    """
+    return CueList(_iter_rows_to_cues(rows, diagnostics))
+
+
+def _iter_rows_to_cues(rows, diagnostics):
+    """
+    同 _rows_to_cues，但逐行产出字幕；表头在取出第一行字幕时检查。
+    :return: 生成器，每次产出一个 Cue。
+    :raises ParseError: 当表头不正确时。
+    """
+    rows = iter(rows)
+
+    # 检查表头（忽略末尾的空单元格）
+    first_row = next(rows, None)
+    header_row = list(first_row[1]) if first_row is not None else []
+    while header_row and header_row[-1] is None:
+        header_row.pop()
+    expected_header = constants.EXCEL_HEADERS
+    if header_row != expected_header:
+        raise ParseError(constants.MSG_WARNING_INCORRECT_HEADER.format(expected=expected_header, actual=header_row))
+
+    count = 0
+    # 从第二行开始迭代数据行
+    for row_number, row in rows:
+        # 检查行是否为空或不完整
+        if not any(cell is not None for cell in row):
+            continue # 跳过空行
+        if len(row) < 4 or row[0] is None or row[1] is None or row[2] is None:
+            diagnostics.skip(row_number, "数据行不完整", repr(row))
+            continue # 跳过不完整的行
+
+        index, start_time, end_time, text = row[0], row[1], row[2], row[3]
+        try:
+            # 时间单元格可能是时间码字符串，也可能是 Excel 以数字或时间类型保存的值
+            start = to_milliseconds(start_time)
+            end = to_milliseconds(end_time)
+        except ValueError as e:
+            diagnostics.skip(row_number, f"时间格式错误: {e}", repr(row))
+            continue
+        count += 1
+        yield Cue(_to_index(index, count), start, end, str(text) if text is not None else "")
+
+
+def _parse_xlsx_openpyxl(source, diagnostics):
+    """
+    使用 openpyxl 解析 .xlsx 字幕表格文件，作为直接读取工作表 XML 失败时的备用实现。
+    """
+    from openpyxl import load_workbook
+    # 加载工作簿和活动工作表
+    wb = load_workbook(filename=source, read_only=True)
+    try:
+        ws = wb.active
+        return _rows_to_cues(enumerate(ws.iter_rows(values_only=True), start=1), diagnostics)
+    finally:
+        wb.close()
 
 
-def parse_xlsx(file_path):
+def parse_xlsx(source, diagnostics=None):
     """
     解析 .xlsx 字幕表格文件。
-    :param file_path: .xlsx 文件的路径。
-    :return: 一个二维列表，每个子列表代表一行字幕：[序号, 开始时间, 结束时间, 字幕内容]。
+    优先直接流式读取工作表 XML 与共享字符串表；遇到结构特殊的工作簿时回退到 openpyxl。
+    :param source: .xlsx 文件的路径、bytes 或二进制文件对象。
+    :param diagnostics: 可选的 ParseDiagnostics，用于收集被跳过的行。
+    :return: 包含所有字幕的 CueList。
     :raises ParseError: 当解析过程出错时（例如表头不正确）。
     """
+    if diagnostics is None:
+        diagnostics = ParseDiagnostics()
     try:
-        # 加载工作簿和活动工作表
-        wb = load_workbook(filename=file_path, read_only=True)
-        ws = wb.active
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
 
-        # 检查表头
-        header_row = [cell.value for cell in next(ws.iter_rows())]
-        expected_header = constants.EXCEL_HEADERS
-        if header_row != expected_header:
-            raise ParseError(constants.MSG_WARNING_INCORRECT_HEADER.format(expected=expected_header, actual=header_row))
-
-        data = []
-        # 从第二行开始迭代数据行
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            # 检查行是否为空或不完整
-            if not any(cell is not None for cell in row):
-                continue # 跳过空行
-            if len(row) < 4:
-                print(f"警告: 发现不完整的数据行: {row}")
-                continue # 跳过不完整的行
-
-            index, start_time, end_time, text = row[0], row[1], row[2], row[3]
-            # 确保所有字段都转换为字符串，处理可能的数字类型
-            data.append([str(index), str(start_time), str(end_time), str(text) if text else ""])
+        fast_diagnostics = ParseDiagnostics(diagnostics.max_records)
+        try:
+            data = _rows_to_cues(xlsx_stream.iter_xlsx_rows(source), fast_diagnostics)
+        except ParseError:
+            raise
+        except Exception as e:
+            logger.info(f"Direct sheet reader failed ({e}), falling back to openpyxl.")
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            data = _parse_xlsx_openpyxl(source, diagnostics)
+        else:
+            diagnostics.skipped_count += fast_diagnostics.skipped_count
+            diagnostics.records.extend(fast_diagnostics.records)
 
+        if diagnostics.skipped_count:
+            logger.warning(f"Skipped {diagnostics.skipped_count} malformed row(s) in Excel file '{describe_source(source)}'.")
         return data
 
     except ParseError:
         # 重新抛出我们自定义的 ParseError
         raise
     except Exception as e:
-        raise ParseError(f"解析 Excel 文件 '{file_path}' 时出错: {e}") from e
\ No newline at end of file
+        raise ParseError(f"解析 Excel 文件 '{describe_source(source)}' 时出错: {e}") from e
+
+
+def iter_csv(source, delimiter=',', diagnostics=None):
+    """
+    以流式方式解析 .csv/.tsv 字幕表格文件，表头须与 .xlsx 表格相同（constants.EXCEL_HEADERS）。
+    :param source: 文件的路径、bytes 或二进制文件对象（如上传流）。
+    :param delimiter: 分隔符，',' 或制表符。
+    :param diagnostics: 可选的 ParseDiagnostics，用于收集被跳过的行。
+    :return: 生成器，每次产出一个 Cue。
+    :raises ParseError: 当解析过程出错时（例如表头不正确）。
+    """
+    if diagnostics is None:
+        diagnostics = ParseDiagnostics()
+    try:
+        with open_text(source, newline='') as f:
+            reader = csv.reader(f, delimiter=delimiter)
+            # 空单元格按 None 处理，与 .xlsx 中的空单元格一致
+            rows = ((reader.line_num, [cell if cell != '' else None for cell in row]) for row in reader)
+            yield from _iter_rows_to_cues(rows, diagnostics)
+    except ParseError:
+        raise
+    except Exception as e:
+        raise ParseError(f"解析表格文件 '{describe_source(source)}' 时出错: {e}") from e
+    finally:
+        if diagnostics.skipped_count:
+            logger.warning(f"Skipped {diagnostics.skipped_count} malformed row(s) in table file '{describe_source(source)}'.")
+
+
+def parse_csv(source, delimiter=',', diagnostics=None):
+    """
+    解析 .csv/.tsv 字幕表格文件。
+    :return: 包含所有字幕的 CueList。
+    :raises ParseError: 当解析过程出错时（例如表头不正确）。
+    """
+    return CueList(iter_csv(source, delimiter, diagnostics))
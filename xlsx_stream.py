@@ -0,0 +1,395 @@
+"""
+流式 XLSX 读写模块
+针对固定四列（constants.EXCEL_HEADERS）的字幕表格，直接逐行生成工作表 XML 并写入 zip 容器，
+读取时则用增量 XML 解析器逐行读取工作表和共享字符串表，
+均不构建 openpyxl 的对象模型，耗时与行数成线性关系。
+"""
+
+import io
+import posixpath
+import re
+import zipfile
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from cues import format_srt_time
+import constants
+
+# 每积累这么多字节的压缩数据就向调用方产出一次
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# XML 1.0 不允许出现的控制字符（制表符、换行、回车除外），写入前需要剔除
+_ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+_STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_SHEET_HEAD_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+
+_SHEET_TAIL_XML = '</sheetData></worksheet>'
+
+
+class StreamBuffer(io.RawIOBase):
+    """
+    只写、不可 seek 的内存缓冲区。
+    zipfile 向它写入压缩数据，调用方通过 drain() 取走已写入的字节，从而边生成边输出。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self.size += len(b)
+        return len(b)
+
+    def drain(self):
+        """
+        :return: 自上次调用以来写入的全部字节。
+        """
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+def _inline_string_cell(ref, text):
+    """
+    生成一个内联字符串单元格的 XML。
+    :param ref: 单元格坐标，如 "B2"。
+    :param text: 单元格文本。
+    """
+    text = _ILLEGAL_XML_CHARS.sub('', text)
+    if text[:1].isspace() or text[-1:].isspace():
+        return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+    return f'<c r="{ref}" t="inlineStr"><is><t>{escape(text)}</t></is></c>'
+
+
+def _header_row_xml():
+    """
+    :return: 表头行（第 1 行）的 XML。
+    """
+    columns = 'ABCD'
+    cells = ''.join(_inline_string_cell(f"{columns[i]}1", header) for i, header in enumerate(constants.EXCEL_HEADERS))
+    return f'<row r="1">{cells}</row>'
+
+
+def _row_xml(row_number, cue):
+    """
+    :return: 一行字幕的 XML：序号为数字单元格，时间码与字幕内容为内联字符串单元格。
+    """
+    return (
+        f'<row r="{row_number}">'
+        f'<c r="A{row_number}"><v>{cue.index}</v></c>'
+        f'<c r="B{row_number}" t="inlineStr"><is><t>{format_srt_time(cue.start)}</t></is></c>'
+        f'<c r="C{row_number}" t="inlineStr"><is><t>{format_srt_time(cue.end)}</t></is></c>'
+        f'{_inline_string_cell(f"D{row_number}", cue.text)}'
+        f'</row>'
+    )
+
+
+def _write_workbook(zf, cues, batch_rows=512):
+    """
+    将整个工作簿写入已打开的 ZipFile。
+    这是一个生成器：每写完一批行就暂停一次，让调用方有机会取走已压缩的数据。
+    :param zf: 以写模式打开的 ZipFile。
+    :param cues: Cue 的可迭代对象。
+    :param batch_rows: 每批拼接的行数，减少对压缩流的小块写入。
+    """
+    zf.writestr('[Content_Types].xml', _CONTENT_TYPES_XML)
+    zf.writestr('_rels/.rels', _ROOT_RELS_XML)
+    zf.writestr('xl/workbook.xml', _WORKBOOK_XML.format(sheet_name=escape(constants.EXCEL_SHEET_NAME, {'"': '&quot;'})))
+    zf.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS_XML)
+    zf.writestr('xl/styles.xml', _STYLES_XML)
+
+    # 工作表可能很大，强制使用 zip64 以免超出 4GB 限制时出错
+    with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+        sheet.write((_SHEET_HEAD_XML + _header_row_xml()).encode('utf-8'))
+        batch = []
+        row_number = 1
+        for cue in cues:
+            row_number += 1
+            batch.append(_row_xml(row_number, cue))
+            if len(batch) >= batch_rows:
+                sheet.write(''.join(batch).encode('utf-8'))
+                batch.clear()
+                yield
+        batch.append(_SHEET_TAIL_XML)
+        sheet.write(''.join(batch).encode('utf-8'))
+
+
+def write_xlsx(cues, output):
+    """
+    将字幕写入 .xlsx 文件。
+    :param cues: Cue 的可迭代对象，逐行消费，不会整体载入内存。
+    :param output: 输出文件路径或可写的二进制文件对象。
+    """
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for _ in _write_workbook(zf, cues):
+            pass
+
+
+def iter_xlsx_chunks(cues, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    以生成器方式产出 .xlsx 文件的字节块，可以直接作为 HTTP 流式响应的内容。
+    :param cues: Cue 的可迭代对象，逐行消费，不会整体载入内存。
+    :param chunk_size: 每个字节块的大致大小。
+    :return: 生成器，依次产出 .xlsx 文件的字节块。
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for _ in _write_workbook(zf, cues):
+            if buffer.size >= chunk_size:
+                yield buffer.drain()
+    # 关闭 ZipFile 时写入的中央目录等剩余数据
+    tail = buffer.drain()
+    if tail:
+        yield tail
+
+
+# --- 读取 ---
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_SHARED_STRINGS_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings'
+
+# 读取的列数：序号、开始时间、结束时间、字幕内容
+_COLUMN_COUNT = len(constants.EXCEL_HEADERS)
+
+_ROW_TAG = f'{_MAIN_NS}row'
+# 工作表根元素与 <sheetData> 的开始标签，元素名可能带有命名空间前缀（如 <x:sheetData>）
+_WORKSHEET_START = re.compile(rb'<(?:[\w.-]+:)?worksheet\b[^>]*>')
+_SHEET_DATA_START = re.compile(rb'<(([\w.-]+:)?)sheetData\b[^>]*?(/?)>')
+
+
+def _column_index(ref):
+    """
+    将单元格坐标转换为从 0 开始的列号，例如 "A2" -> 0, "AB10" -> 27。
+    """
+    index = 0
+    for char in ref:
+        if 'A' <= char <= 'Z':
+            index = index * 26 + (ord(char) - 64)
+        else:
+            break
+    return index - 1
+
+
+def _resolve_part(target):
+    """
+    将 workbook.xml.rels 中的相对路径解析为 zip 中的成员名。
+    """
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join('xl', target))
+
+
+def _locate_parts(zf):
+    """
+    找到活动工作表与共享字符串表在 zip 中的位置。
+    :return: (工作表成员名, 共享字符串表成员名或 None)。
+    """
+    relationships = {}
+    shared_strings = None
+    with zf.open('xl/_rels/workbook.xml.rels') as f:
+        for rel in ElementTree.parse(f).getroot().iter(f'{_PKG_REL_NS}Relationship'):
+            relationships[rel.get('Id')] = rel.get('Target')
+            if rel.get('Type') == _SHARED_STRINGS_REL_TYPE:
+                shared_strings = _resolve_part(rel.get('Target'))
+
+    with zf.open('xl/workbook.xml') as f:
+        workbook = ElementTree.parse(f).getroot()
+    # 与 openpyxl 的 wb.active 保持一致：优先使用 workbookView 中记录的活动工作表
+    view = workbook.find(f'{_MAIN_NS}bookViews/{_MAIN_NS}workbookView')
+    active_tab = int(view.get('activeTab', 0)) if view is not None else 0
+    sheets = workbook.findall(f'{_MAIN_NS}sheets/{_MAIN_NS}sheet')
+    sheet = sheets[active_tab] if active_tab < len(sheets) else sheets[0]
+    sheet_part = _resolve_part(relationships[sheet.get(f'{_REL_NS}id')])
+    return sheet_part, shared_strings
+
+
+def _string_item_text(item):
+    """
+    读取字符串项（共享字符串表中的 <si> 或内联字符串 <is>）的文本。
+    富文本的多个片段会拼接为一个字符串，注音（rPh）被忽略。
+    """
+    t = item.find(f'{_MAIN_NS}t')
+    if t is not None:
+        return t.text or ''
+    return ''.join(run_text.text or '' for run_text in item.iterfind(f'{_MAIN_NS}r/{_MAIN_NS}t'))
+
+
+def _read_shared_strings(zf, part):
+    """
+    增量读取共享字符串表。
+    :return: 字符串列表，下标即单元格中引用的序号。
+    """
+    strings = []
+    if part is None:
+        return strings
+    try:
+        f = zf.open(part)
+    except KeyError:
+        return strings
+    with f:
+        for _, elem in ElementTree.iterparse(f, events=('end',)):
+            if elem.tag == f'{_MAIN_NS}si':
+                strings.append(_string_item_text(elem))
+                elem.clear()
+    return strings
+
+
+def _cell_value(cell, shared_strings):
+    """
+    读取单元格的值。数字保留为 int/float，字符串（共享、内联或公式结果）保留为 str。
+    """
+    cell_type = cell.get('t', 'n')
+    if cell_type == 'inlineStr':
+        inline = cell.find(f'{_MAIN_NS}is')
+        return _string_item_text(inline) if inline is not None else None
+    v = cell.find(f'{_MAIN_NS}v')
+    if v is None or v.text is None:
+        return None
+    if cell_type == 's':
+        return shared_strings[int(v.text)]
+    if cell_type in ('str', 'd', 'e'):
+        return v.text
+    if cell_type == 'b':
+        return v.text == '1'
+    try:
+        return int(v.text)
+    except ValueError:
+        return float(v.text)
+
+
+def _iter_row_batches(f, block_size):
+    """
+    从工作表 XML 流中按块读取，切分出若干完整的 <row> 元素，并包装为可独立解析的 XML 片段。
+    每批行交给 C 实现的 ElementTree 一次性建树，避免为每个元素触发一次 Python 层的解析事件。
+    :param f: 工作表 XML 的二进制流。
+    :param block_size: 每次读取的字节数。
+    :return: 生成器，每次产出一个 XML 片段（bytes）。
+    """
+    buffer = b''
+    # --- 1. 读取到 <sheetData> 开始标签为止，记录根元素的开始标签（包含命名空间声明）---
+    while True:
+        match = _SHEET_DATA_START.search(buffer)
+        if match:
+            break
+        block = f.read(block_size)
+        if not block:
+            return
+        buffer += block
+    if match.group(3):
+        # <sheetData/>：没有任何数据行
+        return
+    prefix = match.group(1)
+    root_start = _WORKSHEET_START.search(buffer, 0, match.start()).group(0)
+    if root_start.endswith(b'/>'):
+        return
+    head = root_start + b'<' + prefix + b'sheetData>'
+    tail = b'</' + prefix + b'sheetData></' + prefix + b'worksheet>'
+    row_end = b'</' + prefix + b'row>'
+    sheet_data_end = b'</' + prefix + b'sheetData>'
+    buffer = buffer[match.end():]
+
+    # --- 2. 每次切出最后一个 </row> 之前的内容作为一批 ---
+    while True:
+        end = buffer.find(sheet_data_end)
+        if end != -1:
+            if buffer[:end].strip():
+                yield head + buffer[:end] + tail
+            return
+        cut = buffer.rfind(row_end)
+        if cut != -1:
+            cut += len(row_end)
+            yield head + buffer[:cut] + tail
+            buffer = buffer[cut:]
+        block = f.read(block_size)
+        if not block:
+            raise ValueError("工作表 XML 不完整: 缺少 </sheetData>")
+        buffer += block
+
+
+def iter_xlsx_rows(source, block_size=1024 * 1024):
+    """
+    直接读取 .xlsx 中活动工作表的前四列，逐行产出单元格的值。
+    工作表按块增量解析，内存占用只与块大小有关，与行数无关。
+    :param source: .xlsx 文件的路径或可 seek 的二进制文件对象。
+    :param block_size: 每次从工作表 XML 中读取的字节数。
+    :return: 生成器，每次产出 (行号, [A, B, C, D 列的值])，缺失的单元格为 None，空行会被跳过。
+    :raises KeyError, ValueError, ElementTree.ParseError, zipfile.BadZipFile: 工作簿结构不符合预期时。
+    """
+    with zipfile.ZipFile(source) as zf:
+        sheet_part, shared_strings_part = _locate_parts(zf)
+        shared_strings = _read_shared_strings(zf, shared_strings_part)
+
+        row_number = 0
+        with zf.open(sheet_part) as f:
+            for fragment in _iter_row_batches(f, block_size):
+                for row in ElementTree.fromstring(fragment)[0]:
+                    if row.tag != _ROW_TAG:
+                        continue
+                    row_number = int(row.get('r', row_number + 1))
+                    values = [None] * _COLUMN_COUNT
+                    position = 0
+                    for cell in row:
+                        ref = cell.get('r')
+                        column = _column_index(ref) if ref else position
+                        position = column + 1
+                        if column < _COLUMN_COUNT:
+                            values[column] = _cell_value(cell, shared_strings)
+                    if any(value is not None for value in values):
+                        yield row_number, values